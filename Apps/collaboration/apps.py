@@ -5,3 +5,7 @@ class CollaborationConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'Apps.collaboration'
     label = 'collaboration'
+
+    def ready(self):
+        # Invalidación de la caché de usuarios del WebSocket
+        from . import signals  # noqa: F401
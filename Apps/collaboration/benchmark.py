@@ -0,0 +1,291 @@
+"""
+Benchmark en proceso de `DiagramConsumer`.
+
+Levanta R salas × C clientes con `WebsocketCommunicator` sobre la capa de
+canales configurada (en memoria por defecto), reproduce tráfico de
+movimientos y ediciones (grabado o sintético) y mide latencia de conexión,
+latencia de broadcast, mensajes por segundo y memoria por conexión.
+
+Lo usa el comando `bench_realtime`; el resultado es un dict serializable a
+JSON para comparar corridas.
+"""
+import asyncio
+import json
+import random
+import resource
+import time
+import tracemalloc
+import uuid
+from dataclasses import asdict, dataclass
+
+import msgpack
+from channels.db import database_sync_to_async
+from channels.layers import get_channel_layer
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth import get_user_model
+from django.db import connections
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .middleware import JWTAuthMiddleware
+from .realtime import MSGPACK_SUBPROTOCOL, metrics
+from .routing import websocket_urlpatterns
+
+
+# Campo con el instante de envío que el benchmark agrega a cada mensaje
+STAMP = 'benchSentAt'
+
+
+@dataclass
+class BenchmarkConfig:
+    """Parámetros de una corrida."""
+    rooms: int = 2
+    clients: int = 10
+    messages: int = 500
+    rate: float = 60.0
+    elements: int = 50
+    traffic: str = None
+    speed: float = 1.0
+    msgpack: bool = False
+    drain: float = 1.0
+    seed: int = 0
+
+
+def percentiles(values):
+    """p50/p95/p99, máximo y media de una lista de valores (en milisegundos)."""
+    if not values:
+        return {'count': 0, 'p50': None, 'p95': None, 'p99': None, 'max': None, 'mean': None}
+    ordered = sorted(values)
+
+    def at(fraction):
+        return round(ordered[min(len(ordered) - 1, int(fraction * len(ordered)))], 3)
+
+    return {
+        'count': len(ordered),
+        'p50': at(0.50),
+        'p95': at(0.95),
+        'p99': at(0.99),
+        'max': round(ordered[-1], 3),
+        'mean': round(sum(ordered) / len(ordered), 3),
+    }
+
+
+def load_traffic(path):
+    """
+    Tráfico grabado en JSON Lines: `{"at": segundos, "client": n, "message": {...}}`
+    por línea; `client` es opcional.
+    """
+    with open(path) as traffic_file:
+        entries = [json.loads(line) for line in traffic_file if line.strip()]
+    return sorted(entries, key=lambda entry: entry.get('at', 0))
+
+
+def synthetic_traffic(config, rng):
+    """Movimientos (80 %), presencia de edición (10 %) y eventos del diagrama (10 %)."""
+    entries = []
+    for index in range(config.messages):
+        element_id = f'element_{rng.randrange(config.elements)}'
+        roll = rng.random()
+        if roll < 0.8:
+            message = {'type': 'move_element', 'payload': {
+                'elementId': element_id, 'x': rng.randint(0, 4000), 'y': rng.randint(0, 3000)
+            }}
+        elif roll < 0.9:
+            message = {'type': 'editing_presence', 'payload': {
+                'elementId': element_id, 'elementType': 'class', 'action': rng.choice(['start', 'stop'])
+            }}
+        else:
+            message = {'type': 'update_class', 'payload': {'id': element_id, 'name': f'Clase {index}'}}
+        entries.append({'at': index / config.rate, 'message': message})
+    return entries
+
+
+def create_fixtures(config):
+    """Usuarios, organización, proyecto y un diagrama por sala; retorna (diagram_ids, tokens)."""
+    from Apps.modeling.models import Diagram
+    from Apps.workspace.models import Membership, Organization, Project, ProjectMember
+
+    User = get_user_model()
+    tag = uuid.uuid4().hex[:8]
+    users = User.objects.bulk_create([
+        User(username=f'bench_{tag}_{index}', email=f'bench_{tag}_{index}@example.com', password='!')
+        for index in range(config.clients)
+    ])
+    owner = users[0]
+    organization = Organization.objects.create(name=f'Bench {tag}', slug=f'bench-{tag}', created_by=owner)
+    Membership.objects.bulk_create([
+        Membership(organization=organization, user=user, role='owner', status='active')
+        for user in users
+    ])
+    project = Project.objects.create(
+        organization=organization, name=f'Bench {tag}', key=tag[:6], created_by=owner
+    )
+    ProjectMember.objects.bulk_create([
+        ProjectMember(project=project, user=user, role='editor') for user in users
+    ])
+    diagrams = Diagram.objects.bulk_create([
+        Diagram(project=project, name=f'Sala {index}', created_by=owner)
+        for index in range(config.rooms)
+    ])
+    tokens = [str(AccessToken.for_user(user)) for user in users]
+    return [str(diagram.id) for diagram in diagrams], tokens
+
+
+class BenchClient:
+    """Cliente WebSocket que registra lo recibido y la latencia de los mensajes marcados."""
+
+    def __init__(self, application, diagram_id, token, use_msgpack):
+        self.use_msgpack = use_msgpack
+        self.communicator = WebsocketCommunicator(
+            application,
+            f'/ws/diagram/{diagram_id}/?token={token}',
+            subprotocols=[MSGPACK_SUBPROTOCOL] if use_msgpack else []
+        )
+        self.received = 0
+        self.latencies = []
+        self.last_received_at = None
+        self._reader = None
+
+    async def connect(self):
+        started = time.perf_counter()
+        connected, code = await self.communicator.connect()
+        if not connected:
+            raise RuntimeError(f'Conexión rechazada (código {code})')
+        elapsed = (time.perf_counter() - started) * 1000
+        self._reader = asyncio.ensure_future(self._read())
+        return elapsed
+
+    async def send(self, message):
+        if self.use_msgpack:
+            await self.communicator.send_to(bytes_data=msgpack.packb(message))
+        else:
+            await self.communicator.send_to(text_data=json.dumps(message))
+
+    async def _read(self):
+        while True:
+            # Sin timeout efectivo: un timeout de receive_output cancela la aplicación
+            output = await self.communicator.receive_output(timeout=3600)
+            if output['type'] != 'websocket.send':
+                return
+            now = time.perf_counter()
+            self.received += 1
+            self.last_received_at = now
+            if output.get('bytes') is not None:
+                frame = msgpack.unpackb(output['bytes'])
+            else:
+                frame = json.loads(output['text'])
+            for stamp in self._stamps(frame):
+                self.latencies.append((now - stamp) * 1000)
+
+    @staticmethod
+    def _stamps(frame):
+        if frame.get('type') == 'move_element_batch':
+            return [move['payload'][STAMP] for move in frame.get('moves', []) if STAMP in move.get('payload', {})]
+        payload = frame.get('payload')
+        if frame.get('type') == 'move_element' and isinstance(payload, dict) and STAMP in payload:
+            return [payload[STAMP]]
+        return [frame[STAMP]] if STAMP in frame else []
+
+    async def close(self):
+        if self._reader is not None:
+            self._reader.cancel()
+        await self.communicator.disconnect()
+
+
+def _stamped(message):
+    """Copia del mensaje con el instante de envío donde el servidor lo conserva."""
+    message = json.loads(json.dumps(message))
+    now = time.perf_counter()
+    if message.get('type') == 'move_element' and isinstance(message.get('payload'), dict):
+        message['payload'][STAMP] = now
+    else:
+        message[STAMP] = now
+    return message
+
+
+async def _replay(clients, traffic, speed):
+    """Envía el tráfico a una sala respetando los tiempos grabados (o sin pausas si speed es 0)."""
+    started = time.perf_counter()
+    for index, entry in enumerate(traffic):
+        if speed > 0:
+            delay = started + entry.get('at', 0) / speed - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        client = clients[entry.get('client', index) % len(clients)]
+        await client.send(_stamped(entry['message']))
+    return len(traffic)
+
+
+async def _quiesce(clients, idle):
+    """Espera hasta que ningún cliente reciba frames durante `idle` segundos."""
+    while True:
+        await asyncio.sleep(idle / 4)
+        last = max((client.last_received_at or 0 for client in clients), default=0)
+        if time.perf_counter() - last >= idle:
+            return
+
+
+async def run_benchmark(config):
+    """Ejecuta la corrida y retorna el reporte."""
+    rng = random.Random(config.seed)
+    traffic = load_traffic(config.traffic) if config.traffic else synthetic_traffic(config, rng)
+    diagram_ids, tokens = await database_sync_to_async(create_fixtures)(config)
+    application = JWTAuthMiddleware(URLRouter(websocket_urlpatterns))
+
+    rooms = [
+        [BenchClient(application, diagram_id, tokens[index], config.msgpack) for index in range(config.clients)]
+        for diagram_id in diagram_ids
+    ]
+    clients = [client for room in rooms for client in room]
+
+    # Memoria: solo durante las conexiones, para no distorsionar las latencias
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    connect_latencies = []
+    for client in clients:
+        connect_latencies.append(await client.connect())
+    await _quiesce(clients, config.drain)
+    per_connection = (tracemalloc.get_traced_memory()[0] - baseline) / len(clients)
+    tracemalloc.stop()
+
+    for client in clients:
+        client.received = 0
+        client.latencies = []
+
+    started = time.perf_counter()
+    sent = sum(await asyncio.gather(*(_replay(room, traffic, config.speed) for room in rooms)))
+    send_elapsed = time.perf_counter() - started
+    await _quiesce(clients, config.drain)
+    elapsed = max(
+        (client.last_received_at or started for client in clients), default=started
+    ) - started
+
+    received = sum(client.received for client in clients)
+    report = {
+        'config': asdict(config),
+        'connections': len(clients),
+        'connect_ms': percentiles(connect_latencies),
+        'broadcast_ms': percentiles([value for client in clients for value in client.latencies]),
+        'messages': {
+            'sent': sent,
+            'received': received,
+            'sent_per_s': round(sent / send_elapsed, 1) if send_elapsed else None,
+            'received_per_s': round(received / elapsed, 1) if elapsed else None,
+        },
+        'memory': {
+            'per_connection_bytes': int(per_connection),
+            'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        },
+        'elapsed_s': round(elapsed, 3),
+        'metrics': metrics.snapshot(),
+    }
+
+    for client in clients:
+        await client.close()
+    # Las capas que mantienen conexiones por event loop (p. ej. la de Postgres) las liberan aquí
+    close_layer = getattr(get_channel_layer(), 'close', None)
+    if close_layer is not None:
+        await close_layer()
+    # Las conexiones del hilo de la base de datos impedirían borrar la base de prueba
+    await database_sync_to_async(connections.close_all)()
+    return report
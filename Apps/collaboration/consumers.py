@@ -1,41 +1,45 @@
-import json
-from datetime import datetime, timezone
+import asyncio
+import logging
+import time
 from channels.generic.websocket import AsyncWebsocketConsumer
-from channels.db import database_sync_to_async
 from django.contrib.auth.models import AnonymousUser
-from Apps.modeling.models import Diagram
-from Apps.workspace.models import ProjectMember
-from rest_framework_simplejwt.tokens import AccessToken
-from django.contrib.auth import get_user_model
+from Apps.workspace.access import can_access_diagram
+from .realtime import (
+    MSGPACK_SUBPROTOCOL,
+    DocumentOpError,
+    EncodedFrame,
+    Outbox,
+    choose_subprotocol,
+    decode_message,
+    get_presence_store,
+    group_event,
+    intersects,
+    metrics,
+    parse_rect,
+    rooms,
+)
+from .realtime.move_batcher import element_key
+
+
+logger = logging.getLogger(__name__)
 
 class DiagramConsumer(AsyncWebsocketConsumer):
-    # Diccionario para rastrear usuarios activos por diagrama
-    active_users = {}
+    # Cada cuántos segundos (como máximo) se renueva el latido en el almacén de presencia
+    HEARTBEAT_REFRESH_FRACTION = 3
 
     async def connect(self):
         self.diagram_id = self.scope['url_route']['kwargs']['diagram_id']
+        self.room_group_name = None
+        self.outbox = None
+        self.heartbeat_task = None
+        # Área visible declarada por el cliente; None recibe todos los movimientos
+        self.viewport = None
 
-        # --- AUTENTICACIÓN JWT MANUAL ---
-        # Extraer token de la query string
-        token = None
         query_string = self.scope.get('query_string', b'').decode()
-        for part in query_string.split('&'):
-            if part.startswith('token='):
-                token = part.split('=', 1)[1]
-                break
+        query_params = dict(part.split('=', 1) for part in query_string.split('&') if '=' in part)
 
-        self.user = None
-        if token:
-            try:
-                validated_token = AccessToken(token)
-                user_id = validated_token['user_id']
-                User = get_user_model()
-                self.user = await database_sync_to_async(User.objects.get)(id=user_id)
-            except Exception:
-                self.user = None
-        else:
-            # Si no hay token, usar usuario de sesión (por si acaso)
-            self.user = self.scope.get('user')
+        # Usuario autenticado por JWTAuthMiddleware (proyección id/username/email)
+        self.user = self.scope.get('user')
 
         # Validar autenticación y membresía
         if not await self.is_user_authorized():
@@ -43,124 +47,191 @@ class DiagramConsumer(AsyncWebsocketConsumer):
             return
 
         self.room_group_name = f'diagram_{self.diagram_id}'
-        
+        self.presence = get_presence_store()
+        self.user_info = {
+            'id': str(self.user.id),
+            'username': self.user.username,
+            'email': self.user.email
+        }
+
         # Agregar al grupo
         await self.channel_layer.group_add(self.room_group_name, self.channel_name)
-        
-        # Agregar usuario a la lista de activos
-        await self.add_active_user()
-        
-        # Notificar a todos los usuarios sobre la lista actualizada
-        await self.broadcast_active_users()
-        
-        await self.accept()
+        self.room = rooms.acquire(self.diagram_id, self.channel_layer, self.room_group_name)
+
+        # Protocolo de cable: MessagePack si el cliente lo ofrece, JSON en caso contrario
+        self.subprotocol = choose_subprotocol(self.scope.get('subprotocols', []))
+        await self.accept(subprotocol=self.subprotocol)
 
-    @database_sync_to_async
-    def is_user_authorized(self):
+        # Registrar la conexión; solo la primera conexión del usuario genera un delta
+        is_first_connection = await self.presence.join(
+            self.diagram_id, self.channel_name, self.user_info
+        )
+        self._last_heartbeat = time.monotonic()
+        # Elementos cuyo lease de edición tiene esta conexión
+        self.held_leases = set()
+
+        # El nuevo cliente recibe la lista completa; el resto solo el delta
+        await self.send_active_users()
+        await self.send_leases()
+
+        # Solo lo perdido desde `last_seq` o, si no está en el buffer, el estado completo
+        await self.sync_state(query_params.get('epoch'), query_params.get('last_seq'))
+
+        # A partir de aquí los envíos pasan por la cola acotada de la conexión
+        self.outbox = Outbox(self.write_frame, self.close_slow_consumer)
+        # El servidor renueva la presencia aunque el cliente no envíe mensajes
+        self.heartbeat_task = asyncio.ensure_future(self.heartbeat_loop())
+
+        if is_first_connection:
+            await self.broadcast_presence_delta(joined=[self.user_info])
+
+    async def is_user_authorized(self):
         """Verifica si el usuario está autenticado y es miembro del proyecto."""
         # Verificar autenticación
-        if isinstance(self.user, AnonymousUser) or not self.user.is_authenticated:
-            return False
-            
-        try:
-            # Obtener el diagrama y su proyecto
-            diagram = Diagram.objects.select_related('project').get(id=self.diagram_id)
-            
-            # Verificar si es miembro del proyecto
-            return ProjectMember.objects.filter(
-                project=diagram.project,
-                user=self.user
-            ).exists()
-            
-        except Diagram.DoesNotExist:
+        if self.user is None or isinstance(self.user, AnonymousUser) or not self.user.is_authenticated:
             return False
 
-    async def add_active_user(self):
-        """Agregar usuario a la lista de activos del diagrama."""
-        if self.diagram_id not in self.active_users:
-            self.active_users[self.diagram_id] = {}
-        
-        # Almacenar información del usuario
-        self.active_users[self.diagram_id][self.channel_name] = {
-            'id': str(self.user.id),
-            'username': self.user.username,
-            'email': self.user.email,
-            'connected_at': datetime.now(timezone.utc).isoformat()
-        }
+        # Membresía cacheada; en un fallo, diagrama y membresía en una sola consulta
+        return await can_access_diagram(self.user.id, self.diagram_id)
 
-    async def remove_active_user(self):
-        """Remover usuario de la lista de activos del diagrama."""
-        if (self.diagram_id in self.active_users and 
-            self.channel_name in self.active_users[self.diagram_id]):
-            del self.active_users[self.diagram_id][self.channel_name]
-            
-            # Si no quedan usuarios, limpiar el diagrama
-            if not self.active_users[self.diagram_id]:
-                del self.active_users[self.diagram_id]
-
-    async def broadcast_active_users(self):
-        """Enviar lista de usuarios activos a todos los conectados."""
-        if self.diagram_id in self.active_users:
-            # Crear lista de usuarios únicos (por si hay múltiples conexiones del mismo usuario)
-            users_dict = {}
-            for user_data in self.active_users[self.diagram_id].values():
-                user_id = user_data['id']
-                if user_id not in users_dict:
-                    users_dict[user_id] = {
-                        'id': user_data['id'],
-                        'username': user_data['username'],
-                        'email': user_data['email']
-                    }
-            
-            users_list = list(users_dict.values())
-        else:
-            users_list = []
+    async def send_active_users(self):
+        """Enviar la lista completa de usuarios activos solo a esta conexión."""
+        users_list = await self.presence.users(self.diagram_id)
+        await self.send_frame(EncodedFrame({
+            'type': 'active_users',
+            'payload': users_list
+        }))
 
-        # Enviar evento de usuarios activos
+    async def sync_state(self, epoch, last_seq):
+        """
+        Pone al día a una conexión nueva: repite los eventos posteriores a
+        `last_seq` si el buffer de la sala aún los tiene, o envía el estado
+        actual del documento desde memoria.
+        """
+        log = self.room.log
+        frames = None
+        if epoch == log.epoch and last_seq is not None and last_seq.isdigit():
+            frames = log.replay(int(last_seq))
+
+        if frames is None:
+            if last_seq is not None:
+                metrics.incr('replay.fallbacks')
+            await self.room.document.ensure_loaded()
+            # Los eventos hasta `seq` ya están reflejados en el estado enviado
+            self.last_seq = log.last_seq
+            await self.send_frame(self.room.document.state_frame(log.epoch, log.last_seq))
+            return
+
+        metrics.incr('replay.hits')
+        metrics.incr('replay.frames', len(frames))
+        self.last_seq = int(last_seq)
+        for frame in frames:
+            await self.send_sequenced(frame)
+
+    async def broadcast_presence_delta(self, joined=(), left=()):
+        """Notificar a todos los conectados qué usuarios entraron o salieron."""
         await self.channel_layer.group_send(
             self.room_group_name,
-            {
-                'type': 'active_users_update',
-                'users': users_list
-            }
+            group_event('active_users_delta', {
+                'type': 'active_users_delta',
+                'payload': {
+                    'joined': list(joined),
+                    'left': list(left)
+                }
+            })
         )
 
+    async def heartbeat_loop(self):
+        """Renueva el latido mientras la conexión esté abierta, con o sin mensajes del cliente."""
+        interval = self.presence.ttl / self.HEARTBEAT_REFRESH_FRACTION
+        while True:
+            await asyncio.sleep(max(self._last_heartbeat + interval - time.monotonic(), 0))
+            try:
+                await self.refresh_heartbeat()
+            except Exception:
+                # Un fallo del almacén no cierra la conexión; se reintenta en el próximo período
+                logger.exception("No se pudo renovar la presencia en el diagrama %s", self.diagram_id)
+                self._last_heartbeat = time.monotonic()
+
+    async def refresh_heartbeat(self, force=False):
+        """Renueva el latido del canal y expulsa conexiones caídas de otros procesos."""
+        now = time.monotonic()
+        if not force and now - self._last_heartbeat < self.presence.ttl / self.HEARTBEAT_REFRESH_FRACTION:
+            return
+
+        self._last_heartbeat = now
+        # Si otro proceso ya expiró este canal (p. ej. tras una pausa), vuelve a registrarse
+        if await self.presence.touch(self.diagram_id, self.channel_name, self.user_info):
+            await self.broadcast_presence_delta(joined=[self.user_info])
+        expired_users = await self.presence.expire(self.diagram_id)
+        if expired_users:
+            await self.broadcast_presence_delta(left=expired_users)
+        expired_leases = await self.presence.expire_leases(self.diagram_id)
+        if expired_leases:
+            await self.broadcast_lease_delta(released=expired_leases)
+
     async def disconnect(self, close_code):
-        # Remover usuario de activos
-        await self.remove_active_user()
-        
-        # Notificar cambios a usuarios restantes
-        await self.broadcast_active_users()
+        # La conexión fue rechazada antes de unirse al diagrama
+        if not self.room_group_name:
+            return
+
+        if self.heartbeat_task is not None:
+            self.heartbeat_task.cancel()
+
+        if self.outbox is not None:
+            await self.outbox.close()
+
+        # Liberar los leases de edición de esta conexión
+        released = await self.presence.release_channel_leases(self.diagram_id, self.channel_name)
+        if released:
+            await self.broadcast_lease_delta(released=released)
+
+        # Remover usuario de activos y notificar solo si no le quedan conexiones
+        user_left = await self.presence.leave(self.diagram_id, self.channel_name)
+        if user_left:
+            await self.broadcast_presence_delta(left=[user_left])
         
         # Salir del grupo
         await self.channel_layer.group_discard(self.room_group_name, self.channel_name)
+        await rooms.release(self.diagram_id)
+
+    async def receive(self, text_data=None, bytes_data=None):
+        # JSON en frames de texto o MessagePack en frames binarios; lo inválido se envuelve como mensaje
+        data = decode_message(text_data, bytes_data)
 
-    async def receive(self, text_data):
-        try:
-            # Intenta parsear como JSON
-            data = json.loads(text_data)
-        except json.JSONDecodeError:
-            # Si no es JSON válido, crea un objeto básico
-            data = {'type': 'message', 'content': text_data}
-        
         # Manejar diferentes tipos de mensajes
         message_type = data.get('type', 'message')
         
-        if message_type == 'request_active_users':
+        # Cualquier mensaje cuenta como actividad del canal
+        await self.refresh_heartbeat(force=message_type == 'heartbeat')
+
+        if message_type == 'heartbeat':
+            # Latido explícito del cliente, ya procesado arriba
+            return
+        elif message_type == 'request_active_users':
             # Cliente solicita lista de usuarios activos
-            await self.broadcast_active_users()
+            await self.send_active_users()
         elif message_type == 'editing_presence':
             # Manejar evento de presencia de edición
             await self.handle_editing_presence(data)
+        elif message_type == 'lease_acquire':
+            # Tomar o renovar el lease de edición de un elemento
+            element_id = await self.lease_element_id(data)
+            if element_id:
+                await self.acquire_lease(element_id)
+        elif message_type == 'lease_release':
+            element_id = await self.lease_element_id(data)
+            if element_id:
+                await self.release_lease(element_id)
         elif message_type == 'move_element':
-            # Reenviar eventos move_element a todos los clientes
-            await self.channel_layer.group_send(
-                self.room_group_name,
-                {
-                    'type': 'move_element_broadcast',
-                    'event_data': data
-                }
-            )
+            # Los movimientos se fusionan por elemento y se envían en lotes por tick
+            await self.room.move_batcher.add(data, self.user.id)
+        elif message_type == 'viewport':
+            # Área visible del lienzo para filtrar los movimientos que recibe esta conexión
+            await self.handle_viewport(data)
+        elif message_type == 'diagram_patch':
+            # Operaciones JSON Patch sobre el documento vivo
+            await self.handle_diagram_patch(data)
         else:
             # Reenviar mensaje a todos los conectados con información del remitente
             message_with_sender = data.copy()
@@ -168,16 +239,65 @@ class DiagramConsumer(AsyncWebsocketConsumer):
             
             await self.channel_layer.group_send(
                 self.room_group_name,
-                {
-                    'type': 'diagram_event',
-                    'message': message_with_sender,
-                    'user': {
-                        'id': str(self.user.id),
-                        'username': self.user.username
-                    }
-                }
+                group_event('diagram_event', message_with_sender)
             )
 
+    async def send_leases(self):
+        """Enviar los leases de edición vigentes solo a esta conexión."""
+        await self.send_frame(EncodedFrame({
+            'type': 'leases',
+            'payload': await self.presence.leases(self.diagram_id)
+        }))
+
+    async def lease_element_id(self, data):
+        """Id del elemento de un mensaje de lease; responde con un error si no es válido."""
+        payload = data.get('payload')
+        element_id = payload.get('elementId') if isinstance(payload, dict) else None
+        if isinstance(element_id, str) and 0 < len(element_id) <= 200:
+            return element_id
+        await self.send_frame(EncodedFrame({
+            'type': 'error',
+            'payload': {'code': 'invalid_lease', 'detail': 'Se esperaba un elementId'}
+        }))
+        return None
+
+    async def acquire_lease(self, element_id):
+        """
+        Toma o renueva el lease del elemento y responde con `lease_result`.
+        Solo una toma nueva se difunde como delta; las renovaciones no.
+        """
+        granted, lease = await self.presence.acquire_lease(
+            self.diagram_id, element_id, self.channel_name,
+            {'id': self.user_info['id'], 'username': self.user_info['username']}
+        )
+        await self.send_frame(EncodedFrame({
+            'type': 'lease_result',
+            'payload': {'elementId': element_id, 'granted': granted, 'holder': lease['user']}
+        }))
+        if granted and element_id not in self.held_leases:
+            self.held_leases.add(element_id)
+            await self.broadcast_lease_delta(acquired=[lease])
+        return granted
+
+    async def release_lease(self, element_id):
+        """Libera el lease del elemento si pertenece a esta conexión."""
+        if await self.presence.release_lease(self.diagram_id, element_id, self.channel_name):
+            self.held_leases.discard(element_id)
+            await self.broadcast_lease_delta(released=[element_id])
+
+    async def broadcast_lease_delta(self, acquired=(), released=()):
+        """Notificar a todos los conectados qué leases se tomaron o liberaron."""
+        await self.channel_layer.group_send(
+            self.room_group_name,
+            group_event('lease_delta', {
+                'type': 'lease_delta',
+                'payload': {
+                    'acquired': list(acquired),
+                    'released': list(released)
+                }
+            })
+        )
+
     async def handle_editing_presence(self, data):
         """
         Recibe el evento editing_presence y lo reenvía a todos los usuarios conectados (excepto el emisor)
@@ -198,6 +318,15 @@ class DiagramConsumer(AsyncWebsocketConsumer):
         #   ]
         # }
         payload = data.get('payload', {})
+
+        # Empezar a editar requiere el lease del elemento; dejar de editar lo libera
+        element_id = payload.get("elementId")
+        if element_id and isinstance(element_id, str):
+            if payload.get("action") == "start" and not await self.acquire_lease(element_id):
+                return
+            if payload.get("action") == "stop":
+                await self.release_lease(element_id)
+
         # Convertir a lista para cumplir con la estructura esperada
         editing_event = {
             "type": "editing_presence",
@@ -215,31 +344,164 @@ class DiagramConsumer(AsyncWebsocketConsumer):
         # Enviar a todos los usuarios conectados EXCEPTO al emisor
         await self.channel_layer.group_send(
             self.room_group_name,
-            {
-                "type": "editing_presence_broadcast",
-                "editing_event": editing_event,
-                "sender_channel": self.channel_name
-            }
+            group_event(
+                "editing_presence_broadcast",
+                editing_event,
+                sender_channel=self.channel_name
+            )
         )
 
+    async def handle_viewport(self, data):
+        """
+        Registra el viewport `{x, y, width, height}` de la conexión (o lo quita
+        con `null`) y le envía la posición actual de los elementos que quedan
+        dentro, que pudieron moverse mientras estaban fuera de su vista.
+        """
+        payload = data.get('payload')
+        if payload is None:
+            self.viewport = None
+            return
+
+        viewport = parse_rect(payload)
+        if viewport is None:
+            await self.send_frame(EncodedFrame({
+                'type': 'error',
+                'payload': {'code': 'invalid_viewport', 'detail': 'Se esperaba {x, y, width, height}'}
+            }))
+            return
+
+        await self.room.spatial.ensure_loaded()
+        self.viewport = viewport
+        elements = self.room.spatial.query(viewport)
+        await self.send_frame(EncodedFrame({
+            'type': 'viewport_elements',
+            'payload': [
+                {'elementId': element_id, 'x': x0, 'y': y0, 'width': x1 - x0, 'height': y1 - y0}
+                for element_id, (x0, y0, x1, y1) in elements.items()
+            ]
+        }))
+
+    async def handle_diagram_patch(self, data):
+        """
+        Aplica el parche al documento de la sala y lo reenvía a todos; si no
+        se puede aplicar solo se notifica al emisor.
+        """
+        ops = data.get('ops')
+        event = group_event('diagram_patch_broadcast', {
+            'type': 'diagram_patch',
+            'ops': ops,
+            'senderId': str(self.user.id)
+        })
+        try:
+            self.room.document.apply_patch(ops, event['event_id'])
+            # La secuencia se asigna junto con la aplicación para que el estado y el buffer coincidan
+            self.room.log.ingest(event)
+        except DocumentOpError as exc:
+            await self.send_frame(EncodedFrame({
+                'type': 'error',
+                'payload': {'code': 'invalid_patch', 'detail': str(exc)}
+            }))
+            return
+
+        self.room.document.mark_dirty(self.user.id, len(ops))
+        await self.channel_layer.group_send(self.room_group_name, event)
+
+    async def send_frame(self, frame):
+        """
+        Envía un frame a esta conexión: durante `connect` directamente y luego
+        a través de su cola de salida, sin esperar al socket.
+        """
+        if self.outbox is None:
+            await self.write_frame(frame)
+        else:
+            self.outbox.put(frame)
+
+    async def write_frame(self, frame):
+        """Escribe un frame ya codificado en el protocolo negociado por esta conexión."""
+        if self.subprotocol == MSGPACK_SUBPROTOCOL:
+            await self.send(bytes_data=frame.binary)
+        else:
+            await self.send(text_data=frame.text)
+
+    async def close_slow_consumer(self):
+        """Cierra una conexión que no consume su cola; el cliente se reconecta con `last_seq`."""
+        logger.info("Cerrando conexión lenta en el diagrama %s", self.diagram_id)
+        await self.close(code=self.outbox.close_code)
+
+    async def send_sequenced(self, frame):
+        """Envía un frame de la sala salvo que esta conexión ya lo haya recibido (repetición)."""
+        if frame.seq <= self.last_seq:
+            return
+        self.last_seq = frame.seq
+        await self.send_frame(frame)
+
+    async def send_group_event(self, event):
+        """Envía un evento de grupo numerado, reutilizando la codificación compartida de la sala."""
+        await self.send_sequenced(self.room.log.ingest(event))
+
     async def editing_presence_broadcast(self, event):
-        # No reenviar al emisor
+        # Se numera aunque no se reenvíe al emisor
+        frame = self.room.log.ingest(event)
         if event.get("sender_channel") == self.channel_name:
             return
-        await self.send(text_data=json.dumps(event["editing_event"]))
+        await self.send_sequenced(frame)
 
     async def diagram_event(self, event):
         """Manejar eventos generales del diagrama."""
-        await self.send(text_data=json.dumps(event['message']))
+        message = event['payload']
+        if event.get('from_api') and message.get('type') == 'version_saved':
+            # La versión guardada por la API pasa a ser el estado de la sala antes
+            # de anunciarla, para que el próximo autoguardado no la pise
+            await self.room.document.reload((message.get('payload') or {}).get('versionNumber'))
+        await self.send_group_event(event)
 
-    async def active_users_update(self, event):
-        """Manejar actualización de usuarios activos."""
-        message = {
-            'type': 'active_users',
-            'payload': event['users']
-        }
-        await self.send(text_data=json.dumps(message))
+    async def active_users_delta(self, event):
+        """Manejar entradas y salidas de usuarios del diagrama."""
+        await self.send_group_event(event)
+
+    async def lease_delta(self, event):
+        """Manejar leases de edición tomados y liberados."""
+        # Un lease liberado (p. ej. vencido) deja de ser de esta conexión
+        self.held_leases.difference_update(event['payload']['payload']['released'])
+        await self.send_group_event(event)
+
+    async def diagram_patch_broadcast(self, event):
+        """Manejar parches del documento (ya aplicados si se originaron en este proceso)."""
+        try:
+            self.room.document.apply_patch(event['payload']['ops'], event['event_id'])
+        except DocumentOpError:
+            logger.warning("Parche no aplicable en el diagrama %s", self.diagram_id)
+        await self.send_group_event(event)
+
+    async def send_moves(self, event, moves):
+        """
+        Envía un evento de movimientos solo con los elementos cuyo recorrido
+        (posición anterior y nueva) intersecta el viewport de esta conexión.
+        """
+        self.room.document.apply_moves(moves, event['event_id'])
+        swept = self.room.spatial.apply_moves(moves, event['event_id'], known=self.room.document.has_element)
+        frame = self.room.log.ingest(event)
+        if self.viewport is None:
+            await self.send_sequenced(frame)
+            return
+
+        visible = [
+            move for move in moves
+            if swept.get(str(element_key(move))) is None
+            or intersects(swept[str(element_key(move))], self.viewport)
+        ]
+        metrics.incr('viewport.moves_filtered', len(moves) - len(visible))
+        if not visible:
+            return
+        if len(visible) < len(moves):
+            # Subconjunto propio de esta conexión, con la misma secuencia que el evento
+            frame = EncodedFrame({**frame.payload, 'moves': visible}, seq=frame.seq)
+        await self.send_sequenced(frame)
+
+    async def move_element_batch(self, event):
+        """Manejar lote de movimientos fusionados durante un tick."""
+        await self.send_moves(event, event['payload']['moves'])
 
     async def move_element_broadcast(self, event):
-        """Manejar broadcast de eventos move_element (incluyendo editing_presence)."""
-        await self.send(text_data=json.dumps(event['event_data']))
\ No newline at end of file
+        """Manejar broadcast de un move_element individual (batching desactivado)."""
+        await self.send_moves(event, [event['payload']])
\ No newline at end of file
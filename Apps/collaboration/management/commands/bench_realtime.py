@@ -0,0 +1,93 @@
+"""
+Benchmark del WebSocket de diagramas dentro del proceso.
+
+    python manage.py bench_realtime --rooms 4 --clients 25 --messages 1000 --output bench.json
+
+Corre sobre una base de datos de prueba (creada y eliminada por el comando)
+y, salvo `--configured-layer`, sobre `InMemoryChannelLayer`.
+"""
+import asyncio
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings, setup_databases, teardown_databases
+
+from Apps.collaboration.benchmark import BenchmarkConfig, run_benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide latencia de conexión y de broadcast, mensajes por segundo y memoria "
+        "por conexión de DiagramConsumer con R salas × C clientes; emite JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rooms', type=int, default=2, help="Cantidad de salas (diagramas)")
+        parser.add_argument('--clients', type=int, default=10, help="Clientes por sala")
+        parser.add_argument('--messages', type=int, default=500, help="Mensajes sintéticos por sala")
+        parser.add_argument('--rate', type=float, default=60.0, help="Mensajes sintéticos por segundo por sala")
+        parser.add_argument('--elements', type=int, default=50, help="Elementos distintos en el tráfico sintético")
+        parser.add_argument(
+            '--traffic',
+            help='Tráfico grabado (JSON Lines con {"at", "client", "message"}) en lugar del sintético'
+        )
+        parser.add_argument(
+            '--speed', type=float, default=1.0,
+            help="Multiplicador de velocidad de reproducción; 0 envía sin pausas"
+        )
+        parser.add_argument('--msgpack', action='store_true', help="Clientes con subprotocolo MessagePack")
+        parser.add_argument(
+            '--drain', type=float, default=1.0,
+            help="Segundos sin frames para dar por terminada una fase"
+        )
+        parser.add_argument('--capacity', type=int, default=1000, help="Capacidad por canal de la capa en memoria")
+        parser.add_argument('--seed', type=int, default=0, help="Semilla del tráfico sintético")
+        parser.add_argument('--configured-layer', action='store_true', help="Usar CHANNEL_LAYERS de settings")
+        parser.add_argument('--keepdb', action='store_true', help="Reutilizar la base de datos de prueba")
+        parser.add_argument('--output', help="Archivo donde escribir el reporte JSON (por defecto, stdout)")
+
+    def handle(self, *args, **options):
+        if options['rooms'] < 1 or options['clients'] < 1:
+            raise CommandError("--rooms y --clients deben ser al menos 1")
+
+        config = BenchmarkConfig(
+            rooms=options['rooms'],
+            clients=options['clients'],
+            messages=options['messages'],
+            rate=options['rate'],
+            elements=options['elements'],
+            traffic=options['traffic'],
+            speed=options['speed'],
+            msgpack=options['msgpack'],
+            drain=options['drain'],
+            seed=options['seed'],
+        )
+
+        layers = {}
+        if not options['configured_layer']:
+            layers['CHANNEL_LAYERS'] = {
+                'default': {
+                    'BACKEND': 'channels.layers.InMemoryChannelLayer',
+                    'CONFIG': {'capacity': options['capacity']},
+                },
+            }
+
+        old_config = setup_databases(verbosity=0, interactive=False, keepdb=options['keepdb'])
+        try:
+            with override_settings(**layers):
+                report = asyncio.run(run_benchmark(config))
+        finally:
+            teardown_databases(old_config, verbosity=0, keepdb=options['keepdb'])
+
+        output = json.dumps(report, indent=2, default=str)
+        if options['output']:
+            with open(options['output'], 'w') as report_file:
+                report_file.write(output + '\n')
+            self.stdout.write(self.style.SUCCESS(
+                f"{report['connections']} conexiones · broadcast p50/p95/p99 "
+                f"{report['broadcast_ms']['p50']}/{report['broadcast_ms']['p95']}/"
+                f"{report['broadcast_ms']['p99']} ms · "
+                f"{report['messages']['received_per_s']} msg/s recibidos → {options['output']}"
+            ))
+        else:
+            self.stdout.write(output)
@@ -0,0 +1,55 @@
+"""
+Elimina los bloqueos de diagramas expirados.
+
+    python manage.py reap_expired_locks                 # una pasada (cron)
+    python manage.py reap_expired_locks --interval 60   # proceso de larga duración
+
+Las lecturas de la API ya excluyen los bloqueos expirados; este comando solo
+libera las filas. El resumen de la última pasada queda en la base de datos
+(`LockReaperStatus`) y se expone en `/api/realtime/metrics/`. En
+docker-compose corre como el servicio `lock-reaper`.
+"""
+import logging
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from Apps.collaboration.models import Lock, LockReaperStatus
+
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Elimina en lotes los bloqueos expirados; con --interval se repite indefinidamente."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=float, default=0,
+            help="Segundos entre pasadas; 0 ejecuta una sola pasada"
+        )
+        parser.add_argument('--batch-size', type=int, default=500, help="Bloqueos eliminados por transacción")
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size debe ser al menos 1")
+        if options['interval'] < 0:
+            raise CommandError("--interval no puede ser negativo")
+
+        while True:
+            self.reap(options['batch_size'], options['interval'])
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
+            close_old_connections()
+
+    def reap(self, batch_size, interval):
+        started = time.monotonic()
+        deleted = Lock.cleanup_expired_locks(batch_size=batch_size)
+        duration_ms = round((time.monotonic() - started) * 1000, 1)
+
+        # Si el reaper deja de correr, el resumen envejece y `last_run` lo marca como `stale`
+        LockReaperStatus.record(deleted, duration_ms, interval)
+        logger.info("Reaper de bloqueos: %d expirados eliminados en %.1f ms", deleted, duration_ms)
+        self.stdout.write(f"{deleted} bloqueos expirados eliminados en {duration_ms} ms")
@@ -0,0 +1,108 @@
+"""
+Autenticación JWT para el stack WebSocket.
+
+El token llega en la query string (`?token=<access>`). Sus claims se
+validan una sola vez y quedan cacheados hasta su expiración; el usuario se
+adjunta a `scope['user']` como una proyección liviana (id, username, email)
+tomada de una caché LRU acotada, sin sesión ni fila completa de `User`.
+"""
+import time
+from dataclasses import dataclass
+from urllib.parse import parse_qs
+
+from cachetools import TLRUCache, TTLCache
+from channels.db import database_sync_to_async
+from channels.middleware import BaseMiddleware
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+
+@dataclass(frozen=True)
+class UserProjection:
+    """Datos del usuario que necesita la capa de tiempo real."""
+    id: int
+    username: str
+    email: str
+
+    is_authenticated = True
+    is_anonymous = False
+
+    @property
+    def pk(self):
+        return self.id
+
+
+def _cache_setting(name, default):
+    return getattr(settings, 'COLLAB_AUTH_CACHE', {}).get(name, default)
+
+
+# Claims por token: cada entrada vive hasta el `exp` del propio token
+_claims_cache = TLRUCache(
+    maxsize=_cache_setting('CLAIMS_MAXSIZE', 10000),
+    ttu=lambda token, claims, now: claims['exp'],
+    timer=time.time
+)
+# Proyecciones por id de usuario; el TTL acota cambios hechos en otros procesos
+_users_cache = TTLCache(
+    maxsize=_cache_setting('USERS_MAXSIZE', 10000),
+    ttl=_cache_setting('USERS_TTL', 300)
+)
+
+
+def decode_token(token):
+    """Claims de un access token válido (cacheados) o None si no es válido."""
+    claims = _claims_cache.get(token)
+    if claims is None:
+        try:
+            claims = dict(AccessToken(token).payload)
+        except TokenError:
+            return None
+        _claims_cache[token] = claims
+    return claims
+
+
+@database_sync_to_async
+def _fetch_user_projection(user_id):
+    row = get_user_model().objects.filter(
+        id=user_id, is_active=True
+    ).values_list('id', 'username', 'email').first()
+    return UserProjection(*row) if row else None
+
+
+async def get_user_projection(user_id):
+    """Proyección del usuario activo desde la caché; None si no existe o está inactivo."""
+    user = _users_cache.get(str(user_id))
+    if user is None:
+        user = await _fetch_user_projection(user_id)
+        if user is not None:
+            _users_cache[str(user_id)] = user
+    return user
+
+
+def invalidate_user_projection(user_id):
+    """Descarta la proyección cacheada del usuario en este proceso."""
+    _users_cache.pop(str(user_id), None)
+
+
+class JWTAuthMiddleware(BaseMiddleware):
+    """Completa `scope['user']` y `scope['jwt_claims']` a partir del token de la query string."""
+
+    async def __call__(self, scope, receive, send):
+        scope = dict(scope)
+        scope['user'] = AnonymousUser()
+        scope['jwt_claims'] = None
+
+        query = parse_qs(scope.get('query_string', b'').decode())
+        token = (query.get('token') or [None])[0]
+        claims = decode_token(token) if token else None
+        if claims is not None:
+            user = await get_user_projection(claims.get(api_settings.USER_ID_CLAIM))
+            if user is not None:
+                scope['user'] = user
+                scope['jwt_claims'] = claims
+
+        return await super().__call__(scope, receive, send)
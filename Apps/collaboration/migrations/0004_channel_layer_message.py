@@ -0,0 +1,21 @@
+# Generated by Django 5.2.6 on 2026-10-17 12:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('collaboration', '0003_auto_20250912_1037'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChannelLayerMessage',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('payload', models.BinaryField(help_text='Mensaje serializado con MessagePack')),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True, help_text='Fecha de publicación')),
+            ],
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.6 on 2026-10-17 12:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('collaboration', '0004_channel_layer_message'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            'CREATE SEQUENCE IF NOT EXISTS collaboration_lock_fencing_token_seq',
+            'DROP SEQUENCE IF EXISTS collaboration_lock_fencing_token_seq',
+        ),
+        migrations.AddField(
+            model_name='lock',
+            name='fencing_token',
+            field=models.BigIntegerField(default=0, editable=False, help_text='Token creciente de la concesión; las escrituras de versiones lo verifican'),
+        ),
+    ]
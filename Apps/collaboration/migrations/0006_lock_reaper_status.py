@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-17 13:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('collaboration', '0005_lock_fencing_token'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LockReaperStatus',
+            fields=[
+                ('id', models.PositiveSmallIntegerField(default=1, primary_key=True, serialize=False)),
+                ('finished_at', models.DateTimeField(help_text='Fin de la última pasada')),
+                ('deleted', models.PositiveIntegerField(help_text='Bloqueos expirados eliminados en la última pasada')),
+                ('duration_ms', models.FloatField(help_text='Duración de la última pasada en milisegundos')),
+                ('interval', models.FloatField(default=0, help_text='Segundos entre pasadas (0 si se ejecuta una sola vez, p. ej. desde cron)')),
+            ],
+        ),
+    ]
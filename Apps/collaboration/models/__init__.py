@@ -6,10 +6,14 @@ from .collab_session import CollabSession
 from .presence import Presence
 from .comment import Comment
 from .lock import Lock
+from .lock_reaper_status import LockReaperStatus
+from .channel_layer_message import ChannelLayerMessage
 
 __all__ = [
     'CollabSession',
     'Presence',
     'Comment',
     'Lock',
+    'LockReaperStatus',
+    'ChannelLayerMessage',
 ]
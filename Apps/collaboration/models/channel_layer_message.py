@@ -0,0 +1,28 @@
+"""
+Modelo de Mensaje de la Capa de Canales.
+"""
+from django.db import models
+
+
+class ChannelLayerMessage(models.Model):
+    """
+    Mensaje de la capa de canales de Postgres que excede el límite de NOTIFY.
+
+    El NOTIFY lleva solo el id de la fila; las filas se eliminan al vencer
+    la expiración de la capa.
+    """
+    id = models.BigAutoField(primary_key=True)
+    payload = models.BinaryField(
+        help_text="Mensaje serializado con MessagePack"
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        db_index=True,
+        help_text="Fecha de publicación"
+    )
+
+    class Meta:
+        app_label = 'collaboration'
+
+    def __str__(self):
+        return f"ChannelLayerMessage {self.id}"
@@ -1,14 +1,20 @@
 """
 Modelo de Lock (bloqueo) para diagramas.
 """
+import uuid
+
 from django.conf import settings
-from django.db import models
+from django.db import connection, models, transaction
 from django.utils import timezone
 from datetime import timedelta
 from Apps.common.models import BaseUUIDModel
 from Apps.modeling.models import Diagram
 
 
+# Secuencia de la que sale el `fencing_token` de cada concesión
+FENCING_TOKEN_SEQUENCE = 'collaboration_lock_fencing_token_seq'
+
+
 class Lock(BaseUUIDModel):
     """
     Bloqueo temporal de un diagrama para edición colaborativa.
@@ -43,6 +49,12 @@ class Lock(BaseUUIDModel):
         help_text="Propósito del bloqueo (editing, reviewing, etc.)"
     )
     
+    fencing_token = models.BigIntegerField(
+        default=0,
+        editable=False,
+        help_text="Token creciente de la concesión; las escrituras de versiones lo verifican"
+    )
+    
     class Meta:
         app_label = 'collaboration'
         indexes = [
@@ -79,7 +91,87 @@ class Lock(BaseUUIDModel):
         return f"Lock on {self.diagram.name} by {self.locked_by.username}"
     
     @classmethod
-    def cleanup_expired_locks(cls):
-        """Limpia automáticamente los bloqueos expirados."""
-        expired_count = cls.objects.filter(expires_at__lt=timezone.now()).delete()[0]
-        return expired_count
\ No newline at end of file
+    def acquire(cls, diagram_id, user_id, purpose='editing', minutes=30):
+        """
+        Adquiere o renueva el bloqueo del diagrama en una sola sentencia.
+
+        El `INSERT ... ON CONFLICT (diagram_id) DO UPDATE` solo reemplaza la
+        fila existente si expiró (nueva concesión: nuevo id y nuevo
+        `fencing_token`) o si pertenece al mismo usuario (renovación: conserva
+        id y token). Retorna `(lock, granted)`; si no se concede, `lock` es el
+        bloqueo vigente de otro usuario.
+        """
+        table = connection.ops.quote_name(cls._meta.db_table)
+        sql = f"""
+            WITH granted AS (
+                INSERT INTO {table} AS held
+                    (id, diagram_id, locked_by_id, locked_at, expires_at, purpose, fencing_token)
+                VALUES (%(id)s, %(diagram_id)s, %(user_id)s, %(now)s, %(expires_at)s, %(purpose)s,
+                        nextval(%(sequence)s))
+                ON CONFLICT (diagram_id) DO UPDATE SET
+                    id = CASE WHEN held.expires_at <= %(now)s THEN EXCLUDED.id ELSE held.id END,
+                    locked_at = CASE WHEN held.expires_at <= %(now)s
+                        THEN EXCLUDED.locked_at ELSE held.locked_at END,
+                    fencing_token = CASE WHEN held.expires_at <= %(now)s
+                        THEN EXCLUDED.fencing_token ELSE held.fencing_token END,
+                    locked_by_id = EXCLUDED.locked_by_id,
+                    expires_at = EXCLUDED.expires_at,
+                    purpose = EXCLUDED.purpose
+                WHERE held.expires_at <= %(now)s OR held.locked_by_id = EXCLUDED.locked_by_id
+                RETURNING held.*, true AS granted
+            )
+            SELECT * FROM granted
+            UNION ALL
+            SELECT held.*, false FROM {table} AS held
+            WHERE held.diagram_id = %(diagram_id)s AND NOT EXISTS (SELECT 1 FROM granted)
+        """
+        while True:
+            now = timezone.now()
+            params = {
+                'id': uuid.uuid4(),
+                'diagram_id': diagram_id,
+                'user_id': user_id,
+                'now': now,
+                'expires_at': now + timedelta(minutes=minutes),
+                'purpose': purpose,
+                'sequence': FENCING_TOKEN_SEQUENCE,
+            }
+            lock = next(iter(cls.objects.raw(sql, params)), None)
+            # Sin fila: el conflicto fue con un bloqueo confirmado después de iniciar la sentencia
+            if lock is not None:
+                return lock, lock.granted
+    
+    @classmethod
+    def holds_fencing_token(cls, diagram_id, fencing_token):
+        """
+        Indica si `fencing_token` corresponde a la concesión vigente del diagrama.
+
+        Bloquea la fila hasta el final de la transacción: mientras dure la
+        escritura que la verifica, nadie puede tomar ni eliminar el bloqueo.
+        """
+        return cls.objects.select_for_update().filter(
+            diagram_id=diagram_id,
+            fencing_token=fencing_token,
+            expires_at__gt=timezone.now()
+        ).exists()
+    
+    @classmethod
+    def cleanup_expired_locks(cls, batch_size=500):
+        """
+        Elimina los bloqueos expirados en lotes y retorna cuántos eliminó.
+
+        Lo ejecuta el comando `reap_expired_locks`; las lecturas no lo llaman,
+        solo filtran `expires_at > now()`. `SKIP LOCKED` permite correr varios
+        reapers sin que se bloqueen entre sí.
+        """
+        deleted = 0
+        while True:
+            with transaction.atomic():
+                ids = list(
+                    cls.objects.filter(expires_at__lt=timezone.now())
+                    .select_for_update(skip_locked=True)
+                    .values_list('id', flat=True)[:batch_size]
+                )
+                if not ids:
+                    return deleted
+                deleted += cls.objects.filter(id__in=ids).delete()[0]
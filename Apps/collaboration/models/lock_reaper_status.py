@@ -0,0 +1,69 @@
+"""
+Modelo de Estado del Reaper de Bloqueos.
+"""
+from datetime import timedelta
+
+from django.db import models
+from django.utils import timezone
+
+
+class LockReaperStatus(models.Model):
+    """
+    Resumen de la última pasada de `reap_expired_locks`.
+
+    El comando corre en su propio proceso, por lo que el resumen se guarda en
+    una única fila de la base de datos (compartida con los workers de la API)
+    en lugar de la caché, que por defecto es local a cada proceso.
+    """
+    SINGLETON_ID = 1
+
+    id = models.PositiveSmallIntegerField(primary_key=True, default=SINGLETON_ID)
+    finished_at = models.DateTimeField(
+        help_text="Fin de la última pasada"
+    )
+    deleted = models.PositiveIntegerField(
+        help_text="Bloqueos expirados eliminados en la última pasada"
+    )
+    duration_ms = models.FloatField(
+        help_text="Duración de la última pasada en milisegundos"
+    )
+    interval = models.FloatField(
+        default=0,
+        help_text="Segundos entre pasadas (0 si se ejecuta una sola vez, p. ej. desde cron)"
+    )
+
+    class Meta:
+        app_label = 'collaboration'
+
+    def __str__(self):
+        return f"LockReaperStatus {self.finished_at:%Y-%m-%d %H:%M:%S}"
+
+    @classmethod
+    def record(cls, deleted, duration_ms, interval):
+        """Guarda el resumen de una pasada reemplazando el anterior."""
+        cls.objects.update_or_create(
+            id=cls.SINGLETON_ID,
+            defaults={
+                'finished_at': timezone.now(),
+                'deleted': deleted,
+                'duration_ms': duration_ms,
+                'interval': interval,
+            }
+        )
+
+    @classmethod
+    def last_run(cls):
+        """
+        Resumen de la última pasada, o None si nunca corrió. `stale` indica
+        que el reaper dejó de correr (sin pasadas en tres intervalos o una hora).
+        """
+        status = cls.objects.filter(id=cls.SINGLETON_ID).first()
+        if status is None:
+            return None
+        max_age = timedelta(seconds=max(status.interval * 3, 3600))
+        return {
+            'finished_at': status.finished_at.isoformat(),
+            'deleted': status.deleted,
+            'duration_ms': status.duration_ms,
+            'stale': timezone.now() - status.finished_at > max_age,
+        }
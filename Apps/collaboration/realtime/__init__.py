@@ -0,0 +1,53 @@
+"""
+Infraestructura de tiempo real para la colaboración sobre WebSocket.
+"""
+
+from .codec import (
+    MSGPACK_SUBPROTOCOL,
+    EncodedFrame,
+    FrameCache,
+    choose_subprotocol,
+    decode_message,
+    group_event,
+)
+from .document import DocumentOpError, LiveDocument
+from .events import publish_diagram_event
+from .metrics import RealtimeMetrics, metrics
+from .move_batcher import MoveBatcher
+from .outbox import Outbox
+from .presence import (
+    BasePresenceStore,
+    InMemoryPresenceStore,
+    RedisPresenceStore,
+    get_presence_store,
+)
+from .room_log import RoomLog
+from .rooms import Room, RoomRegistry, rooms
+from .spatial import SpatialIndex, intersects, parse_rect
+
+__all__ = [
+    'MSGPACK_SUBPROTOCOL',
+    'EncodedFrame',
+    'FrameCache',
+    'choose_subprotocol',
+    'decode_message',
+    'group_event',
+    'DocumentOpError',
+    'LiveDocument',
+    'publish_diagram_event',
+    'RealtimeMetrics',
+    'metrics',
+    'MoveBatcher',
+    'Outbox',
+    'BasePresenceStore',
+    'InMemoryPresenceStore',
+    'RedisPresenceStore',
+    'get_presence_store',
+    'RoomLog',
+    'Room',
+    'RoomRegistry',
+    'rooms',
+    'SpatialIndex',
+    'intersects',
+    'parse_rect',
+]
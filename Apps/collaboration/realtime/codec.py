@@ -0,0 +1,90 @@
+"""
+Protocolo de cable del WebSocket de diagramas.
+
+El cliente puede pedir MessagePack con `Sec-WebSocket-Protocol: msgpack`;
+si no lo hace se usa JSON en frames de texto como hasta ahora. Los eventos
+de grupo se codifican una sola vez por proceso (`EncodedFrame`) y los bytes
+resultantes se comparten entre todos los destinatarios locales.
+"""
+import json
+import uuid
+from collections import OrderedDict
+
+import msgpack
+
+from .metrics import metrics
+
+
+MSGPACK_SUBPROTOCOL = 'msgpack'
+JSON_SUBPROTOCOL = 'json'
+
+
+def choose_subprotocol(offered):
+    """Elige el subprotocolo entre los ofrecidos por el cliente (None = JSON sin negociar)."""
+    if MSGPACK_SUBPROTOCOL in offered:
+        return MSGPACK_SUBPROTOCOL
+    if JSON_SUBPROTOCOL in offered:
+        return JSON_SUBPROTOCOL
+    return None
+
+
+def group_event(handler_type, payload, **extra):
+    """Evento de grupo con el mensaje final para el cliente y un id para compartir su codificación."""
+    return {'type': handler_type, 'event_id': uuid.uuid4().hex, 'payload': payload, **extra}
+
+
+def decode_message(text_data=None, bytes_data=None):
+    """Decodifica un mensaje entrante; el texto inválido se envuelve como mensaje simple."""
+    if bytes_data is not None:
+        try:
+            data = msgpack.unpackb(bytes_data, raw=False)
+        except (ValueError, msgpack.UnpackException):
+            return {'type': 'message', 'content': None}
+    else:
+        try:
+            data = json.loads(text_data)
+        except json.JSONDecodeError:
+            return {'type': 'message', 'content': text_data}
+    return data if isinstance(data, dict) else {'type': 'message', 'content': data}
+
+
+class EncodedFrame:
+    """Mensaje con sus codificaciones JSON y MessagePack calculadas bajo demanda una sola vez."""
+
+    __slots__ = ('payload', 'seq', '_text', '_binary')
+
+    def __init__(self, payload, seq=None):
+        self.payload = payload
+        self.seq = seq
+        self._text = None
+        self._binary = None
+
+    @property
+    def text(self):
+        if self._text is None:
+            self._text = json.dumps(self.payload)
+            metrics.incr('frames.encoded.json')
+        return self._text
+
+    @property
+    def binary(self):
+        if self._binary is None:
+            self._binary = msgpack.packb(self.payload, use_bin_type=True)
+            metrics.incr('frames.encoded.msgpack')
+        return self._binary
+
+
+class FrameCache:
+    """Frames codificados por id de evento, acotado a los más recientes."""
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self._frames = OrderedDict()
+
+    def get(self, event_id):
+        return self._frames.get(event_id)
+
+    def put(self, event_id, frame):
+        self._frames[event_id] = frame
+        if len(self._frames) > self.maxsize:
+            self._frames.popitem(last=False)
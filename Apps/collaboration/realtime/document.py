@@ -0,0 +1,362 @@
+"""
+Documento vivo del diagrama, autoritativo dentro del proceso.
+
+La sala mantiene en memoria el snapshot actual del diagrama (mismo formato
+que `DiagramVersion.snapshot`) y le aplica las operaciones que llegan por
+el grupo:
+
+- `diagram_patch`: lista de operaciones JSON Patch (`ops`) sobre el snapshot.
+- `move_element`: actualiza `position` (`x`, `y`) del elemento `elementId`.
+
+Las operaciones originadas en este proceso marcan el documento como sucio
+y se persisten como una nueva versión tras un período sin cambios o al
+acumular demasiadas operaciones. Los clientes que se unen tarde reciben
+el estado desde memoria (`document_state`).
+
+El autoguardado solo escribe si la versión actual del diagrama sigue siendo
+la que cargó (o guardó) el documento. Si otro proceso autoguardó entretanto,
+su versión refleja los mismos eventos de la sala y se adopta como base; si
+la versión nueva se guardó por la API REST, el documento se recarga desde
+ella y lo no guardado se descarta.
+"""
+import asyncio
+import copy
+import logging
+import time
+from collections import OrderedDict
+
+from channels.db import database_sync_to_async
+from django.conf import settings
+
+from Apps.modeling.versioning import (
+    StaleBaseVersionError,
+    apply_patch,
+    create_diagram_version,
+    materialize_snapshot,
+    snapshot_errors,
+)
+from Apps.modeling.versioning.json_patch import _unescape
+from .codec import EncodedFrame
+from .metrics import metrics
+from .move_batcher import element_key
+
+
+logger = logging.getLogger(__name__)
+
+EMPTY_SNAPSHOT = {'classes': [], 'relations': [], 'metadata': {}}
+
+# Mensaje de las versiones que crea el autoguardado
+AUTOSAVE_MESSAGE = 'Autoguardado'
+
+
+class DocumentOpError(ValueError):
+    """Operación que no se puede aplicar sobre el documento actual."""
+
+
+def _copy_path(document, path, fresh):
+    """
+    Copia superficialmente los contenedores del camino hasta el padre de
+    `path` (los ya copiados, registrados en `fresh`, se reutilizan) para que
+    una operación aplicada en el lugar no modifique el documento original.
+    """
+    if not path:
+        return document
+    if id(document) not in fresh:
+        document = copy.copy(document)
+        fresh[id(document)] = document
+    parent = document
+    for token in [_unescape(token) for token in path.split('/')[1:-1]]:
+        key = int(token) if isinstance(parent, list) else token
+        child = parent[key]
+        if isinstance(child, (dict, list)) and id(child) not in fresh:
+            child = copy.copy(child)
+            fresh[id(child)] = child
+            parent[key] = child
+        parent = child
+    return document
+
+
+@database_sync_to_async
+def _load_latest_version(diagram_id):
+    """
+    Número, snapshot y mensaje de la última versión del diagrama
+    (None, None, None si no tiene).
+    """
+    from Apps.modeling.models import DiagramVersion
+
+    # La versión actual se busca por la clave primaria del diagrama; el payload
+    # comprimido es chico: si es un keyframe no hace falta otra consulta
+    version = DiagramVersion.objects.filter(current_for_diagrams__id=diagram_id).first()
+    if version is None:
+        return None, None, None
+    return version.version_number, materialize_snapshot(version), version.message
+
+
+class LiveDocument:
+    """Snapshot en memoria con aplicación de operaciones y autoguardado."""
+
+    def __init__(self, diagram_id, persist_delay=None, persist_max_ops=None):
+        self.diagram_id = diagram_id
+        self.persist_delay = (
+            persist_delay if persist_delay is not None
+            else getattr(settings, 'COLLAB_DOCUMENT_PERSIST_DELAY', 5)
+        )
+        self.persist_max_ops = (
+            persist_max_ops if persist_max_ops is not None
+            else getattr(settings, 'COLLAB_DOCUMENT_PERSIST_MAX_OPS', 200)
+        )
+        self.snapshot = None
+        self.version_number = None
+        self.revision = 0
+        self._loaded = False
+        self._load_lock = asyncio.Lock()
+        self._persist_lock = asyncio.Lock()
+        self._applied_events = OrderedDict()
+        self._element_index = None
+        self._state_frame = None
+        self._state_key = None
+        self._dirty_ops = 0
+        self._last_op = 0.0
+        self._last_editor_id = None
+        # Revisión guardada por última vez (la cargada cuenta como guardada)
+        self._persisted_revision = 0
+        self._task = None
+
+    @property
+    def is_dirty(self):
+        return self._dirty_ops > 0
+
+    async def ensure_loaded(self):
+        """Carga la última versión persistida la primera vez que se usa la sala."""
+        if self._loaded:
+            return
+        async with self._load_lock:
+            if self._loaded:
+                return
+            version_number, snapshot, _ = await _load_latest_version(self.diagram_id)
+            self._replace(version_number, snapshot)
+            self._loaded = True
+
+    async def reload(self, version_number=None):
+        """
+        Reemplaza el estado por la última versión persistida (p. ej. guardada
+        por la API REST), descartando lo no guardado. Con `version_number`, no
+        hace nada si el documento ya está en esa versión o en una posterior.
+        """
+        if not self._loaded:
+            return
+        async with self._persist_lock:
+            if self._is_current(version_number):
+                return
+            latest_number, snapshot, _ = await _load_latest_version(self.diagram_id)
+            if self._is_current(latest_number):
+                return
+            self._replace(latest_number, snapshot)
+            metrics.incr('document.reloaded')
+
+    def _is_current(self, version_number):
+        return (
+            version_number is not None and self.version_number is not None
+            and version_number <= self.version_number
+        )
+
+    def _replace(self, version_number, snapshot):
+        """Adopta una versión persistida como estado del documento, sin cambios pendientes."""
+        self.version_number = version_number
+        self.snapshot = snapshot if snapshot is not None else copy.deepcopy(EMPTY_SNAPSHOT)
+        if isinstance(self.snapshot, dict):
+            # Autoguardados previos al esquema completo no traían `metadata`
+            self.snapshot.setdefault('metadata', {})
+        self._element_index = None
+        self._dirty_ops = 0
+        if self._loaded:
+            self._changed(0)
+        self._persisted_revision = self.revision
+
+    def state_frame(self, epoch, seq):
+        """
+        Frame `document_state` del estado actual junto a la secuencia de la
+        sala que refleja; se comparte mientras ninguno de los dos cambie.
+        """
+        if self._state_frame is None or self._state_key != (epoch, seq):
+            self._state_key = (epoch, seq)
+            self._state_frame = EncodedFrame({
+                'type': 'document_state',
+                'payload': {
+                    'snapshot': self.snapshot,
+                    'revision': self.revision,
+                    'versionNumber': self.version_number,
+                    'epoch': epoch,
+                    'seq': seq,
+                }
+            })
+        return self._state_frame
+
+    def apply_patch(self, ops, event_id=None):
+        """
+        Aplica una lista de operaciones JSON Patch; si alguna falla el
+        documento queda intacto y se lanza `DocumentOpError`.
+        """
+        if self.snapshot is None or (event_id is not None and self._seen(event_id)):
+            return
+        if not isinstance(ops, list) or not ops:
+            raise DocumentOpError("'ops' debe ser una lista no vacía de operaciones JSON Patch")
+
+        try:
+            # Se copian solo los contenedores que tocan las operaciones: el
+            # documento actual queda intacto hasta validar el resultado
+            snapshot, fresh = self.snapshot, {}
+            for op in ops:
+                snapshot = _copy_path(snapshot, op['path'], fresh)
+                snapshot = apply_patch(snapshot, [op], in_place=True)
+        except (KeyError, IndexError, TypeError, ValueError, AttributeError) as exc:
+            metrics.incr('document.ops_rejected')
+            raise DocumentOpError(f"Operación JSON Patch inválida: {exc!r}") from exc
+
+        errors = snapshot_errors(snapshot)
+        if errors:
+            metrics.incr('document.ops_rejected')
+            raise DocumentOpError(f"El parche deja un snapshot inválido: {'; '.join(errors)}")
+
+        self.snapshot = snapshot
+
+        self._element_index = None
+        self._changed(len(ops))
+
+    def apply_moves(self, moves, event_id=None):
+        """
+        Actualiza la posición de los elementos movidos y retorna cuántos
+        cambiaron; los desconocidos, los que no traen `x`/`y` y los que ya
+        estaban en esa posición se ignoran.
+        """
+        if self.snapshot is None or (event_id is not None and self._seen(event_id)):
+            return 0
+
+        applied = 0
+        index = self._elements()
+        for move in moves:
+            element = index.get(element_key(move))
+            payload = move.get('payload') if isinstance(move.get('payload'), dict) else move
+            if element is None or 'x' not in payload or 'y' not in payload:
+                continue
+            position = {'x': payload['x'], 'y': payload['y']}
+            if element.get('position') == position:
+                continue
+            element['position'] = position
+            applied += 1
+        if applied:
+            self._changed(applied)
+        return applied
+
+    def _elements(self):
+        """Clases y relaciones del snapshot por id (se recalcula tras cada parche)."""
+        if self._element_index is None:
+            self._element_index = {
+                element.get('id'): element
+                for collection in ('classes', 'relations')
+                for element in (self.snapshot.get(collection) or [])
+                if isinstance(element, dict)
+            }
+        return self._element_index
+
+    def has_element(self, element_id):
+        """Indica si el documento cargado tiene una clase o relación con ese id."""
+        if self.snapshot is None or element_id is None:
+            return False
+        index = self._elements()
+        return element_id in index or str(element_id) in index
+
+    def _seen(self, event_id):
+        """Registra el evento; True si ya se había aplicado en este proceso."""
+        if event_id in self._applied_events:
+            return True
+        self._applied_events[event_id] = None
+        if len(self._applied_events) > 1024:
+            self._applied_events.popitem(last=False)
+        return False
+
+    def _changed(self, ops_count):
+        self.revision += 1
+        self._state_frame = None
+        metrics.incr('document.ops_applied', ops_count)
+
+    def mark_dirty(self, user_id, ops_count=1):
+        """Registra operaciones originadas en este proceso y programa su persistencia."""
+        self._dirty_ops += ops_count
+        self._last_op = time.monotonic()
+        self._last_editor_id = user_id
+
+        if self._dirty_ops >= self.persist_max_ops:
+            asyncio.ensure_future(self.persist())
+        elif self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._run())
+
+    async def _run(self):
+        """Persiste cuando pasa `persist_delay` sin operaciones nuevas."""
+        while self._dirty_ops:
+            wait = self._last_op + self.persist_delay - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+                continue
+            await self.persist()
+
+    async def persist(self):
+        """Guarda el estado actual como una nueva versión del diagrama."""
+        async with self._persist_lock:
+            if not self._dirty_ops:
+                return
+            ops_count, self._dirty_ops = self._dirty_ops, 0
+            if self.revision == self._persisted_revision:
+                # Las operaciones no cambiaron nada desde la última versión guardada
+                return
+            revision = self.revision
+            snapshot = copy.deepcopy(self.snapshot)
+            try:
+                version = await database_sync_to_async(create_diagram_version)(
+                    self.diagram_id, snapshot, self._last_editor_id, message=AUTOSAVE_MESSAGE,
+                    base_version_number=self.version_number or 0
+                )
+            except StaleBaseVersionError:
+                metrics.incr('document.persist_conflicts')
+                await self._resolve_conflict(ops_count)
+                return
+            except Exception:
+                # Se reintenta tras otro período de espera
+                self._dirty_ops += ops_count
+                self._last_op = time.monotonic()
+                metrics.incr('document.persist_failed')
+                logger.exception("No se pudo persistir el diagrama %s", self.diagram_id)
+                return
+            self.version_number = version.version_number
+            self._persisted_revision = revision
+            self._state_frame = None
+            metrics.incr('document.persisted')
+
+    async def _resolve_conflict(self, ops_count):
+        """
+        La versión actual cambió desde que se cargó el documento. Un
+        autoguardado de otro proceso se adopta como base y lo pendiente se
+        guarda en el siguiente intento; una versión de la API REST reemplaza
+        al documento.
+        """
+        latest_number, snapshot, message = await _load_latest_version(self.diagram_id)
+        if message == AUTOSAVE_MESSAGE:
+            self.version_number = latest_number
+            self._dirty_ops += ops_count
+            self._last_op = time.monotonic()
+            if self._task is None or self._task.done():
+                self._task = asyncio.ensure_future(self._run())
+            return
+        logger.info(
+            "El diagrama %s tiene la versión %s guardada fuera de la sala; se recarga el documento",
+            self.diagram_id, latest_number
+        )
+        self._replace(latest_number, snapshot)
+        metrics.incr('document.reloaded')
+
+    async def close(self):
+        """Persiste lo pendiente y detiene el autoguardado."""
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+        self._task = None
+        await self.persist()
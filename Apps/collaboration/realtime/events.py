@@ -0,0 +1,28 @@
+"""
+Eventos de la API REST difundidos a la sala de un diagrama.
+
+Las vistas síncronas (bloqueos, versiones) publican un mensaje compacto en
+el grupo `diagram_<id>` cuando la transacción confirma. Los consumidores lo
+reciben como `diagram_event`, con secuencia y repetición en reconexiones
+como cualquier otro evento de la sala, y los clientes no necesitan
+consultar la API periódicamente.
+"""
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import transaction
+
+from .codec import group_event
+
+
+def publish_diagram_event(diagram_id, message_type, payload):
+    """Difunde `{type, payload}` a la sala del diagrama después del commit."""
+    # `from_api` distingue estos eventos de los mensajes que los clientes reenvían por la sala
+    event = group_event('diagram_event', {'type': message_type, 'payload': payload}, from_api=True)
+
+    def send():
+        channel_layer = get_channel_layer()
+        if channel_layer is not None:
+            async_to_sync(channel_layer.group_send)(f'diagram_{diagram_id}', event)
+
+    # Un fallo de la capa de canales se registra sin afectar a la respuesta ya confirmada
+    transaction.on_commit(send, robust=True)
@@ -0,0 +1,38 @@
+"""
+Métricas en memoria del proceso para la capa de tiempo real.
+
+Contadores monotónicos (`incr`) y medidores calculados al momento de leer
+(`register_gauge`). Se exponen en `GET /api/realtime/metrics/`.
+"""
+import threading
+from collections import defaultdict
+
+
+class RealtimeMetrics:
+    """Registro de contadores y medidores del proceso."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = defaultdict(int)
+        self._gauges = {}
+
+    def incr(self, name, amount=1):
+        """Incrementa un contador."""
+        with self._lock:
+            self._counters[name] += amount
+
+    def register_gauge(self, name, func):
+        """Registra una función sin argumentos que retorna el valor actual del medidor."""
+        self._gauges[name] = func
+
+    def snapshot(self):
+        """Retorna el estado actual de contadores y medidores."""
+        with self._lock:
+            counters = dict(self._counters)
+        return {
+            'counters': counters,
+            'gauges': {name: func() for name, func in self._gauges.items()},
+        }
+
+
+metrics = RealtimeMetrics()
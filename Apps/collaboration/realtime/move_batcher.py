@@ -0,0 +1,105 @@
+"""
+Agrupación de eventos `move_element` por sala.
+
+Durante un arrastre el cliente envía decenas de movimientos por segundo.
+El batcher conserva solo el último movimiento de cada elemento y, una vez
+por tick, envía al grupo un único evento `move_element_batch`.
+"""
+import asyncio
+import logging
+
+from .codec import group_event
+from .metrics import metrics
+
+
+logger = logging.getLogger(__name__)
+
+
+def element_key(data):
+    """Identificador del elemento movido (None si el mensaje no lo trae)."""
+    payload = data.get('payload')
+    if isinstance(payload, dict) and payload.get('elementId'):
+        return payload['elementId']
+    return data.get('elementId') or data.get('id')
+
+
+class MoveBatcher:
+    """Coalescencia de movimientos por elemento con envío periódico al grupo."""
+
+    def __init__(self, channel_layer, group_name, rate_hz=30, on_send=None):
+        self.channel_layer = channel_layer
+        self.group_name = group_name
+        self.interval = 1 / rate_hz if rate_hz > 0 else 0
+        # `on_send(event, moves, senders)` se llama antes de enviar cada evento al
+        # grupo; `senders[i]` es el usuario que envió `moves[i]`
+        self.on_send = on_send
+        # {clave del elemento: (movimiento, id del remitente)}
+        self._pending = {}
+        self._unkeyed = 0
+        self._task = None
+
+    @property
+    def pending_count(self):
+        return len(self._pending)
+
+    async def add(self, data, sender_id=None):
+        """Encola un movimiento; si el batching está desactivado se reenvía al instante."""
+        metrics.incr('moves.received')
+
+        if not self.interval:
+            await self._send(group_event('move_element_broadcast', data), [data], [sender_id])
+            metrics.incr('moves.sent')
+            return
+
+        key = element_key(data)
+        if key is None:
+            # Sin identificador no se puede fusionar: se envía tal cual en el próximo tick
+            self._unkeyed += 1
+            key = ('unkeyed', self._unkeyed)
+        elif self._pending.pop(key, None) is not None:
+            metrics.incr('moves.merged')
+        # Al final del lote: el orden refleja el último movimiento de cada elemento
+        self._pending[key] = (data, sender_id)
+
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._run())
+
+    async def _run(self):
+        """Envía un lote por tick mientras haya movimientos pendientes."""
+        while True:
+            await asyncio.sleep(self.interval)
+            if not self._pending:
+                return
+            await self.flush()
+
+    async def flush(self):
+        """Envía inmediatamente los movimientos pendientes."""
+        if not self._pending:
+            return
+        moves = [move for move, _ in self._pending.values()]
+        senders = [sender_id for _, sender_id in self._pending.values()]
+        self._pending = {}
+        await self._send(group_event(
+            'move_element_batch',
+            {'type': 'move_element_batch', 'moves': moves},
+            moves_count=len(moves)
+        ), moves, senders)
+        metrics.incr('moves.batches')
+        metrics.incr('moves.sent', len(moves))
+
+    async def _send(self, event, moves, senders):
+        if self.on_send is not None:
+            self.on_send(event, moves, senders)
+        try:
+            await self.channel_layer.group_send(self.group_name, event)
+        except Exception:
+            moves = event.get('moves_count', 1)
+            metrics.incr('moves.dropped', moves)
+            logger.exception("No se pudo enviar el lote de movimientos a %s", self.group_name)
+
+    async def close(self):
+        """Envía lo pendiente y detiene el ciclo de envío."""
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+        self._task = None
+        await self.flush()
@@ -0,0 +1,202 @@
+"""
+Cola de salida acotada por conexión.
+
+Los handlers de grupo no esperan al socket: encolan el frame y una tarea
+escritora lo envía. Cada tipo de mensaje tiene una política:
+
+- `coalesce`: los lotes `move_element_batch` pendientes se fusionan por
+  elemento en uno solo; los movimientos sueltos reemplazan al anterior
+  del mismo elemento. El frame fusionado ocupa el lugar (y la secuencia)
+  del pendiente, para no adelantar a eventos posteriores.
+- `drop_stale`: un mensaje reemplaza al pendiente con la misma clave
+  (p. ej. `editing_presence` del mismo usuario y elemento).
+- `reliable`: nunca se descarta.
+
+Si la cola supera la marca de agua durante demasiado tiempo, o se llena,
+la conexión se cierra con un código reanudable: el cliente se reconecta
+con `last_seq` y recibe lo perdido desde el buffer de la sala.
+"""
+import asyncio
+import itertools
+import logging
+import time
+import weakref
+from collections import OrderedDict
+
+from django.conf import settings
+
+from .codec import EncodedFrame
+from .metrics import metrics
+from .move_batcher import element_key
+
+try:
+    from uvicorn.protocols.utils import ClientDisconnected
+except ImportError:  # servidor ASGI distinto de uvicorn
+    ClientDisconnected = ConnectionError
+
+
+logger = logging.getLogger(__name__)
+
+# Errores con los que el servidor ASGI rechaza un envío porque el cliente ya se fue
+DISCONNECT_ERRORS = (ClientDisconnected, ConnectionError)
+
+COALESCE = 'coalesce'
+DROP_STALE = 'drop_stale'
+RELIABLE = 'reliable'
+
+DEFAULT_POLICIES = {
+    'move_element_batch': COALESCE,
+    'move_element': COALESCE,
+    'editing_presence': DROP_STALE,
+}
+
+_outboxes = weakref.WeakSet()
+
+
+def _config():
+    return getattr(settings, 'COLLAB_OUTBOX', {})
+
+
+def _stale_key(message_type, payload):
+    """Clave que identifica mensajes que se reemplazan entre sí."""
+    if message_type == 'editing_presence':
+        entry = (payload.get('data') or [{}])[0]
+        return (message_type, entry.get('userId'), entry.get('elementId'))
+    return (message_type,)
+
+
+class Outbox:
+    """Cola de frames salientes de una conexión con su tarea escritora."""
+
+    def __init__(self, write, on_overflow, max_size=None, high_water=None,
+                 high_water_seconds=None, policies=None):
+        config = _config()
+        self.write = write
+        self.on_overflow = on_overflow
+        self.max_size = max_size or config.get('MAX_SIZE', 512)
+        self.high_water = high_water or config.get('HIGH_WATER', 256)
+        self.high_water_seconds = (
+            high_water_seconds if high_water_seconds is not None
+            else config.get('HIGH_WATER_SECONDS', 5)
+        )
+        # Código de cierre que indica al cliente que se reconecte con `last_seq`
+        self.close_code = config.get('CLOSE_CODE', 4008)
+        self.policies = {**DEFAULT_POLICIES, **config.get('POLICIES', {}), **(policies or {})}
+        self._queue = OrderedDict()
+        self._counter = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._over_since = None
+        self._overflowed = False
+        self._task = asyncio.ensure_future(self._run())
+        _outboxes.add(self)
+
+    def __len__(self):
+        return len(self._queue)
+
+    def put(self, frame):
+        """Encola un frame aplicando la política de su tipo."""
+        if self._overflowed:
+            return
+
+        message_type = frame.payload.get('type')
+        policy = self.policies.get(message_type, RELIABLE)
+        if policy == COALESCE:
+            # Reemplazar una clave existente conserva su lugar en la cola
+            key, frame = self._coalesce(message_type, frame)
+        elif policy == DROP_STALE:
+            key = _stale_key(message_type, frame.payload)
+            # El reemplazo va al final para respetar el orden de secuencia
+            if self._queue.pop(key, None) is not None:
+                metrics.incr('outbox.dropped')
+        else:
+            key = next(self._counter)
+
+        self._queue[key] = frame
+        self._wakeup.set()
+        self._check_pressure()
+
+    def _coalesce(self, message_type, frame):
+        """
+        Fusiona el frame con el pendiente del mismo tipo o elemento. El
+        resultado conserva la secuencia del pendiente: los clientes siguen
+        recibiendo secuencias crecientes y, si reanudan desde ella, la
+        repetición de los movimientos nuevos es idempotente.
+        """
+        payload = frame.payload
+        if 'moves' not in payload:
+            key = (message_type, element_key(payload))
+        else:
+            key = (message_type,)
+        pending = self._queue.get(key)
+        if pending is None:
+            return key, frame
+
+        metrics.incr('outbox.coalesced')
+        if 'moves' in payload:
+            moves = {}
+            for index, move in enumerate(pending.payload['moves'] + payload['moves']):
+                moves[element_key(move) or ('unkeyed', index)] = move
+            payload = {**payload, 'moves': list(moves.values())}
+        if pending.seq is not None:
+            payload = {**payload, 'seq': pending.seq}
+        # El frame fusionado es propio de esta conexión y se codifica aparte
+        return key, EncodedFrame(payload, seq=pending.seq)
+
+    def _check_pressure(self):
+        depth = len(self._queue)
+        if depth <= self.high_water:
+            self._over_since = None
+            return
+
+        now = time.monotonic()
+        if self._over_since is None:
+            self._over_since = now
+        if depth >= self.max_size or now - self._over_since >= self.high_water_seconds:
+            self._overflowed = True
+            self._queue.clear()
+            metrics.incr('outbox.closed_slow')
+            asyncio.ensure_future(self.on_overflow())
+
+    async def _run(self):
+        """Envía los frames en orden mientras la conexión esté abierta."""
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            while self._queue:
+                _, frame = self._queue.popitem(last=False)
+                try:
+                    await self.write(frame)
+                except DISCONNECT_ERRORS as exc:
+                    # El cliente cerró antes de que `disconnect` detuviera la cola
+                    logger.info(
+                        "Se descartan %d frames: el WebSocket ya no acepta envíos (%s)",
+                        len(self._queue) + 1, exc.__class__.__name__
+                    )
+                    self._queue.clear()
+                    return
+                except Exception:
+                    # Un error propio (p. ej. al codificar) no debe dejar la conexión
+                    # abierta sin escritor: se cierra con el código reanudable y el
+                    # cliente recupera lo pendiente desde el buffer de la sala
+                    logger.exception("No se pudo enviar un frame por el WebSocket")
+                    self._overflowed = True
+                    self._queue.clear()
+                    await self.on_overflow()
+                    return
+                if len(self._queue) <= self.high_water:
+                    self._over_since = None
+
+    async def close(self):
+        """Detiene la tarea escritora descartando lo pendiente."""
+        self._queue.clear()
+        _outboxes.discard(self)
+        if not self._task.done():
+            self._task.cancel()
+
+
+metrics.register_gauge('outbox.connections', lambda: len(_outboxes))
+metrics.register_gauge('outbox.depth_total', lambda: sum(len(outbox) for outbox in _outboxes))
+metrics.register_gauge(
+    'outbox.depth_max',
+    lambda: max((len(outbox) for outbox in _outboxes), default=0)
+)
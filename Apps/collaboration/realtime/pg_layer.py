@@ -0,0 +1,509 @@
+"""
+Capa de canales sobre LISTEN/NOTIFY de Postgres.
+
+Permite correr varios workers sin Redis: cada event loop del proceso (un
+"nodo") mantiene una conexión asíncrona propia a la base de datos y escucha:
+
+- el canal de Postgres de sus canales específicos (`specific.<nodo>!...`),
+- un canal de Postgres por cada grupo con miembros locales.
+
+`group_send` entrega de inmediato a los miembros locales y publica un
+NOTIFY para los demás nodos. Los NOTIFY emitidos en una misma vuelta del
+event loop se agrupan en una sola sentencia; los mensajes que no caben en
+el límite de NOTIFY (8000 bytes) se guardan en `ChannelLayerMessage` y el
+NOTIFY lleva solo su id.
+
+La entrega es a lo sumo una vez, como en las demás capas: lo publicado
+mientras un nodo está reconectando se pierde.
+
+Un nodo que solo publica (p. ej. `async_to_sync(group_send)` desde una
+vista, con un event loop temporal) cierra su conexión al terminar cada
+envío. Los nodos que escuchan viven con su event loop; quien use la capa
+en un loop temporal para recibir debe llamar a `close()` (o `flush()`)
+antes de cerrarlo.
+"""
+import asyncio
+import base64
+import hashlib
+import itertools
+import logging
+import random
+import string
+import time
+import uuid
+import weakref
+
+import msgpack
+import psycopg2
+import psycopg2.extensions
+from channels.exceptions import ChannelFull
+from channels.layers import BaseChannelLayer
+from django.db import connections
+
+
+logger = logging.getLogger(__name__)
+
+# Límite de Postgres para el payload de NOTIFY, con margen
+NOTIFY_MAX_PAYLOAD = 7900
+
+RECONNECT_DELAYS = (0.1, 0.5, 1, 2, 5)
+
+
+def pg_channel(name):
+    """Identificador de Postgres (≤ 63 bytes) para un canal o grupo de la capa."""
+    return 'chl_' + hashlib.blake2b(name.encode(), digest_size=16).hexdigest()
+
+
+class _AsyncConnection:
+    """Conexión psycopg2 en modo asíncrono integrada al event loop."""
+
+    def __init__(self, params, on_notify, on_lost):
+        self.params = params
+        self.on_notify = on_notify
+        self.on_lost = on_lost
+        self.conn = None
+        self.loop = None
+        self._lock = asyncio.Lock()
+        self._waiter = None
+        self._reading = False
+
+    async def connect(self):
+        self.loop = asyncio.get_running_loop()
+        self.conn = psycopg2.connect(**self.params, async_=1)
+        await self._wait()
+        self.loop.add_reader(self.conn.fileno(), self._on_readable)
+        self._reading = True
+
+    def _on_readable(self):
+        # Una consulta en curso hace su propio poll; si no, llegaron notificaciones
+        if self._waiter is not None and not self._waiter.done():
+            self._waiter.set_result(None)
+            return
+        try:
+            self.conn.poll()
+        except psycopg2.Error as exc:
+            self._lost(exc)
+            return
+        self._dispatch()
+
+    def _dispatch(self):
+        while self.conn.notifies:
+            notify = self.conn.notifies.pop(0)
+            self.on_notify(notify.channel, notify.payload)
+
+    def _wake(self):
+        if self._waiter is not None and not self._waiter.done():
+            self._waiter.set_result(None)
+
+    async def _wait(self):
+        fileno = self.conn.fileno()
+        while True:
+            state = self.conn.poll()
+            self._dispatch()
+            if state == psycopg2.extensions.POLL_OK:
+                return
+            self._waiter = self.loop.create_future()
+            try:
+                if state == psycopg2.extensions.POLL_WRITE:
+                    self.loop.add_writer(fileno, self._wake)
+                    try:
+                        await self._waiter
+                    finally:
+                        self.loop.remove_writer(fileno)
+                elif self._reading:
+                    await self._waiter
+                else:
+                    self.loop.add_reader(fileno, self._wake)
+                    try:
+                        await self._waiter
+                    finally:
+                        self.loop.remove_reader(fileno)
+            finally:
+                self._waiter = None
+
+    async def execute(self, sql, params=None, fetch=False):
+        async with self._lock:
+            if self.conn is None or self.conn.closed:
+                raise psycopg2.InterfaceError("Conexión cerrada")
+            cursor = self.conn.cursor()
+            try:
+                cursor.execute(sql, params)
+                await self._wait()
+                return cursor.fetchall() if fetch else None
+            except (psycopg2.OperationalError, psycopg2.InterfaceError) as exc:
+                self._lost(exc)
+                raise
+            finally:
+                cursor.close()
+
+    def _lost(self, exc):
+        if self.conn is None:
+            return
+        logger.warning("Conexión de la capa de canales perdida: %s", exc)
+        self.close()
+        self.on_lost()
+
+    def close(self):
+        if self.conn is None:
+            return
+        if self._reading and not self.loop.is_closed():
+            self.loop.remove_reader(self.conn.fileno())
+        self._reading = False
+        self.conn.close()
+        self.conn = None
+
+
+class _Node:
+    """Estado de la capa para un event loop: colas locales, grupos y conexión."""
+
+    def __init__(self, layer, loop):
+        self.layer = layer
+        self.loop = loop
+        self.id = uuid.uuid4().hex[:12]
+        self.prefix = f'{self.id}!'
+        self.channels = {}
+        self.groups = {}
+        # Canales de Postgres que este nodo debe escuchar (se repiten al reconectar)
+        self.listening = {}
+        self.connection = None
+        self._connect_lock = asyncio.Lock()
+        self._batch = None
+        self._inbox = asyncio.Queue()
+        self._dispatcher = None
+        self._flushing = 0
+        self._last_cleanup = 0.0
+
+    def owns(self, channel):
+        return self.prefix in channel
+
+    # Conexión
+
+    async def get_connection(self):
+        if self.connection is not None and self.connection.conn is not None:
+            return self.connection
+        async with self._connect_lock:
+            if self.connection is not None and self.connection.conn is not None:
+                return self.connection
+            connection = _AsyncConnection(self.layer.connection_params(), self._on_notify, self._on_lost)
+            await connection.connect()
+            for name in list(self.listening):
+                await connection.execute(f'LISTEN "{name}"')
+            self.connection = connection
+            if self._dispatcher is None or self._dispatcher.done():
+                self._dispatcher = self.loop.create_task(self._dispatch())
+            return connection
+
+    def _on_lost(self):
+        self.connection = None
+        if self.listening:
+            self.loop.create_task(self._reconnect())
+
+    async def _reconnect(self):
+        for delay in itertools.chain(RECONNECT_DELAYS, itertools.repeat(RECONNECT_DELAYS[-1])):
+            await asyncio.sleep(delay)
+            try:
+                await self.get_connection()
+                return
+            except psycopg2.Error as exc:
+                logger.warning("No se pudo reconectar la capa de canales: %s", exc)
+
+    async def listen(self, name):
+        self.listening[name] = self.listening.get(name, 0) + 1
+        if self.listening[name] == 1:
+            connection = await self.get_connection()
+            await connection.execute(f'LISTEN "{name}"')
+
+    async def unlisten(self, name):
+        count = self.listening.get(name, 0) - 1
+        if count > 0:
+            self.listening[name] = count
+            return
+        self.listening.pop(name, None)
+        if self.connection is not None and self.connection.conn is not None:
+            await self.connection.execute(f'UNLISTEN "{name}"')
+
+    async def close(self):
+        if self._dispatcher is not None:
+            self._dispatcher.cancel()
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    # Entrega local
+
+    def deliver(self, channel, packed, strict=True):
+        """Encola el mensaje en un canal local; los grupos ignoran canales llenos."""
+        queue = self.channels.get(channel)
+        if queue is None:
+            queue = self.channels[channel] = asyncio.Queue(maxsize=self.layer.get_capacity(channel))
+        try:
+            queue.put_nowait((time.time() + self.layer.expiry, packed))
+        except asyncio.QueueFull:
+            if strict:
+                raise ChannelFull(channel)
+
+    def deliver_group(self, group, packed):
+        for channel in list(self.groups.get(group, ())):
+            self.deliver(channel, packed, strict=False)
+
+    # Publicación por lotes
+
+    async def publish(self, name, envelope):
+        """Publica un sobre en un canal de Postgres, agrupado con los de esta vuelta del loop."""
+        if self._batch is None:
+            self._batch = ([], self.loop.create_future())
+            self.loop.create_task(self._flush())
+        items, done = self._batch
+        items.append((name, envelope))
+        await asyncio.shield(done)
+
+    async def _flush(self):
+        items, done = self._batch
+        self._batch = None
+        self._flushing += 1
+        try:
+            await self._notify(items)
+        except Exception as exc:
+            done.set_exception(exc)
+        else:
+            done.set_result(None)
+        finally:
+            self._flushing -= 1
+            # Un nodo sin canales ni grupos que escuchar no retiene la conexión
+            if not self._flushing and self._batch is None and not self.listening and self.connection is not None:
+                self.connection.close()
+                self.connection = None
+
+    async def _notify(self, items):
+        connection = await self.get_connection()
+        table = self.layer.table_name()
+
+        # Los sobres que no caben en un NOTIFY van a la tabla auxiliar
+        oversized = [index for index, (_, envelope) in enumerate(items) if len(envelope) * 4 // 3 > NOTIFY_MAX_PAYLOAD]
+        if oversized:
+            rows = await connection.execute(
+                f'INSERT INTO "{table}" (payload, created_at) '
+                f'SELECT p, now() FROM unnest(%s::bytea[]) AS p RETURNING id',
+                ([psycopg2.Binary(items[index][1]) for index in oversized],),
+                fetch=True
+            )
+            for index, (row_id,) in zip(oversized, rows):
+                items[index] = (items[index][0], msgpack.packb({'ref': row_id}))
+            await self._cleanup(connection, table)
+
+        # Varios sobres para un mismo canal comparten NOTIFY mientras quepan
+        payloads = []
+        by_channel = {}
+        for name, envelope in items:
+            by_channel.setdefault(name, []).append(envelope)
+        for name, envelopes in by_channel.items():
+            chunk, size = [], 0
+            for envelope in envelopes:
+                if chunk and (size + len(envelope) + 8) * 4 // 3 > NOTIFY_MAX_PAYLOAD:
+                    payloads.append((name, chunk))
+                    chunk, size = [], 0
+                chunk.append(envelope)
+                size += len(envelope) + 8
+            payloads.append((name, chunk))
+
+        sql = 'SELECT ' + ', '.join(['pg_notify(%s, %s)'] * len(payloads))
+        params = []
+        for name, chunk in payloads:
+            params.extend([name, base64.b64encode(msgpack.packb(chunk)).decode()])
+        await connection.execute(sql, params)
+
+    async def _cleanup(self, connection, table):
+        now = time.monotonic()
+        if now - self._last_cleanup < self.layer.expiry:
+            return
+        self._last_cleanup = now
+        await connection.execute(
+            f'DELETE FROM "{table}" WHERE created_at < now() - make_interval(secs => %s)',
+            (self.layer.expiry,)
+        )
+
+    # Recepción
+
+    def _on_notify(self, channel, payload):
+        self._inbox.put_nowait(payload)
+
+    async def _dispatch(self):
+        """Procesa las notificaciones en orden, resolviendo las referencias a la tabla auxiliar."""
+        while True:
+            payload = await self._inbox.get()
+            try:
+                for envelope in msgpack.unpackb(base64.b64decode(payload)):
+                    envelope = msgpack.unpackb(envelope)
+                    if 'ref' in envelope:
+                        envelope = await self._fetch(envelope['ref'])
+                        if envelope is None:
+                            continue
+                    self._route(envelope)
+            except Exception:
+                logger.exception("Notificación inválida en la capa de canales")
+
+    async def _fetch(self, row_id):
+        connection = await self.get_connection()
+        rows = await connection.execute(
+            f'SELECT payload FROM "{self.layer.table_name()}" WHERE id = %s', (row_id,), fetch=True
+        )
+        if not rows:
+            logger.warning("Mensaje %s de la capa de canales vencido antes de leerse", row_id)
+            return None
+        return msgpack.unpackb(bytes(rows[0][0]))
+
+    def _route(self, envelope):
+        # Lo publicado por este nodo ya se entregó localmente
+        if envelope['node'] == self.id:
+            return
+        if envelope.get('group') is not None:
+            self.deliver_group(envelope['group'], envelope['message'])
+        elif envelope['channel'] in self.channels or self.owns(envelope['channel']):
+            self.deliver(envelope['channel'], envelope['message'], strict=False)
+
+
+class PostgresChannelLayer(BaseChannelLayer):
+    """
+    Capa de canales que usa LISTEN/NOTIFY de la base de datos de Django.
+
+    CONFIG acepta `database` (alias en DATABASES, por defecto `default`),
+    además de `expiry`, `group_expiry`, `capacity` y `channel_capacity`
+    como las demás capas.
+    """
+
+    extensions = ['groups', 'flush']
+
+    def __init__(self, database='default', expiry=60, group_expiry=86400, capacity=100,
+                 channel_capacity=None, **kwargs):
+        super().__init__(expiry=expiry, capacity=capacity, channel_capacity=channel_capacity, **kwargs)
+        self.database = database
+        self.group_expiry = group_expiry
+        self.channel_capacity = self.compile_capacities(channel_capacity or {})
+        self._nodes = weakref.WeakKeyDictionary()
+
+    def connection_params(self):
+        params = connections[self.database].get_connection_params()
+        # El cursor de Django no aplica a la conexión asíncrona
+        params.pop('cursor_factory', None)
+        return params
+
+    def table_name(self):
+        from ..models import ChannelLayerMessage
+
+        return ChannelLayerMessage._meta.db_table
+
+    def _node(self):
+        loop = asyncio.get_running_loop()
+        node = self._nodes.get(loop)
+        if node is None:
+            node = self._nodes[loop] = _Node(self, loop)
+        return node
+
+    @staticmethod
+    def _envelope(node, packed, channel=None, group=None):
+        return msgpack.packb({'node': node.id, 'channel': channel, 'group': group, 'message': packed})
+
+    # API de la capa
+
+    async def send(self, channel, message):
+        assert isinstance(message, dict), "message is not a dict"
+        self.require_valid_channel_name(channel)
+        assert "__asgi_channel__" not in message
+
+        node = self._node()
+        packed = msgpack.packb(message)
+        if node.owns(channel) or channel in node.channels:
+            node.deliver(channel, packed)
+            return
+        await node.publish(
+            pg_channel(self.non_local_name(channel)),
+            self._envelope(node, packed, channel=channel)
+        )
+
+    async def receive(self, channel):
+        self.require_valid_channel_name(channel)
+        node = self._node()
+        general = not node.owns(channel)
+        if general:
+            await node.listen(pg_channel(channel))
+        elif pg_channel(self.non_local_name(channel)) not in node.listening:
+            # Los canales específicos del nodo se escuchan mientras viva el nodo
+            await node.listen(pg_channel(self.non_local_name(channel)))
+
+        queue = node.channels.get(channel)
+        if queue is None:
+            queue = node.channels[channel] = asyncio.Queue(maxsize=self.get_capacity(channel))
+        try:
+            while True:
+                expires, packed = await queue.get()
+                if expires >= time.time():
+                    return msgpack.unpackb(packed)
+        finally:
+            if queue.empty():
+                node.channels.pop(channel, None)
+            if general:
+                await node.unlisten(pg_channel(channel))
+
+    async def new_channel(self, prefix='specific.'):
+        node = self._node()
+        return '%s.%s%s' % (
+            prefix, node.prefix, ''.join(random.choice(string.ascii_letters) for _ in range(12))
+        )
+
+    async def flush(self):
+        """Descarta el estado del nodo de este loop (cerrando su conexión) y los mensajes guardados."""
+        node = self._node()
+        try:
+            connection = await node.get_connection()
+            await connection.execute(f'DELETE FROM "{self.table_name()}"')
+        finally:
+            self._nodes.pop(node.loop, None)
+            await node.close()
+
+    async def close(self):
+        node = self._nodes.pop(asyncio.get_running_loop(), None)
+        if node is not None:
+            await node.close()
+
+    # Grupos
+
+    async def group_add(self, group, channel):
+        self.require_valid_group_name(group)
+        self.require_valid_channel_name(channel)
+        node = self._node()
+        members = node.groups.setdefault(group, {})
+        is_new = channel not in members
+        members[channel] = time.time()
+        if is_new and len(members) == 1:
+            await node.listen(pg_channel(group))
+
+    async def group_discard(self, group, channel):
+        self.require_valid_channel_name(channel)
+        self.require_valid_group_name(group)
+        node = self._node()
+        members = node.groups.get(group)
+        if not members or members.pop(channel, None) is None:
+            return
+        if not members:
+            node.groups.pop(group, None)
+            await node.unlisten(pg_channel(group))
+
+    async def group_send(self, group, message):
+        assert isinstance(message, dict), "Message is not a dict"
+        self.require_valid_group_name(group)
+        node = self._node()
+        await self._expire_group(node, group)
+
+        packed = msgpack.packb(message)
+        node.deliver_group(group, packed)
+        await node.publish(pg_channel(group), self._envelope(node, packed, group=group))
+
+    async def _expire_group(self, node, group):
+        """Quita del grupo destino los miembros locales más viejos que `group_expiry`."""
+        members = node.groups.get(group)
+        if not members:
+            return
+        timeout = time.time() - self.group_expiry
+        expired = [channel for channel, joined_at in members.items() if joined_at < timeout]
+        for channel in expired:
+            await self.group_discard(group, channel)
@@ -0,0 +1,430 @@
+"""
+Registro de presencia de usuarios por diagrama.
+
+Cada conexión WebSocket (canal) se registra con los datos públicos del usuario
+y un latido (heartbeat). Los canales cuyo último latido supera el TTL se
+consideran caídos y se eliminan con `expire`. Las operaciones devuelven
+únicamente lo necesario para emitir deltas de entrada/salida.
+
+El almacén también guarda los leases de edición por elemento: un lease
+pertenece a un canal, se renueva con sus latidos y vence si el canal deja
+de latir, sin escrituras en la base de datos.
+"""
+import json
+import time
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+DEFAULT_PRESENCE_BACKEND = 'Apps.collaboration.realtime.presence.InMemoryPresenceStore'
+
+
+def _public_lease(element_id, entry):
+    """Lease tal como se envía a los clientes (sin el canal dueño)."""
+    return {'elementId': element_id, 'user': entry['user']}
+
+
+def _unique_users(users):
+    """Deduplica usuarios por id (un usuario puede tener varias pestañas abiertas)."""
+    unique = {}
+    for user in users:
+        unique.setdefault(user['id'], user)
+    return list(unique.values())
+
+
+class BasePresenceStore:
+    """Interfaz común de los almacenes de presencia."""
+
+    def __init__(self, ttl=60, lease_ttl=None, **kwargs):
+        self.ttl = ttl
+        self.lease_ttl = lease_ttl or ttl
+
+    async def join(self, diagram_id, channel_name, user):
+        """Registra el canal. Retorna True si es la primera conexión del usuario."""
+        raise NotImplementedError
+
+    async def leave(self, diagram_id, channel_name):
+        """Elimina el canal. Retorna el usuario si ya no le quedan conexiones."""
+        raise NotImplementedError
+
+    async def touch(self, diagram_id, channel_name, user=None):
+        """
+        Renueva el latido del canal y sus leases. Con `user`, un canal que ya
+        se había expirado vuelve a registrarse; retorna True si con eso el
+        usuario vuelve a estar presente (como en `join`).
+        """
+        raise NotImplementedError
+
+    async def users(self, diagram_id):
+        """Lista de usuarios activos (únicos) en el diagrama."""
+        raise NotImplementedError
+
+    async def expire(self, diagram_id):
+        """Elimina canales sin latido. Retorna los usuarios que quedaron fuera."""
+        raise NotImplementedError
+
+    async def acquire_lease(self, diagram_id, element_id, channel_name, user):
+        """
+        Toma o renueva el lease del elemento para el canal. Retorna
+        `(granted, lease)`; si no se otorga, `lease` es el del dueño actual.
+        """
+        raise NotImplementedError
+
+    async def release_lease(self, diagram_id, element_id, channel_name):
+        """Libera el lease si pertenece al canal. Retorna True si se liberó."""
+        raise NotImplementedError
+
+    async def release_channel_leases(self, diagram_id, channel_name):
+        """Libera todos los leases del canal. Retorna los ids de los elementos."""
+        raise NotImplementedError
+
+    async def expire_leases(self, diagram_id):
+        """Elimina leases vencidos. Retorna los ids de los elementos."""
+        raise NotImplementedError
+
+    async def leases(self, diagram_id):
+        """Leases vigentes del diagrama."""
+        raise NotImplementedError
+
+
+class InMemoryPresenceStore(BasePresenceStore):
+    """
+    Presencia en memoria del proceso.
+
+    Solo es correcta con un único worker; se usa en desarrollo y como
+    valor por defecto.
+    """
+
+    def __init__(self, ttl=60, **kwargs):
+        super().__init__(ttl=ttl, **kwargs)
+        # {diagram_id: {channel_name: {'user': {...}, 'seen': float}}}
+        self._rooms = {}
+        # {diagram_id: {element_id: {'user': {...}, 'channel': str, 'expires': float}}}
+        self._leases = {}
+
+    def _has_user(self, room, user_id, since=None):
+        return any(
+            entry['user']['id'] == user_id and (since is None or entry['seen'] >= since)
+            for entry in room.values()
+        )
+
+    async def join(self, diagram_id, channel_name, user):
+        room = self._rooms.setdefault(diagram_id, {})
+        # Los canales sin latido que aún no se expiraron no cuentan como conexiones
+        is_first = not self._has_user(room, user['id'], since=time.monotonic() - self.ttl)
+        room[channel_name] = {'user': user, 'seen': time.monotonic()}
+        return is_first
+
+    async def leave(self, diagram_id, channel_name):
+        room = self._rooms.get(diagram_id)
+        if not room or channel_name not in room:
+            return None
+
+        user = room.pop(channel_name)['user']
+        if not room:
+            del self._rooms[diagram_id]
+            return user
+        return None if self._has_user(room, user['id']) else user
+
+    async def touch(self, diagram_id, channel_name, user=None):
+        rejoined = False
+        entry = self._rooms.get(diagram_id, {}).get(channel_name)
+        if entry:
+            entry['seen'] = time.monotonic()
+        elif user is not None:
+            rejoined = await self.join(diagram_id, channel_name, user)
+        expires = time.monotonic() + self.lease_ttl
+        for lease in self._leases.get(diagram_id, {}).values():
+            if lease['channel'] == channel_name:
+                lease['expires'] = expires
+        return rejoined
+
+    async def users(self, diagram_id):
+        room = self._rooms.get(diagram_id, {})
+        return _unique_users(entry['user'] for entry in room.values())
+
+    async def expire(self, diagram_id):
+        room = self._rooms.get(diagram_id)
+        if not room:
+            return []
+
+        deadline = time.monotonic() - self.ttl
+        expired = [name for name, entry in room.items() if entry['seen'] < deadline]
+        gone = []
+        for channel_name in expired:
+            user = await self.leave(diagram_id, channel_name)
+            if user:
+                gone.append(user)
+        return gone
+
+    async def acquire_lease(self, diagram_id, element_id, channel_name, user):
+        leases = self._leases.setdefault(diagram_id, {})
+        now = time.monotonic()
+        current = leases.get(element_id)
+        if current and current['channel'] != channel_name and current['expires'] > now:
+            return False, _public_lease(element_id, current)
+
+        leases[element_id] = {'user': user, 'channel': channel_name, 'expires': now + self.lease_ttl}
+        return True, _public_lease(element_id, leases[element_id])
+
+    async def release_lease(self, diagram_id, element_id, channel_name):
+        leases = self._leases.get(diagram_id, {})
+        current = leases.get(element_id)
+        if not current or current['channel'] != channel_name:
+            return False
+        del leases[element_id]
+        if not leases:
+            self._leases.pop(diagram_id, None)
+        return True
+
+    def _drop_leases(self, diagram_id, predicate):
+        leases = self._leases.get(diagram_id)
+        if not leases:
+            return []
+        dropped = [element_id for element_id, lease in leases.items() if predicate(lease)]
+        for element_id in dropped:
+            del leases[element_id]
+        if not leases:
+            self._leases.pop(diagram_id, None)
+        return dropped
+
+    async def release_channel_leases(self, diagram_id, channel_name):
+        return self._drop_leases(diagram_id, lambda lease: lease['channel'] == channel_name)
+
+    async def expire_leases(self, diagram_id):
+        now = time.monotonic()
+        return self._drop_leases(diagram_id, lambda lease: lease['expires'] <= now)
+
+    async def leases(self, diagram_id):
+        now = time.monotonic()
+        return [
+            _public_lease(element_id, lease)
+            for element_id, lease in self._leases.get(diagram_id, {}).items()
+            if lease['expires'] > now
+        ]
+
+
+class RedisPresenceStore(BasePresenceStore):
+    """
+    Presencia compartida entre procesos sobre Redis (o cualquier servidor
+    compatible con el protocolo de Redis).
+
+    Por diagrama se guardan tres claves:
+    - HASH `<prefix>:<diagram>:channels` canal -> usuario en JSON
+    - ZSET `<prefix>:<diagram>:seen` canal -> timestamp del último latido
+    - HASH `<prefix>:<diagram>:leases` elemento -> lease en JSON
+
+    Las claves expiran solas si ningún canal renueva su latido. Los leases
+    se modifican con scripts Lua para que tomar uno sea atómico.
+    """
+
+    ACQUIRE_LEASE = """
+    local current = redis.call('HGET', KEYS[1], ARGV[1])
+    if current then
+        local lease = cjson.decode(current)
+        if lease.channel ~= ARGV[2] and tonumber(lease.expires) > tonumber(ARGV[3]) then
+            return {0, current}
+        end
+    end
+    redis.call('HSET', KEYS[1], ARGV[1], ARGV[4])
+    redis.call('EXPIRE', KEYS[1], ARGV[5])
+    return {1, ARGV[4]}
+    """
+
+    RELEASE_LEASE = """
+    local current = redis.call('HGET', KEYS[1], ARGV[1])
+    if current and cjson.decode(current).channel == ARGV[2] then
+        return redis.call('HDEL', KEYS[1], ARGV[1])
+    end
+    return 0
+    """
+
+    # Renueva los leases del canal ARGV[1] hasta ARGV[2]
+    RENEW_LEASES = """
+    local entries = redis.call('HGETALL', KEYS[1])
+    for i = 1, #entries, 2 do
+        local lease = cjson.decode(entries[i + 1])
+        if lease.channel == ARGV[1] then
+            lease.expires = tonumber(ARGV[2])
+            redis.call('HSET', KEYS[1], entries[i], cjson.encode(lease))
+        end
+    end
+    if #entries > 0 then
+        redis.call('EXPIRE', KEYS[1], ARGV[3])
+    end
+    return 0
+    """
+
+    # Elimina los leases del canal ARGV[1] (si no es vacío) o vencidos antes de ARGV[2]
+    DROP_LEASES = """
+    local entries = redis.call('HGETALL', KEYS[1])
+    local dropped = {}
+    for i = 1, #entries, 2 do
+        local lease = cjson.decode(entries[i + 1])
+        if (ARGV[1] ~= '' and lease.channel == ARGV[1]) or tonumber(lease.expires) <= tonumber(ARGV[2]) then
+            redis.call('HDEL', KEYS[1], entries[i])
+            table.insert(dropped, entries[i])
+        end
+    end
+    return dropped
+    """
+
+    def __init__(self, ttl=60, url='redis://localhost:6379', prefix='presence', **kwargs):
+        super().__init__(ttl=ttl, **kwargs)
+        import redis.asyncio as redis
+
+        self.prefix = prefix
+        self._redis = redis.Redis.from_url(url, decode_responses=True)
+        self._acquire_lease = self._redis.register_script(self.ACQUIRE_LEASE)
+        self._release_lease = self._redis.register_script(self.RELEASE_LEASE)
+        self._renew_leases = self._redis.register_script(self.RENEW_LEASES)
+        self._drop_leases = self._redis.register_script(self.DROP_LEASES)
+
+    def _keys(self, diagram_id):
+        base = f'{self.prefix}:{diagram_id}'
+        return f'{base}:channels', f'{base}:seen'
+
+    def _leases_key(self, diagram_id):
+        return f'{self.prefix}:{diagram_id}:leases'
+
+    def _refresh_keys(self, pipe, channels_key, seen_key):
+        key_ttl = max(int(self.ttl * 2), 1)
+        pipe.expire(channels_key, key_ttl)
+        pipe.expire(seen_key, key_ttl)
+
+    async def join(self, diagram_id, channel_name, user):
+        channels_key, seen_key = self._keys(diagram_id)
+        now = time.time()
+        async with self._redis.pipeline(transaction=True) as pipe:
+            pipe.hset(channels_key, channel_name, json.dumps(user))
+            pipe.zadd(seen_key, {channel_name: now})
+            self._refresh_keys(pipe, channels_key, seen_key)
+            pipe.hgetall(channels_key)
+            pipe.zrangebyscore(seen_key, now - self.ttl, '+inf')
+            *_, entries, alive = await pipe.execute()
+
+        return self._only_connection(user, channel_name, entries, alive)
+
+    @staticmethod
+    def _only_connection(user, channel_name, entries, alive):
+        """True si el canal es la única conexión viva del usuario (los canales sin latido no cuentan)."""
+        alive = set(alive)
+        return not any(
+            json.loads(raw)['id'] == user['id']
+            for other, raw in entries.items()
+            if other != channel_name and other in alive
+        )
+
+    async def leave(self, diagram_id, channel_name):
+        channels_key, seen_key = self._keys(diagram_id)
+        async with self._redis.pipeline(transaction=True) as pipe:
+            pipe.hget(channels_key, channel_name)
+            pipe.hdel(channels_key, channel_name)
+            pipe.zrem(seen_key, channel_name)
+            pipe.hvals(channels_key)
+            raw_user, _, _, remaining = await pipe.execute()
+
+        if raw_user is None:
+            return None
+        user = json.loads(raw_user)
+        if any(json.loads(u)['id'] == user['id'] for u in remaining):
+            return None
+        return user
+
+    async def touch(self, diagram_id, channel_name, user=None):
+        channels_key, seen_key = self._keys(diagram_id)
+        now = time.time()
+        async with self._redis.pipeline(transaction=True) as pipe:
+            if user is None:
+                pipe.zadd(seen_key, {channel_name: now}, xx=True)
+            else:
+                # Un canal expirado por otro proceso se vuelve a registrar
+                pipe.hsetnx(channels_key, channel_name, json.dumps(user))
+                pipe.zadd(seen_key, {channel_name: now})
+                pipe.hgetall(channels_key)
+                pipe.zrangebyscore(seen_key, now - self.ttl, '+inf')
+            self._refresh_keys(pipe, channels_key, seen_key)
+            results = await pipe.execute()
+        await self._renew_leases(
+            keys=[self._leases_key(diagram_id)],
+            args=[channel_name, now + self.lease_ttl, max(int(self.lease_ttl * 2), 1)]
+        )
+        if user is None or not results[0]:
+            return False
+        return self._only_connection(user, channel_name, results[2], results[3])
+
+    async def users(self, diagram_id):
+        channels_key, seen_key = self._keys(diagram_id)
+        async with self._redis.pipeline(transaction=False) as pipe:
+            pipe.hgetall(channels_key)
+            pipe.zrangebyscore(seen_key, time.time() - self.ttl, '+inf')
+            entries, alive = await pipe.execute()
+
+        alive = set(alive)
+        return _unique_users(
+            json.loads(raw) for channel_name, raw in entries.items() if channel_name in alive
+        )
+
+    async def expire(self, diagram_id):
+        channels_key, seen_key = self._keys(diagram_id)
+        expired = await self._redis.zrangebyscore(seen_key, '-inf', time.time() - self.ttl)
+        if not expired:
+            return []
+
+        async with self._redis.pipeline(transaction=True) as pipe:
+            pipe.hmget(channels_key, expired)
+            pipe.hdel(channels_key, *expired)
+            pipe.zrem(seen_key, *expired)
+            pipe.hvals(channels_key)
+            raw_users, _, _, remaining = await pipe.execute()
+
+        remaining_ids = {json.loads(u)['id'] for u in remaining}
+        gone = [json.loads(raw) for raw in raw_users if raw is not None]
+        return [user for user in _unique_users(gone) if user['id'] not in remaining_ids]
+
+    async def acquire_lease(self, diagram_id, element_id, channel_name, user):
+        lease = {'user': user, 'channel': channel_name, 'expires': time.time() + self.lease_ttl}
+        granted, raw = await self._acquire_lease(
+            keys=[self._leases_key(diagram_id)],
+            args=[element_id, channel_name, time.time(), json.dumps(lease), max(int(self.lease_ttl * 2), 1)]
+        )
+        return bool(granted), _public_lease(element_id, json.loads(raw))
+
+    async def release_lease(self, diagram_id, element_id, channel_name):
+        released = await self._release_lease(
+            keys=[self._leases_key(diagram_id)], args=[element_id, channel_name]
+        )
+        return bool(released)
+
+    async def release_channel_leases(self, diagram_id, channel_name):
+        return await self._drop_leases(keys=[self._leases_key(diagram_id)], args=[channel_name, 0])
+
+    async def expire_leases(self, diagram_id):
+        return await self._drop_leases(keys=[self._leases_key(diagram_id)], args=['', time.time()])
+
+    async def leases(self, diagram_id):
+        entries = await self._redis.hgetall(self._leases_key(diagram_id))
+        now = time.time()
+        return [
+            _public_lease(element_id, lease)
+            for element_id, lease in ((element_id, json.loads(raw)) for element_id, raw in entries.items())
+            if lease['expires'] > now
+        ]
+
+
+_presence_store = None
+
+
+def get_presence_store():
+    """Retorna la instancia del almacén configurado en `COLLAB_PRESENCE` (una por proceso)."""
+    global _presence_store
+    if _presence_store is None:
+        config = getattr(settings, 'COLLAB_PRESENCE', {})
+        backend = import_string(config.get('BACKEND', DEFAULT_PRESENCE_BACKEND))
+        _presence_store = backend(
+            ttl=config.get('TTL', 60),
+            lease_ttl=config.get('LEASE_TTL'),
+            **config.get('CONFIG', {})
+        )
+    return _presence_store
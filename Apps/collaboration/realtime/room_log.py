@@ -0,0 +1,54 @@
+"""
+Secuencia y buffer de repetición de los eventos de una sala.
+
+Cada evento de grupo recibe, la primera vez que el proceso lo ve, un número
+de secuencia monotónico (`seq`) que viaja dentro del mensaje. Los últimos
+frames quedan en un buffer circular para que un cliente que se reconecta
+con `last_seq` reciba solo lo que se perdió. La `epoch` identifica la vida
+de la sala en el proceso: si cambia, las secuencias anteriores no valen y
+el cliente recibe el snapshot completo.
+"""
+import uuid
+from collections import deque
+from itertools import islice
+
+from django.conf import settings
+
+from .codec import EncodedFrame, FrameCache
+
+
+class RoomLog:
+    """Numeración de eventos de la sala con buffer de los más recientes."""
+
+    def __init__(self, maxlen=None):
+        maxlen = maxlen if maxlen is not None else getattr(settings, 'COLLAB_REPLAY_BUFFER_SIZE', 1000)
+        self.epoch = uuid.uuid4().hex[:12]
+        self.last_seq = 0
+        self._buffer = deque(maxlen=maxlen)
+        self._frames = FrameCache(maxsize=max(maxlen, 256))
+
+    def ingest(self, event):
+        """
+        Retorna el frame del evento; la primera vez le asigna la siguiente
+        secuencia, lo codifica y lo guarda en el buffer.
+        """
+        event_id = event['event_id']
+        frame = self._frames.get(event_id)
+        if frame is None:
+            self.last_seq += 1
+            frame = EncodedFrame({**event['payload'], 'seq': self.last_seq}, seq=self.last_seq)
+            self._frames.put(event_id, frame)
+            self._buffer.append(frame)
+        return frame
+
+    def replay(self, last_seq):
+        """
+        Frames posteriores a `last_seq`, o None si el buffer ya no los
+        contiene (o la secuencia no corresponde a esta sala).
+        """
+        if last_seq > self.last_seq:
+            return None
+        first_seq = self._buffer[0].seq if self._buffer else self.last_seq + 1
+        if last_seq < first_seq - 1:
+            return None
+        return list(islice(self._buffer, last_seq + 1 - first_seq, None))
@@ -0,0 +1,103 @@
+"""
+Estado por sala (diagrama) dentro del proceso.
+
+Una sala existe mientras el proceso tenga al menos una conexión al
+diagrama y agrupa los componentes compartidos por esas conexiones.
+"""
+from django.conf import settings
+
+from .document import LiveDocument
+from .metrics import metrics
+from .move_batcher import MoveBatcher
+from .room_log import RoomLog
+from .spatial import SpatialIndex
+
+
+class Room:
+    """Componentes compartidos por las conexiones locales a un diagrama."""
+
+    def __init__(self, diagram_id, channel_layer, group_name):
+        self.diagram_id = diagram_id
+        self.group_name = group_name
+        self.connections = 0
+        # Secuencia y frames ya codificados de los eventos de grupo, compartidos por las conexiones locales
+        self.log = RoomLog()
+        self.document = LiveDocument(diagram_id)
+        self.move_batcher = MoveBatcher(
+            channel_layer,
+            group_name,
+            rate_hz=getattr(settings, 'COLLAB_MOVE_BATCH_HZ', 30),
+            on_send=self._apply_local_moves
+        )
+        # Rectángulos de los elementos para filtrar movimientos por viewport
+        self.spatial = SpatialIndex(diagram_id)
+
+    def _apply_local_moves(self, event, moves, senders):
+        """
+        Aplica al documento los movimientos que este proceso envía al grupo;
+        solo los que cambiaron alguna posición cuentan para el autoguardado,
+        a nombre de quien los envió. Al volver por el grupo, el `event_id` ya
+        está registrado y no se aplican de nuevo.
+        """
+        by_sender = {}
+        for move, sender_id in zip(moves, senders):
+            by_sender.setdefault(sender_id, []).append(move)
+
+        event_id = event['event_id']
+        for sender_id, sender_moves in by_sender.items():
+            applied = self.document.apply_moves(sender_moves, event_id)
+            # El evento queda registrado con el primer remitente
+            event_id = None
+            if applied:
+                self.document.mark_dirty(sender_id, applied)
+
+    async def close(self):
+        await self.move_batcher.close()
+        await self.document.close()
+
+
+class RoomRegistry:
+    """Salas activas del proceso con conteo de conexiones."""
+
+    def __init__(self):
+        self._rooms = {}
+
+    def __len__(self):
+        return len(self._rooms)
+
+    def __iter__(self):
+        return iter(list(self._rooms.values()))
+
+    def get(self, diagram_id):
+        return self._rooms.get(diagram_id)
+
+    def acquire(self, diagram_id, channel_layer, group_name):
+        """Retorna la sala del diagrama (creándola si hace falta) y registra la conexión."""
+        room = self._rooms.get(diagram_id)
+        if room is None:
+            room = self._rooms[diagram_id] = Room(diagram_id, channel_layer, group_name)
+        room.connections += 1
+        return room
+
+    async def release(self, diagram_id):
+        """Libera una conexión; la sala se cierra al quedar sin conexiones."""
+        room = self._rooms.get(diagram_id)
+        if room is None:
+            return
+        room.connections -= 1
+        if room.connections <= 0:
+            del self._rooms[diagram_id]
+            await room.close()
+
+
+rooms = RoomRegistry()
+
+metrics.register_gauge('rooms.active', lambda: len(rooms))
+metrics.register_gauge(
+    'moves.pending',
+    lambda: sum(room.move_batcher.pending_count for room in rooms)
+)
+metrics.register_gauge(
+    'documents.dirty',
+    lambda: sum(1 for room in rooms if room.document.is_dirty)
+)
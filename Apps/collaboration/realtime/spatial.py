@@ -0,0 +1,200 @@
+"""
+Índice espacial de los elementos de una sala.
+
+Guarda el rectángulo de cada elemento en una grilla de celdas fijas, de modo
+que consultar los elementos dentro de un viewport no recorre todo el
+diagrama. Se inicializa con `ModelClass.x/y/width/height` y se mantiene con
+los `move_element` que pasan por la sala.
+"""
+import asyncio
+import math
+from collections import OrderedDict
+
+from channels.db import database_sync_to_async
+from django.conf import settings
+
+from .move_batcher import element_key
+
+
+# Tamaño asumido para elementos que aparecen por primera vez en un movimiento
+DEFAULT_ELEMENT_SIZE = (200, 100)
+
+# Elementos que abarcan más celdas que esto se guardan aparte y se revisan en cada consulta
+MAX_ELEMENT_CELLS = 64
+
+
+def parse_rect(data):
+    """Rectángulo `(x0, y0, x1, y1)` desde `{x, y, width, height}`; None si no es válido."""
+    if not isinstance(data, dict):
+        return None
+    try:
+        x, y = float(data['x']), float(data['y'])
+        width, height = float(data['width']), float(data['height'])
+    except (KeyError, TypeError, ValueError):
+        return None
+    if not all(map(math.isfinite, (x, y, width, height))) or width < 0 or height < 0:
+        return None
+    return (x, y, x + width, y + height)
+
+
+def intersects(a, b):
+    return a[0] <= b[2] and b[0] <= a[2] and a[1] <= b[3] and b[1] <= a[3]
+
+
+def union(a, b):
+    return (min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3]))
+
+
+@database_sync_to_async
+def _load_class_rects(diagram_id):
+    from Apps.modeling.models import ModelClass
+
+    return list(
+        ModelClass.objects.filter(diagram_id=diagram_id).values_list('id', 'x', 'y', 'width', 'height')
+    )
+
+
+class SpatialIndex:
+    """Rectángulos por elemento indexados en una grilla."""
+
+    def __init__(self, diagram_id, cell_size=None):
+        self.diagram_id = diagram_id
+        self.cell_size = cell_size or getattr(settings, 'COLLAB_VIEWPORT_CELL_SIZE', 512)
+        self._rects = {}
+        self._cells = {}
+        self._oversized = set()
+        # Elementos con DEFAULT_ELEMENT_SIZE a la espera del tamaño real de la base
+        self._default_sized = set()
+        self._loaded = False
+        self._load_lock = asyncio.Lock()
+        # Barrido calculado por evento: todas las conexiones locales lo comparten
+        self._swept = OrderedDict()
+
+    def __len__(self):
+        return len(self._rects)
+
+    async def ensure_loaded(self):
+        """Carga los rectángulos de las clases del diagrama (una vez por sala)."""
+        if self._loaded:
+            return
+        async with self._load_lock:
+            if self._loaded:
+                return
+            for class_id, x, y, width, height in await _load_class_rects(self.diagram_id):
+                key = str(class_id)
+                current = self._rects.get(key)
+                if current is None:
+                    self._set(key, (x, y, x + width, y + height))
+                elif key in self._default_sized:
+                    # Un movimiento previo a la carga aporta la posición; la base, el tamaño
+                    self._set(key, (current[0], current[1], current[0] + width, current[1] + height))
+            self._default_sized.clear()
+            self._loaded = True
+
+    def _cell_ranges(self, rect):
+        size = self.cell_size
+        return (
+            range(int(rect[0] // size), int(rect[2] // size) + 1),
+            range(int(rect[1] // size), int(rect[3] // size) + 1),
+        )
+
+    def _cells_for(self, rect):
+        xs, ys = self._cell_ranges(rect)
+        return [(cx, cy) for cx in xs for cy in ys]
+
+    def _cell_count(self, rect):
+        xs, ys = self._cell_ranges(rect)
+        return len(xs) * len(ys)
+
+    def _set(self, element_id, rect):
+        self.remove(element_id)
+        self._rects[element_id] = rect
+        if self._cell_count(rect) > MAX_ELEMENT_CELLS:
+            self._oversized.add(element_id)
+            return
+        for cell in self._cells_for(rect):
+            self._cells.setdefault(cell, set()).add(element_id)
+
+    def remove(self, element_id):
+        self._default_sized.discard(element_id)
+        rect = self._rects.pop(element_id, None)
+        if rect is None:
+            return
+        if element_id in self._oversized:
+            self._oversized.discard(element_id)
+            return
+        for cell in self._cells_for(rect):
+            members = self._cells.get(cell)
+            if members is not None:
+                members.discard(element_id)
+                if not members:
+                    del self._cells[cell]
+
+    def rect(self, element_id):
+        return self._rects.get(element_id)
+
+    def query(self, rect):
+        """Ids y rectángulos de los elementos que intersectan `rect`."""
+        # Un viewport que abarca más celdas que elementos se resuelve recorriendo los elementos
+        if self._cell_count(rect) > len(self._rects):
+            candidates = self._rects
+        else:
+            candidates = set(self._oversized)
+            for cell in self._cells_for(rect):
+                candidates.update(self._cells.get(cell, ()))
+        return {
+            element_id: self._rects[element_id]
+            for element_id in candidates
+            if intersects(self._rects[element_id], rect)
+        }
+
+    def apply_moves(self, moves, event_id, known=None):
+        """
+        Aplica los movimientos del evento y retorna, por elemento, el
+        rectángulo barrido (posición anterior ∪ nueva). Para elementos que no
+        estaban en el índice el valor es None: se entregan a todos.
+
+        Un id que no está en el índice solo se agrega si `known(id)` lo
+        confirma (p. ej. el documento vivo), para que ids inventados por un
+        cliente no hagan crecer el índice.
+        """
+        swept = self._swept.get(event_id)
+        if swept is not None:
+            return swept
+
+        swept = {}
+        for move in moves:
+            key = element_key(move)
+            payload = move.get('payload') if isinstance(move.get('payload'), dict) else move
+            if key is None or 'x' not in payload or 'y' not in payload:
+                continue
+            key = str(key)
+            previous = self._rects.get(key)
+            if previous is None and (known is None or not known(key)):
+                swept[key] = None
+                continue
+            default_sized = key in self._default_sized
+            if previous is not None:
+                width, height = previous[2] - previous[0], previous[3] - previous[1]
+            else:
+                width, height = DEFAULT_ELEMENT_SIZE
+                default_sized = True
+            if 'width' in payload and 'height' in payload:
+                default_sized = False
+            rect = parse_rect({
+                'x': payload['x'], 'y': payload['y'],
+                'width': payload.get('width', width), 'height': payload.get('height', height),
+            })
+            if rect is None:
+                continue
+            self._set(key, rect)
+            if default_sized and not self._loaded:
+                self._default_sized.add(key)
+            else:
+                self._default_sized.discard(key)
+            swept[key] = union(previous, rect) if previous is not None else None
+
+        self._swept[event_id] = swept
+        if len(self._swept) > 1024:
+            self._swept.popitem(last=False)
+        return swept
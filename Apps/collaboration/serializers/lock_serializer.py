@@ -2,10 +2,10 @@
 Serializers para el sistema de bloqueos (locks).
 """
 from rest_framework import serializers
-from django.utils import timezone
 from datetime import timedelta
 from Apps.collaboration.models import Lock
 from Apps.modeling.models import Diagram
+from Apps.workspace.access import accessible_project_ids
 
 
 class LockSerializer(serializers.ModelSerializer):
@@ -23,12 +23,12 @@ class LockSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'diagram_id', 'diagram_name', 'project_name',
             'locked_by', 'locked_by_username', 'locked_at', 'expires_at',
-            'purpose', 'is_expired', 'time_remaining_seconds'
+            'purpose', 'fencing_token', 'is_expired', 'time_remaining_seconds'
         ]
         read_only_fields = [
             'id', 'locked_by', 'locked_at', 'expires_at',
             'diagram_name', 'project_name', 'locked_by_username',
-            'is_expired', 'time_remaining_seconds'
+            'fencing_token', 'is_expired', 'time_remaining_seconds'
         ]
     
     def get_time_remaining_seconds(self, obj):
@@ -38,37 +38,20 @@ class LockSerializer(serializers.ModelSerializer):
     
     def validate_diagram_id(self, value):
         """Valida que el diagrama exista y pueda ser bloqueado."""
-        user = self.context['request'].user
-        
-        try:
-            diagram = Diagram.objects.get(id=value)
-        except Diagram.DoesNotExist:
+        diagram = Diagram.objects.select_related('project').filter(id=value).first()
+        if diagram is None:
             raise serializers.ValidationError("El diagrama especificado no existe")
         
-        # Verificar que el usuario sea miembro de la organización del proyecto
-        from Apps.workspace.models import Membership
-        if not Membership.objects.filter(
-            organization=diagram.project.organization,
-            user=user,
-            status='active'
-        ).exists():
+        # Verificar que el usuario sea miembro de la organización del proyecto (cacheado)
+        if diagram.project_id not in accessible_project_ids(self.context['request']):
             raise serializers.ValidationError("No tienes permisos para bloquear este diagrama")
         
         # Verificar que el diagrama no esté eliminado
         if diagram.deleted_at is not None:
             raise serializers.ValidationError("No se puede bloquear un diagrama eliminado")
         
-        # Verificar que no tenga ya un bloqueo activo
-        existing_lock = Lock.objects.filter(diagram=diagram, expires_at__gt=timezone.now()).first()
-        if existing_lock:
-            if existing_lock.locked_by == user:
-                raise serializers.ValidationError("Ya tienes un bloqueo activo en este diagrama")
-            else:
-                raise serializers.ValidationError(
-                    f"El diagrama está bloqueado por {existing_lock.locked_by.username} "
-                    f"hasta {existing_lock.expires_at.strftime('%H:%M:%S')}"
-                )
-        
+        # El bloqueo vigente se resuelve al adquirir, sin consultarlo antes
+        self._diagram = diagram
         return value
     
     def validate_purpose(self, value):
@@ -81,23 +64,25 @@ class LockSerializer(serializers.ModelSerializer):
         return value or 'editing'
     
     def create(self, validated_data):
-        """Crea un nuevo bloqueo con limpieza automática de expirados."""
-        diagram_id = validated_data.pop('diagram_id')
+        """
+        Adquiere el bloqueo con `Lock.acquire`; si el usuario ya lo tenía, lo renueva.
+        """
         user = self.context['request'].user
-        
-        # Limpiar bloqueos expirados antes de crear uno nuevo
-        Lock.cleanup_expired_locks()
-        
-        # Obtener el diagrama
-        diagram = Diagram.objects.get(id=diagram_id)
-        
-        # Crear el bloqueo
-        lock = Lock.objects.create(
-            diagram=diagram,
-            locked_by=user,
-            **validated_data
+        lock, granted = Lock.acquire(
+            validated_data['diagram_id'],
+            user.id,
+            purpose=validated_data.get('purpose') or 'editing'
         )
         
+        if not granted:
+            raise serializers.ValidationError({'diagram_id': [
+                f"El diagrama está bloqueado por {lock.locked_by.username} "
+                f"hasta {lock.expires_at.strftime('%H:%M:%S')}"
+            ]})
+        
+        # Evita volver a consultar el diagrama y el usuario al serializar la respuesta
+        lock.diagram = self._diagram
+        lock.locked_by = user
         return lock
 
 
@@ -120,13 +105,13 @@ class LockDetailSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'diagram_id', 'diagram_name', 'project_id', 'project_name',
             'organization_name', 'locked_by', 'locked_by_username', 'locked_by_email',
-            'locked_at', 'expires_at', 'purpose', 'is_expired',
+            'locked_at', 'expires_at', 'purpose', 'fencing_token', 'is_expired',
             'time_remaining_seconds', 'duration_seconds'
         ]
         read_only_fields = [
             'id', 'diagram_id', 'diagram_name', 'project_id', 'project_name',
             'organization_name', 'locked_by', 'locked_by_username', 'locked_by_email',
-            'locked_at', 'expires_at', 'purpose', 'is_expired',
+            'locked_at', 'expires_at', 'purpose', 'fencing_token', 'is_expired',
             'time_remaining_seconds', 'duration_seconds'
         ]
     
@@ -0,0 +1,14 @@
+"""
+Señales de la app collaboration.
+"""
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .middleware import invalidate_user_projection
+
+
+@receiver([post_save, post_delete], sender=settings.AUTH_USER_MODEL)
+def invalidate_user_projection_cache(sender, instance, **kwargs):
+    """Un cambio de username, email o estado del usuario invalida su proyección."""
+    invalidate_user_projection(instance.pk)
@@ -1,3 +1,29 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
 from django.test import TestCase
+from django.utils import timezone
+
+from Apps.collaboration.models import LockReaperStatus
+
+
+class LockReaperStatusTests(TestCase):
+    """Resumen de `reap_expired_locks` visible desde otros procesos."""
+
+    def test_command_records_last_run(self):
+        """Cada pasada reemplaza la fila del resumen."""
+        self.assertIsNone(LockReaperStatus.last_run())
+        call_command('reap_expired_locks', stdout=StringIO())
+        call_command('reap_expired_locks', stdout=StringIO())
+
+        self.assertEqual(LockReaperStatus.objects.count(), 1)
+        last_run = LockReaperStatus.last_run()
+        self.assertEqual(last_run['deleted'], 0)
+        self.assertFalse(last_run['stale'])
 
-# Create your tests here.
+    def test_old_run_is_stale(self):
+        """Sin pasadas en tres intervalos (o una hora) el resumen se marca como vencido."""
+        LockReaperStatus.record(deleted=3, duration_ms=1.0, interval=60)
+        LockReaperStatus.objects.update(finished_at=timezone.now() - timedelta(hours=2))
+        self.assertTrue(LockReaperStatus.last_run()['stale'])
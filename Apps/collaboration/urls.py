@@ -26,6 +26,9 @@ urlpatterns = [
     path('diagrams/<uuid:diagram_id>/join/', views.join_diagram, name='join_diagram'),
     path('diagrams/<uuid:diagram_id>/members/', views.diagram_members, name='diagram_members'),
     
+    # Métricas de WebSocket (solo administradores)
+    path('realtime/metrics/', views.realtime_metrics, name='realtime_metrics'),
+
     # Endpoint legacy (mantener por compatibilidad)
     path('my-diagrams/', views.my_diagrams, name='my_diagrams_legacy'),
 
@@ -1,11 +1,13 @@
 from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
 from Apps.modeling.models import Diagram
 from Apps.workspace.models import ProjectMember, Project
 from django.contrib.auth import get_user_model
+from .models import LockReaperStatus
+from .realtime import metrics
 
 User = get_user_model()
 
@@ -28,7 +30,7 @@ def my_projects(request):
             {
                 'id': diagram.id,
                 'name': diagram.name,
-                'current_version': diagram.current_version,
+                'current_version': diagram.current_version_id,
                 'created_by': diagram.created_by.username,
                 'created_at': diagram.created_at
             }
@@ -78,7 +80,7 @@ def project_diagrams(request, project_id):
         {
             'id': diagram.id,
             'name': diagram.name,
-            'current_version': diagram.current_version,
+            'current_version': diagram.current_version_id,
             'created_by': {
                 'id': diagram.created_by.id,
                 'username': diagram.created_by.username
@@ -201,4 +203,13 @@ def my_diagrams(request):
         'message': 'Considera usar /api/my-projects/ para mejor experiencia',
         'projects': list(projects_with_diagrams.values()),
         'total_projects': len(projects_with_diagrams)
-    })
\ No newline at end of file
+    })
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def realtime_metrics(request):
+    """
+    Métricas de la capa de tiempo real del proceso que atiende la petición y
+    la última pasada del reaper de bloqueos (guardada en la base de datos).
+    """
+    return Response({**metrics.snapshot(), 'lock_reaper': LockReaperStatus.last_run()})
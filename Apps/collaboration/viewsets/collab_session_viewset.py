@@ -6,6 +6,7 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from ..models import CollabSession
 from ..serializers import CollabSessionSerializer
+from Apps.workspace.access import accessible_project_ids
 
 
 class CollabSessionViewSet(viewsets.ModelViewSet):
@@ -23,8 +24,7 @@ class CollabSessionViewSet(viewsets.ModelViewSet):
         
         # Filtrar por diagramas de proyectos donde el usuario tiene acceso
         return CollabSession.objects.filter(
-            diagram__project__organization__membership__user=user,
-            diagram__project__organization__membership__status='active'
+            diagram__project_id__in=accessible_project_ids(self.request)
         )
     
     @action(detail=True, methods=['post'])
@@ -6,6 +6,7 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from ..models import Comment
 from ..serializers import CommentSerializer
+from Apps.workspace.access import accessible_project_ids
 
 
 class CommentViewSet(viewsets.ModelViewSet):
@@ -23,8 +24,7 @@ class CommentViewSet(viewsets.ModelViewSet):
         
         # Filtrar por proyectos donde el usuario tiene acceso
         return Comment.objects.filter(
-            project__organization__membership__user=user,
-            project__organization__membership__status='active'
+            project_id__in=accessible_project_ids(self.request)
         )
     
     def perform_create(self, serializer):
@@ -23,6 +23,21 @@ from Apps.collaboration.permissions import (
     CanListLocks,
     CanExtendLock
 )
+from Apps.collaboration.realtime import publish_diagram_event
+from Apps.common.pagination import EstimatedCountCursorPagination
+from Apps.workspace.access import accessible_project_ids
+
+
+def lock_event_payload(lock):
+    """Datos del bloqueo que se difunden a la sala del diagrama."""
+    return {
+        'lockId': str(lock.id),
+        'diagramId': str(lock.diagram_id),
+        'lockedBy': {'id': str(lock.locked_by_id), 'username': lock.locked_by.username},
+        'purpose': lock.purpose,
+        'expiresAt': lock.expires_at.isoformat(),
+        'fencingToken': lock.fencing_token,
+    }
 
 
 class LockViewSet(viewsets.ModelViewSet):
@@ -46,6 +61,7 @@ class LockViewSet(viewsets.ModelViewSet):
     filterset_fields = ['diagram', 'locked_by', 'purpose']
     ordering_fields = ['locked_at', 'expires_at']
     ordering = ['-locked_at']
+    pagination_class = EstimatedCountCursorPagination
     
     def get_serializer_class(self):
         """Retorna el serializer apropiado según la acción."""
@@ -74,20 +90,19 @@ class LockViewSet(viewsets.ModelViewSet):
         return [permission() for permission in permission_classes]
     
     def get_queryset(self):
-        """Filtra bloqueos según los permisos del usuario y limpia expirados."""
-        # Limpiar bloqueos expirados automáticamente
-        Lock.cleanup_expired_locks()
+        """Filtra bloqueos vigentes según los permisos del usuario."""
+        # Los expirados quedan fuera con el índice de expires_at; los elimina `reap_expired_locks`
+        queryset = self.queryset.filter(expires_at__gt=timezone.now())
         
         user = self.request.user
         
         if user.is_superuser:
-            return self.queryset
+            return queryset
         
         # Solo bloqueos de diagramas en proyectos donde el usuario es miembro
-        return self.queryset.filter(
-            diagram__project__organization__membership__user=user,
-            diagram__project__organization__membership__status='active'
-        ).distinct()
+        return queryset.filter(
+            diagram__project_id__in=accessible_project_ids(self.request)
+        )
     
     @extend_schema(
         operation_id='create_lock',
@@ -100,11 +115,14 @@ class LockViewSet(viewsets.ModelViewSet):
         - Solo un bloqueo activo por diagrama
         - El creador puede extender o liberar el bloqueo
         - Los admins pueden liberar cualquier bloqueo
+        - Cada concesión trae un `fencing_token` creciente; las versiones
+          creadas con él se rechazan si el bloqueo pasó a otra concesión
         
         **Validaciones:**
         - El usuario debe ser miembro del proyecto
         - El diagrama debe existir y no estar eliminado
-        - No debe existir un bloqueo activo en el diagrama
+        - No debe existir un bloqueo activo de otro usuario en el diagrama
+          (si el bloqueo activo es del mismo usuario, se renueva)
         
         **Propósitos válidos:**
         - editing: Edición del diagrama (por defecto)
@@ -137,7 +155,7 @@ class LockViewSet(viewsets.ModelViewSet):
         - `purpose`: Propósito del bloqueo
         
         **Nota:** Solo se muestran bloqueos no expirados. 
-        Los bloqueos expirados se limpian automáticamente.
+        Los bloqueos expirados se eliminan periódicamente con `reap_expired_locks`.
         ''',
         parameters=[
             OpenApiParameter(
@@ -296,16 +314,35 @@ class LockViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(data=request.data)
         if serializer.is_valid():
             minutes = serializer.validated_data['minutes']
-            lock.extend_lock(minutes)
+            renewed, granted = Lock.acquire(
+                lock.diagram_id, request.user.id, purpose=lock.purpose, minutes=minutes
+            )
+            if not granted:
+                # Expiró entre la lectura y la renovación y otro usuario lo tomó
+                return Response(
+                    {'error': 'No se puede extender un bloqueo expirado'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            # Si expiró justo antes, `renewed` es una concesión nueva (otro id y token)
+            renewed.diagram = lock.diagram
+            renewed.locked_by = lock.locked_by
+            publish_diagram_event(renewed.diagram_id, 'lock_extended', lock_event_payload(renewed))
             
-            detail_serializer = LockDetailSerializer(lock, context={'request': request})
+            detail_serializer = LockDetailSerializer(renewed, context={'request': request})
             return Response(detail_serializer.data)
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
     def perform_create(self, serializer):
-        """Asigna el usuario actual como propietario del bloqueo."""
-        serializer.save(locked_by=self.request.user)
+        """Asigna el usuario actual como propietario del bloqueo y lo anuncia a la sala."""
+        lock = serializer.save(locked_by=self.request.user)
+        publish_diagram_event(lock.diagram_id, 'lock_acquired', lock_event_payload(lock))
+    
+    def perform_destroy(self, instance):
+        """Libera el bloqueo y lo anuncia a la sala."""
+        payload = {'lockId': str(instance.id), 'diagramId': str(instance.diagram_id)}
+        instance.delete()
+        publish_diagram_event(payload['diagramId'], 'lock_released', payload)
     
     # Bloquear acciones no permitidas en Fase 1
     def update(self, request, *args, **kwargs):
@@ -4,6 +4,7 @@ ViewSet para el modelo Presence.
 from rest_framework import viewsets, permissions
 from ..models import Presence
 from ..serializers import PresenceSerializer
+from Apps.workspace.access import accessible_project_ids
 
 
 class PresenceViewSet(viewsets.ModelViewSet):
@@ -21,6 +22,5 @@ class PresenceViewSet(viewsets.ModelViewSet):
         
         # Filtrar por sesiones de diagramas accesibles
         return Presence.objects.filter(
-            session__diagram__project__organization__membership__user=user,
-            session__diagram__project__organization__membership__status='active'
+            session__diagram__project_id__in=accessible_project_ids(self.request)
         )
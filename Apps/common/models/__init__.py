@@ -18,6 +18,7 @@ from .choices import (
     JobStatus,
     ArtifactKind,
     VisibilityKind,
+    VersionStorageKind,
 )
 
 __all__ = [
@@ -33,4 +34,5 @@ __all__ = [
     'JobStatus',
     'ArtifactKind',
     'VisibilityKind',
+    'VersionStorageKind',
 ]
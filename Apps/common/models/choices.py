@@ -56,3 +56,9 @@ class VisibilityKind(models.TextChoices):
     PRIVATE = 'PRIVATE', 'Privado'
     PROTECTED = 'PROTECTED', 'Protegido'
     PACKAGE = 'PACKAGE', 'Paquete'
+
+
+class VersionStorageKind(models.TextChoices):
+    """Forma de almacenamiento de una versión de diagrama."""
+    KEYFRAME = 'KEYFRAME', 'Snapshot completo'
+    DELTA = 'DELTA', 'Delta JSON Patch'
@@ -0,0 +1,68 @@
+"""
+Paginación por cursor (keyset) para los listados grandes.
+
+A diferencia de `PageNumberPagination`, no ejecuta un `COUNT(*)` por página
+y el costo de una página no crece con su profundidad: cada página continúa
+desde la posición codificada en el cursor usando el índice del orden.
+"""
+import json
+
+from django.core.exceptions import EmptyResultSet
+from django.db import connections
+from rest_framework.pagination import CursorPagination
+
+
+def estimated_count(queryset):
+    """Cantidad de filas estimada por el planificador de PostgreSQL (sin recorrerlas)."""
+    try:
+        sql, params = queryset.order_by().query.sql_with_params()
+    except EmptyResultSet:
+        # `none()` o un `__in=[]`: Django sabe que no hay filas y no genera SQL
+        return 0
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class EstimatedCountCursorPagination(CursorPagination):
+    """
+    Cursor sobre el orden del viewset (o `-created_at`). Con
+    `?include_count=true` la respuesta agrega `estimated_count`, tomado de
+    las estadísticas del planificador en lugar de un conteo exacto.
+    """
+    ordering = '-created_at'
+    include_count_query_param = 'include_count'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.estimated_count = None
+        if request.query_params.get(self.include_count_query_param) in ('1', 'true'):
+            self.estimated_count = estimated_count(queryset)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        if self.estimated_count is not None:
+            response.data['estimated_count'] = self.estimated_count
+        return response
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema['properties']['estimated_count'] = {
+            'type': 'integer',
+            'description': f'Estimación del total; solo con ?{self.include_count_query_param}=true',
+        }
+        return response_schema
+
+    def get_schema_operation_parameters(self, view):
+        parameters = super().get_schema_operation_parameters(view)
+        parameters.append({
+            'name': self.include_count_query_param,
+            'required': False,
+            'in': 'query',
+            'description': 'Incluir una estimación del total de resultados',
+            'schema': {'type': 'boolean'},
+        })
+        return parameters
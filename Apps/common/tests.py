@@ -1,3 +1,13 @@
 from django.test import TestCase
 
-# Create your tests here.
+from Apps.common.pagination import estimated_count
+from Apps.modeling.models import Diagram
+
+
+class EstimatedCountTests(TestCase):
+    """Conteo estimado de los listados paginados por cursor."""
+
+    def test_empty_querysets_count_zero(self):
+        """Las consultas que Django resuelve sin SQL cuentan 0 en lugar de fallar."""
+        self.assertEqual(estimated_count(Diagram.objects.none()), 0)
+        self.assertEqual(estimated_count(Diagram.objects.filter(project_id__in=[])), 0)
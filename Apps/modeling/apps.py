@@ -5,3 +5,8 @@ class ModelingConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'Apps.modeling'
     label = 'modeling'
+
+    def ready(self):
+        # Construir el validador de snapshots al iniciar y no en la primera versión guardada
+        from .versioning import snapshot_validator
+        snapshot_validator()
@@ -0,0 +1,229 @@
+"""
+Escritura en lote de los elementos de un diagrama.
+
+El lote se valida completo en memoria (pertenencia al diagrama, referencias
+entre elementos y restricciones de unicidad) sobre el estado actual leído
+con una consulta por tipo, y luego se aplica con `bulk_create` /
+`bulk_update` dentro de una sola transacción.
+"""
+import uuid
+from collections import Counter
+from dataclasses import dataclass
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import (
+    Diagram,
+    EnumType,
+    EnumValue,
+    ModelAttribute,
+    ModelClass,
+    ModelMethod,
+    ModelRelation,
+)
+
+
+class ElementBatchError(Exception):
+    """El lote no se puede aplicar sobre el estado actual del diagrama."""
+
+    def __init__(self, errors):
+        super().__init__(errors)
+        self.errors = errors
+
+
+@dataclass(frozen=True)
+class ElementKind:
+    """Descripción de un tipo de elemento para el lote."""
+    model: type
+    # Campo que liga el elemento al diagrama directamente o a través de un padre
+    scope_lookup: str
+    # Referencias a otros elementos: campo -> tipo referenciado
+    references: tuple = ()
+    # (campo padre, campo nombre) que deben ser únicos; None si no aplica
+    unique: tuple = None
+
+
+KINDS = {
+    'classes': ElementKind(ModelClass, 'diagram', unique=('diagram', 'name')),
+    'enums': ElementKind(EnumType, 'diagram', unique=('diagram', 'name')),
+    'attributes': ElementKind(
+        ModelAttribute, 'model_class__diagram',
+        references=(('model_class', 'classes'),), unique=('model_class', 'name')
+    ),
+    'methods': ElementKind(
+        ModelMethod, 'model_class__diagram',
+        references=(('model_class', 'classes'),), unique=('model_class', 'name')
+    ),
+    'enum_values': ElementKind(
+        EnumValue, 'enum_type__diagram',
+        references=(('enum_type', 'enums'),), unique=('enum_type', 'literal')
+    ),
+    'relations': ElementKind(
+        ModelRelation, 'diagram',
+        references=(('source_class', 'classes'), ('target_class', 'classes'))
+    ),
+}
+
+# Elementos que se eliminan en cascada junto con su padre
+CASCADES = {'classes': ('attributes', 'methods'), 'enums': ('enum_values',)}
+
+# Elementos que referencian a otros (hojas) y elementos referenciados (padres)
+LEAF_KINDS = ('relations', 'methods', 'attributes', 'enum_values')
+PARENT_KINDS = ('classes', 'enums')
+
+
+def _tracked_fields(kind):
+    """Campos del estado en memoria necesarios para validar el tipo."""
+    fields = [field for field, _ in kind.references]
+    if kind.unique and kind.unique[0] != 'diagram':
+        fields.append(kind.unique[0])
+    if kind.unique:
+        fields.append(kind.unique[1])
+    return list(dict.fromkeys(fields))
+
+
+def _load_state(diagram):
+    """Estado mínimo actual del diagrama: por tipo, id -> campos de validación."""
+    state = {}
+    for name, kind in KINDS.items():
+        fields = _tracked_fields(kind)
+        lookups = [f'{field}_id' if field in dict(kind.references) else field for field in fields]
+        rows = kind.model.objects.filter(**{kind.scope_lookup: diagram}).values_list('id', *lookups)
+        state[name] = {row[0]: dict(zip(fields, row[1:])) for row in rows}
+    return state
+
+
+def _simulate(state, operations):
+    """Aplica el lote sobre el estado en memoria y retorna los errores encontrados."""
+    errors = []
+
+    for name in LEAF_KINDS + PARENT_KINDS:
+        for element_id in operations[name]['delete']:
+            if state[name].pop(element_id, None) is None:
+                errors.append({'kind': name, 'id': element_id, 'error': 'No existe en el diagrama'})
+                continue
+            for child in CASCADES.get(name, ()):
+                parent_field = KINDS[child].references[0][0]
+                state[child] = {
+                    child_id: fields for child_id, fields in state[child].items()
+                    if fields[parent_field] != element_id
+                }
+
+    all_ids = {element_id for elements in state.values() for element_id in elements}
+    for name, kind in KINDS.items():
+        fields = _tracked_fields(kind)
+        for item in operations[name]['update']:
+            current = state[name].get(item['id'])
+            if current is None:
+                errors.append({'kind': name, 'id': item['id'], 'error': 'No existe en el diagrama'})
+                continue
+            current.update({field: item[field] for field in fields if field in item})
+
+        for item in operations[name]['create']:
+            item.setdefault('id', uuid.uuid4())
+            if item['id'] in all_ids:
+                errors.append({'kind': name, 'id': item['id'], 'error': 'El id ya existe'})
+                continue
+            all_ids.add(item['id'])
+            state[name][item['id']] = {field: item.get(field) for field in fields}
+
+    for name, kind in KINDS.items():
+        for element_id, fields in state[name].items():
+            for field, target in kind.references:
+                if fields[field] not in state[target]:
+                    errors.append({
+                        'kind': name, 'id': element_id,
+                        'error': f"'{field}' referencia un elemento inexistente o eliminado"
+                    })
+
+        if kind.unique:
+            parent_field, name_field = kind.unique
+            keys = Counter(
+                (fields.get(parent_field), fields[name_field]) for fields in state[name].values()
+            )
+            for (_, value), count in keys.items():
+                if count > 1:
+                    errors.append({
+                        'kind': name, 'id': None,
+                        'error': f"'{name_field}' duplicado: {value}"
+                    })
+
+    return errors
+
+
+def _instance(kind, diagram, item):
+    """Instancia del modelo a partir de un ítem validado (referencias como ids)."""
+    references = dict(kind.references)
+    values = {
+        f'{field}_id' if field in references else field: value
+        for field, value in item.items()
+    }
+    if kind.scope_lookup == 'diagram':
+        values['diagram_id'] = diagram.id
+    return kind.model(**values)
+
+
+def _bulk_update(kind, diagram, items, now):
+    """Actualiza los ítems agrupándolos por conjunto de campos modificados."""
+    has_updated_at = any(field.name == 'updated_at' for field in kind.model._meta.fields)
+
+    # bulk_update necesita el mismo conjunto de campos en todos los objetos
+    groups = {}
+    for item in items:
+        fields = tuple(sorted(field for field in item if field != 'id'))
+        groups.setdefault(fields, []).append(item)
+
+    for fields, group in groups.items():
+        objs = [_instance(kind, diagram, item) for item in group]
+        update_fields = list(fields)
+        if has_updated_at:
+            for obj in objs:
+                obj.updated_at = now
+            update_fields.append('updated_at')
+        if update_fields:
+            kind.model.objects.bulk_update(objs, update_fields)
+
+
+def apply_element_batch(diagram_id, operations):
+    """
+    Valida y aplica un lote de operaciones; lanza `ElementBatchError` si el
+    lote no es consistente con el estado del diagrama.
+
+    Retorna los ids creados y la cantidad de elementos modificados y
+    eliminados por tipo.
+    """
+    with transaction.atomic():
+        # Serializa los lotes concurrentes sobre el mismo diagrama
+        diagram = Diagram.objects.select_for_update().get(id=diagram_id)
+
+        errors = _simulate(_load_state(diagram), operations)
+        if errors:
+            raise ElementBatchError(errors)
+
+        result = {'created': {}, 'updated': {}, 'deleted': {}}
+        now = timezone.now()
+
+        # Las hojas se eliminan y actualizan antes que los padres: así una relación
+        # que deja de apuntar a una clase eliminada no bloquea su borrado (RESTRICT).
+        # Las claves foráneas de Postgres son diferidas, por lo que las altas van al final;
+        # la unicidad de nombres también, así que un lote puede intercambiarlos.
+        for names in (LEAF_KINDS, PARENT_KINDS):
+            for name in names:
+                ids = operations[name]['delete']
+                if ids:
+                    KINDS[name].model.objects.filter(id__in=ids).delete()
+                result['deleted'][name] = len(ids)
+            for name in names:
+                _bulk_update(KINDS[name], diagram, operations[name]['update'], now)
+                result['updated'][name] = len(operations[name]['update'])
+
+        for name in PARENT_KINDS + LEAF_KINDS:
+            kind = KINDS[name]
+            created = [_instance(kind, diagram, item) for item in operations[name]['create']]
+            kind.model.objects.bulk_create(created)
+            result['created'][name] = [obj.id for obj in created]
+
+        Diagram.objects.filter(id=diagram.id).update(updated_at=now)
+
+    return result
@@ -0,0 +1,100 @@
+"""
+Benchmark de la validación de snapshots contra el esquema.
+
+    python manage.py bench_snapshot_validation --classes 100,1000,5000 --repeat 20
+
+Para cada tamaño genera un snapshot sintético (el mismo de
+`bench_version_storage`) y mide cuánto tarda `snapshot_errors` por cada mil
+elementos (clases y relaciones). También mide un snapshot en el que todas las
+clases son inválidas, para mostrar que la validación se corta al alcanzar el
+máximo de errores. No usa la base de datos.
+"""
+import copy
+import json
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from Apps.modeling.versioning import count_elements, snapshot_errors, snapshot_validator
+from Apps.modeling.versioning.schema import _max_errors
+from .bench_version_storage import synthetic_snapshots
+
+
+def _timings(snapshot, repeat):
+    """Milisegundos de cada validación del snapshot."""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        snapshot_errors(snapshot)
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def _invalid(snapshot):
+    """Copia del snapshot con el nombre de todas las clases de tipo incorrecto."""
+    snapshot = copy.deepcopy(snapshot)
+    for model_class in snapshot['classes']:
+        model_class['name'] = None
+    return snapshot
+
+
+class Command(BaseCommand):
+    help = "Mide el costo de validar snapshots contra el esquema por cada mil elementos; emite JSON."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--classes', default='100,1000,5000', help="Tamaños a medir (clases, separadas por coma)")
+        parser.add_argument('--attributes', type=int, default=6, help="Atributos por clase")
+        parser.add_argument('--repeat', type=int, default=20, help="Validaciones por tamaño")
+        parser.add_argument('--seed', type=int, default=0, help="Semilla de los snapshots")
+        parser.add_argument('--output', help="Archivo donde escribir el reporte JSON (por defecto, stdout)")
+
+    def handle(self, *args, **options):
+        try:
+            sizes = [int(size) for size in options['classes'].split(',')]
+        except ValueError:
+            raise CommandError("--classes debe ser una lista de enteros separados por coma")
+        if options['repeat'] < 1 or min(sizes) < 1:
+            raise CommandError("--repeat y los tamaños de --classes deben ser al menos 1")
+
+        started = time.perf_counter()
+        snapshot_validator.cache_clear()
+        snapshot_validator()
+        compile_ms = (time.perf_counter() - started) * 1000
+
+        results = []
+        for size in sizes:
+            snapshot = synthetic_snapshots(1, size, options['attributes'], options['seed'])[0]
+            if snapshot_errors(snapshot):
+                raise CommandError("El snapshot sintético no cumple el esquema")
+            elements = sum(count_elements(snapshot))
+            valid = _timings(snapshot, options['repeat'])
+            invalid = _timings(_invalid(snapshot), options['repeat'])
+            median = statistics.median(valid)
+            results.append({
+                'classes': size,
+                'elements': elements,
+                'json_bytes': len(json.dumps(snapshot)),
+                'valid_ms': {'median': round(median, 3), 'max': round(max(valid), 3)},
+                'ms_per_1k_elements': round(median * 1000 / elements, 3),
+                'invalid_ms': {'median': round(statistics.median(invalid), 3), 'max': round(max(invalid), 3)},
+            })
+
+        report = {
+            'compile_ms': round(compile_ms, 3),
+            'max_errors': _max_errors(),
+            'results': results,
+            'config': {key: options[key] for key in ('attributes', 'repeat', 'seed')},
+        }
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as report_file:
+                report_file.write(output + '\n')
+            self.stdout.write(self.style.SUCCESS(
+                ' · '.join(
+                    f"{result['elements']} elementos: {result['ms_per_1k_elements']} ms/1k"
+                    for result in results
+                ) + f" → {options['output']}"
+            ))
+        else:
+            self.stdout.write(output)
@@ -0,0 +1,195 @@
+"""
+Benchmark del almacenamiento de versiones de diagramas.
+
+    python manage.py bench_version_storage --versions 200 --classes 100 --output storage.json
+
+Sobre una base de datos de prueba (creada y eliminada por el comando) genera
+una secuencia de snapshots y mide:
+
+- `create_diagram_version` de punta a punta (delta, compresión e INSERT).
+- Escritura y tamaño de los mismos documentos (keyframes y deltas) en dos
+  tablas temporales: el formato anterior (JSONB con índice GIN sobre el
+  snapshot) y el actual (JSON comprimido en `bytea`).
+"""
+import copy
+import json
+import random
+import time
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_databases, teardown_databases
+
+from Apps.common.models import VersionStorageKind
+from Apps.modeling.models import Diagram, DiagramVersion
+from Apps.modeling.versioning import create_diagram_version, decode_document, encode_document
+
+
+LAYOUTS = {
+    'jsonb_gin': (
+        'CREATE TEMP TABLE bench_jsonb_gin (id serial PRIMARY KEY, snapshot jsonb, delta jsonb)',
+        'CREATE INDEX ON bench_jsonb_gin USING gin (snapshot)',
+    ),
+    'compressed': (
+        'CREATE TEMP TABLE bench_compressed (id serial PRIMARY KEY, payload bytea)',
+    ),
+}
+
+
+def synthetic_snapshots(count, classes, attributes, seed):
+    """Snapshots sucesivos: cada versión mueve, renombra o agrega atributos a pocas clases."""
+    rng = random.Random(seed)
+    snapshot = {
+        'classes': [
+            {
+                'id': f'class_{index}',
+                'name': f'Clase{index}',
+                'position': {'x': rng.randint(0, 4000), 'y': rng.randint(0, 3000)},
+                'attributes': [
+                    {'id': f'attr_{index}_{position}', 'name': f'atributo{position}',
+                     'type': rng.choice(['int', 'str', 'date', 'bool']), 'visibility': 'private'}
+                    for position in range(attributes)
+                ],
+                'methods': [],
+            }
+            for index in range(classes)
+        ],
+        'relations': [
+            {'id': f'relation_{index}', 'source_class': f'class_{index}',
+             'target_class': f'class_{(index + 1) % classes}', 'type': 'association'}
+            for index in range(classes)
+        ],
+        'metadata': {'zoom': 1},
+    }
+    snapshots = []
+    for version in range(count):
+        snapshot = copy.deepcopy(snapshot)
+        for model_class in rng.sample(snapshot['classes'], min(3, classes)):
+            roll = rng.random()
+            if roll < 0.6:
+                model_class['position'] = {'x': rng.randint(0, 4000), 'y': rng.randint(0, 3000)}
+            elif roll < 0.8:
+                model_class['name'] = f"{model_class['name']}_{version}"
+            else:
+                model_class['attributes'].append({
+                    'id': f'attr_{model_class["id"]}_{version}', 'name': f'nuevo{version}',
+                    'type': 'str', 'visibility': 'private'
+                })
+        snapshots.append(snapshot)
+    return snapshots
+
+
+def relation_sizes(cursor, table):
+    cursor.execute(
+        'SELECT pg_total_relation_size(%s), pg_relation_size(%s), pg_indexes_size(%s)',
+        [table, table, table]
+    )
+    total, heap, indexes = cursor.fetchone()
+    return {'total_bytes': total, 'heap_bytes': heap, 'index_bytes': indexes, 'toast_bytes': total - heap - indexes}
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara escritura y tamaño de las versiones en JSONB con GIN frente a "
+        "JSON comprimido; emite JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--versions', type=int, default=200, help="Versiones a guardar")
+        parser.add_argument('--classes', type=int, default=100, help="Clases del diagrama")
+        parser.add_argument('--attributes', type=int, default=6, help="Atributos por clase")
+        parser.add_argument('--seed', type=int, default=0, help="Semilla de los snapshots")
+        parser.add_argument('--keepdb', action='store_true', help="Reutilizar la base de datos de prueba")
+        parser.add_argument('--output', help="Archivo donde escribir el reporte JSON (por defecto, stdout)")
+
+    def handle(self, *args, **options):
+        if options['versions'] < 1 or options['classes'] < 1:
+            raise CommandError("--versions y --classes deben ser al menos 1")
+
+        snapshots = synthetic_snapshots(
+            options['versions'], options['classes'], options['attributes'], options['seed']
+        )
+
+        old_config = setup_databases(verbosity=0, interactive=False, keepdb=options['keepdb'])
+        try:
+            report = self.run(snapshots)
+        finally:
+            connection.close()
+            teardown_databases(old_config, verbosity=0, keepdb=options['keepdb'])
+
+        report['config'] = {key: options[key] for key in ('versions', 'classes', 'attributes', 'seed')}
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as report_file:
+                report_file.write(output + '\n')
+            layouts = report['layouts']
+            self.stdout.write(self.style.SUCCESS(
+                f"JSONB+GIN {layouts['jsonb_gin']['total_bytes']} B, "
+                f"{layouts['jsonb_gin']['writes_per_s']} escrituras/s · comprimido "
+                f"{layouts['compressed']['total_bytes']} B, "
+                f"{layouts['compressed']['writes_per_s']} escrituras/s → {options['output']}"
+            ))
+        else:
+            self.stdout.write(output)
+
+    def run(self, snapshots):
+        from Apps.workspace.models import Organization, Project
+
+        tag = uuid.uuid4().hex[:8]
+        user = get_user_model().objects.create(
+            username=f'bench_{tag}', email=f'bench_{tag}@example.com', password='!'
+        )
+        organization = Organization.objects.create(name=f'Bench {tag}', slug=f'bench-{tag}', created_by=user)
+        project = Project.objects.create(organization=organization, name=f'Bench {tag}', key=tag[:6], created_by=user)
+        diagram = Diagram.objects.create(project=project, name=f'Bench {tag}', created_by=user)
+
+        started = time.perf_counter()
+        for snapshot in snapshots:
+            create_diagram_version(diagram.id, snapshot, user)
+        elapsed = time.perf_counter() - started
+
+        # Los mismos documentos que eligió el almacenamiento: snapshot en keyframes, delta en el resto
+        stored = [
+            (storage_kind, decode_document(payload))
+            for storage_kind, payload in DiagramVersion.objects.filter(diagram=diagram)
+            .order_by('version_number').values_list('storage_kind', 'payload')
+        ]
+        keyframes = sum(1 for storage_kind, _ in stored if storage_kind == VersionStorageKind.KEYFRAME)
+
+        layouts = {}
+        with connection.cursor() as cursor:
+            for name, statements in LAYOUTS.items():
+                for statement in statements:
+                    cursor.execute(statement)
+                started = time.perf_counter()
+                for storage_kind, document in stored:
+                    is_keyframe = storage_kind == VersionStorageKind.KEYFRAME
+                    if name == 'jsonb_gin':
+                        cursor.execute(
+                            'INSERT INTO bench_jsonb_gin (snapshot, delta) VALUES (%s::jsonb, %s::jsonb)',
+                            [json.dumps(document) if is_keyframe else None,
+                             None if is_keyframe else json.dumps(document)]
+                        )
+                    else:
+                        cursor.execute(
+                            'INSERT INTO bench_compressed (payload) VALUES (%s)', [encode_document(document)]
+                        )
+                write_elapsed = time.perf_counter() - started
+                layouts[name] = {
+                    'writes_per_s': round(len(stored) / write_elapsed, 1) if write_elapsed else None,
+                    **relation_sizes(cursor, f'bench_{name}'),
+                }
+
+        return {
+            'create_diagram_version': {
+                'versions': len(snapshots),
+                'keyframes': keyframes,
+                'deltas': len(snapshots) - keyframes,
+                'versions_per_s': round(len(snapshots) / elapsed, 1) if elapsed else None,
+                'table_bytes': relation_sizes(connection.cursor(), DiagramVersion._meta.db_table),
+            },
+            'layouts': layouts,
+            'raw_json_bytes': sum(len(json.dumps(document)) for _, document in stored),
+        }
@@ -0,0 +1,71 @@
+# Generated by Django 5.2.6 on 2026-10-17 12:10
+
+from django.db import migrations, models
+
+
+def populate_keyframes(apps, schema_editor):
+    """Las versiones existentes pasan a ser keyframes con sus contadores."""
+    DiagramVersion = apps.get_model('modeling', 'DiagramVersion')
+
+    batch = []
+    for version in DiagramVersion.objects.only('id', 'version_number', 'snapshot').iterator(chunk_size=200):
+        snapshot = version.snapshot or {}
+        version.base_version_number = version.version_number
+        version.classes_count = len(snapshot.get('classes') or [])
+        version.relations_count = len(snapshot.get('relations') or [])
+        batch.append(version)
+        if len(batch) >= 200:
+            DiagramVersion.objects.bulk_update(
+                batch, ['base_version_number', 'classes_count', 'relations_count']
+            )
+            batch = []
+    if batch:
+        DiagramVersion.objects.bulk_update(
+            batch, ['base_version_number', 'classes_count', 'relations_count']
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('modeling', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='diagramversion',
+            name='storage_kind',
+            field=models.CharField(choices=[('KEYFRAME', 'Snapshot completo'), ('DELTA', 'Delta JSON Patch')], default='KEYFRAME', help_text='Forma de almacenamiento de la versión', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='diagramversion',
+            name='base_version_number',
+            field=models.IntegerField(help_text='Número de versión del keyframe desde el que se reconstruye', null=True),
+        ),
+        migrations.AddField(
+            model_name='diagramversion',
+            name='delta',
+            field=models.JSONField(blank=True, help_text='JSON Patch respecto a la versión anterior (solo deltas)', null=True),
+        ),
+        migrations.AddField(
+            model_name='diagramversion',
+            name='classes_count',
+            field=models.IntegerField(default=0, help_text='Cantidad de clases del snapshot'),
+        ),
+        migrations.AddField(
+            model_name='diagramversion',
+            name='relations_count',
+            field=models.IntegerField(default=0, help_text='Cantidad de relaciones del snapshot'),
+        ),
+        migrations.AlterField(
+            model_name='diagramversion',
+            name='snapshot',
+            field=models.JSONField(blank=True, help_text='Estado completo del diagrama en JSON (solo keyframes)', null=True),
+        ),
+        migrations.RunPython(populate_keyframes, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='diagramversion',
+            name='base_version_number',
+            field=models.IntegerField(help_text='Número de versión del keyframe desde el que se reconstruye'),
+        ),
+    ]
@@ -0,0 +1,75 @@
+# Generated by Django 5.2.6 on 2026-10-17 12:52
+
+import json
+import zlib
+
+from django.db import migrations, models
+
+
+BATCH_SIZE = 200
+
+
+def compress_payloads(apps, schema_editor):
+    """Comprime el snapshot (keyframes) o el delta (deltas) de cada versión en `payload`."""
+    DiagramVersion = apps.get_model('modeling', 'DiagramVersion')
+
+    batch = []
+    for version in DiagramVersion.objects.only('id', 'storage_kind', 'snapshot', 'delta').iterator(chunk_size=BATCH_SIZE):
+        document = version.snapshot if version.storage_kind == 'KEYFRAME' else version.delta
+        if document is not None:
+            version.payload = zlib.compress(
+                json.dumps(document, separators=(',', ':'), ensure_ascii=False).encode()
+            )
+        batch.append(version)
+        if len(batch) >= BATCH_SIZE:
+            DiagramVersion.objects.bulk_update(batch, ['payload'])
+            batch = []
+    if batch:
+        DiagramVersion.objects.bulk_update(batch, ['payload'])
+
+
+def decompress_payloads(apps, schema_editor):
+    """Restaura `snapshot` y `delta` como JSON desde `payload`."""
+    DiagramVersion = apps.get_model('modeling', 'DiagramVersion')
+
+    batch = []
+    for version in DiagramVersion.objects.only('id', 'storage_kind', 'payload').iterator(chunk_size=BATCH_SIZE):
+        document = json.loads(zlib.decompress(version.payload)) if version.payload is not None else None
+        if version.storage_kind == 'KEYFRAME':
+            version.snapshot = document
+        else:
+            version.delta = document
+        batch.append(version)
+        if len(batch) >= BATCH_SIZE:
+            DiagramVersion.objects.bulk_update(batch, ['snapshot', 'delta'])
+            batch = []
+    if batch:
+        DiagramVersion.objects.bulk_update(batch, ['snapshot', 'delta'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('modeling', '0002_diagram_version_deltas'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='diagramversion',
+            name='payload',
+            field=models.BinaryField(help_text='Snapshot (keyframes) o JSON Patch (deltas) como JSON comprimido con zlib', null=True),
+        ),
+        migrations.RunPython(compress_payloads, decompress_payloads),
+        migrations.RemoveIndex(
+            model_name='diagramversion',
+            name='modeling_di_snapsho_26d6bc_gin',
+        ),
+        migrations.RemoveField(
+            model_name='diagramversion',
+            name='delta',
+        ),
+        migrations.RemoveField(
+            model_name='diagramversion',
+            name='snapshot',
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.6 on 2026-10-17 12:55
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('modeling', '0003_compressed_version_payload'),
+        ('workspace', '0002_membership_user_status_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='diagram',
+            name='modeling_di_project_9b934e_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='diagramversion',
+            name='modeling_di_diagram_00199e_idx',
+        ),
+        migrations.AddIndex(
+            model_name='diagram',
+            index=models.Index(fields=['project', '-created_at'], name='modeling_diagram_keyset_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='diagramversion',
+            index=models.Index(fields=['diagram', '-version_number'], name='modeling_version_keyset_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.6 on 2026-10-17 13:01
+
+from django.db import migrations, models
+
+
+# Contador y versión actual a partir de la última versión guardada de cada diagrama
+BACKFILL_SQL = """
+    UPDATE modeling_diagram AS diagram
+    SET last_version_number = latest.version_number,
+        current_version_id = latest.id
+    FROM (
+        SELECT DISTINCT ON (diagram_id) diagram_id, id, version_number
+        FROM modeling_diagramversion
+        ORDER BY diagram_id, version_number DESC
+    ) AS latest
+    WHERE diagram.id = latest.diagram_id
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('modeling', '0004_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='diagram',
+            name='last_version_number',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Número de la última versión asignada'),
+        ),
+        migrations.RunSQL(BACKFILL_SQL, migrations.RunSQL.noop),
+    ]
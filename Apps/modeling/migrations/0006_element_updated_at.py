@@ -0,0 +1,41 @@
+# Generated by Django 5.2.6 on 2026-10-17 14:05
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+# Las filas existentes toman su fecha de creación como última modificación
+BACKFILL_SQL = """
+    UPDATE modeling_modelmethod SET updated_at = created_at;
+    UPDATE modeling_enumtype SET updated_at = created_at;
+    UPDATE modeling_enumvalue SET updated_at = created_at;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('modeling', '0005_diagram_last_version_number'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='enumtype',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now, help_text='Fecha de última actualización del enum'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='enumvalue',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now, help_text='Fecha de última actualización del valor'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='modelmethod',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now, help_text='Fecha de última actualización del método'),
+            preserve_default=False,
+        ),
+        migrations.RunSQL(BACKFILL_SQL, migrations.RunSQL.noop),
+    ]
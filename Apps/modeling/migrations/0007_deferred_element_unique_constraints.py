@@ -0,0 +1,54 @@
+# Generated by Django 5.2.6 on 2026-10-17 13:47
+
+import django.db.models.constraints
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('modeling', '0006_element_updated_at'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='enumtype',
+            name='unique_diagram_enum_name',
+        ),
+        migrations.RemoveConstraint(
+            model_name='enumvalue',
+            name='unique_enum_literal',
+        ),
+        migrations.RemoveConstraint(
+            model_name='modelattribute',
+            name='unique_class_attribute_name',
+        ),
+        migrations.RemoveConstraint(
+            model_name='modelclass',
+            name='unique_diagram_class_name',
+        ),
+        migrations.RemoveConstraint(
+            model_name='modelmethod',
+            name='unique_class_method_name',
+        ),
+        migrations.AddConstraint(
+            model_name='enumtype',
+            constraint=models.UniqueConstraint(deferrable=django.db.models.constraints.Deferrable['DEFERRED'], fields=('diagram', 'name'), name='unique_diagram_enum_name'),
+        ),
+        migrations.AddConstraint(
+            model_name='enumvalue',
+            constraint=models.UniqueConstraint(deferrable=django.db.models.constraints.Deferrable['DEFERRED'], fields=('enum_type', 'literal'), name='unique_enum_literal'),
+        ),
+        migrations.AddConstraint(
+            model_name='modelattribute',
+            constraint=models.UniqueConstraint(deferrable=django.db.models.constraints.Deferrable['DEFERRED'], fields=('model_class', 'name'), name='unique_class_attribute_name'),
+        ),
+        migrations.AddConstraint(
+            model_name='modelclass',
+            constraint=models.UniqueConstraint(deferrable=django.db.models.constraints.Deferrable['DEFERRED'], fields=('diagram', 'name'), name='unique_diagram_class_name'),
+        ),
+        migrations.AddConstraint(
+            model_name='modelmethod',
+            constraint=models.UniqueConstraint(deferrable=django.db.models.constraints.Deferrable['DEFERRED'], fields=('model_class', 'name'), name='unique_class_method_name'),
+        ),
+    ]
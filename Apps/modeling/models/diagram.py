@@ -2,10 +2,14 @@
 Modelo de Diagrama.
 """
 from django.conf import settings
-from django.db import models
+from django.db import connection, models
 from Apps.common.models import BaseUUIDModel, TimeStampedModel, SoftDeleteModel
 
 
+# Campos que solo actualiza `Diagram.allocate_version`
+VERSION_POINTER_FIELDS = ('last_version_number', 'current_version', 'current_version_id')
+
+
 class Diagram(BaseUUIDModel, TimeStampedModel, SoftDeleteModel):
     """Diagrama activo dentro de un proyecto."""
     project = models.ForeignKey(
@@ -25,6 +29,11 @@ class Diagram(BaseUUIDModel, TimeStampedModel, SoftDeleteModel):
         related_name='current_for_diagrams',
         help_text="Versión actual del diagrama"
     )
+    last_version_number = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        help_text="Número de la última versión asignada"
+    )
     created_by = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.RESTRICT,
@@ -40,8 +49,52 @@ class Diagram(BaseUUIDModel, TimeStampedModel, SoftDeleteModel):
             )
         ]
         indexes = [
-            models.Index(fields=['project']),
+            # Listado paginado por cursor: los diagramas de un proyecto del más nuevo al más viejo
+            models.Index(fields=['project', '-created_at'], name='modeling_diagram_keyset_idx'),
         ]
 
     def __str__(self):
         return f"{self.project.name}/{self.name}"
+
+    def save(self, *args, **kwargs):
+        """
+        Guarda el diagrama sin tocar el contador ni la versión actual.
+
+        Una instancia cargada antes de guardar una versión tiene valores viejos
+        en esos campos; escribirlos haría retroceder el contador y las
+        siguientes versiones chocarían con números ya usados.
+        """
+        if not self._state.adding and not kwargs.get('force_insert'):
+            update_fields = kwargs.get('update_fields')
+            if update_fields is None:
+                update_fields = [field.name for field in self._meta.concrete_fields if not field.primary_key]
+            kwargs['update_fields'] = [name for name in update_fields if name not in VERSION_POINTER_FIELDS]
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def allocate_version(cls, diagram_id, version_id):
+        """
+        Asigna el siguiente número de versión y apunta `current_version` a
+        `version_id` en una sola sentencia.
+
+        El `UPDATE ... RETURNING` bloquea la fila del diagrama hasta el final
+        de la transacción, por lo que la versión `version_id` debe insertarse
+        en ella (la clave foránea se verifica al confirmar). Retorna el
+        diagrama actualizado con `previous_version_id`, la versión que era la
+        actual (None si no tenía).
+        """
+        table = connection.ops.quote_name(cls._meta.db_table)
+        sql = f"""
+            UPDATE {table} AS diagram
+            SET last_version_number = diagram.last_version_number + 1,
+                current_version_id = %(version_id)s
+            FROM (
+                SELECT id, current_version_id FROM {table} WHERE id = %(diagram_id)s FOR UPDATE
+            ) AS previous
+            WHERE diagram.id = previous.id
+            RETURNING diagram.*, previous.current_version_id AS previous_version_id
+        """
+        diagram = next(iter(cls.objects.raw(sql, {'diagram_id': diagram_id, 'version_id': version_id})), None)
+        if diagram is None:
+            raise cls.DoesNotExist(f"Diagram {diagram_id} no existe")
+        return diagram
@@ -3,13 +3,19 @@ Modelo de Versión de Diagrama.
 """
 from django.conf import settings
 from django.db import models
-from django.contrib.postgres.indexes import GinIndex
-from Apps.common.models import BaseUUIDModel
+from Apps.common.models import BaseUUIDModel, VersionStorageKind
 from .diagram import Diagram
 
 
 class DiagramVersion(BaseUUIDModel):
-    """Snapshot JSON reproducible del diagrama."""
+    """
+    Snapshot JSON reproducible del diagrama.
+
+    Las versiones se guardan como keyframes (snapshot completo) o como
+    deltas JSON Patch respecto a la versión anterior, comprimidos en
+    `payload` y decodificados solo al leer `snapshot` o `delta`. Use
+    `full_snapshot` para obtener siempre el estado completo.
+    """
     diagram = models.ForeignKey(
         Diagram,
         on_delete=models.RESTRICT,
@@ -18,8 +24,26 @@ class DiagramVersion(BaseUUIDModel):
     version_number = models.IntegerField(
         help_text="Número de versión secuencial"
     )
-    snapshot = models.JSONField(
-        help_text="Estado completo del diagrama en JSON"
+    storage_kind = models.CharField(
+        max_length=10,
+        choices=VersionStorageKind.choices,
+        default=VersionStorageKind.KEYFRAME,
+        help_text="Forma de almacenamiento de la versión"
+    )
+    base_version_number = models.IntegerField(
+        help_text="Número de versión del keyframe desde el que se reconstruye"
+    )
+    payload = models.BinaryField(
+        null=True,
+        help_text="Snapshot (keyframes) o JSON Patch (deltas) como JSON comprimido con zlib"
+    )
+    classes_count = models.IntegerField(
+        default=0,
+        help_text="Cantidad de clases del snapshot"
+    )
+    relations_count = models.IntegerField(
+        default=0,
+        help_text="Cantidad de relaciones del snapshot"
     )
     message = models.CharField(
         max_length=240,
@@ -46,9 +70,37 @@ class DiagramVersion(BaseUUIDModel):
             )
         ]
         indexes = [
-            models.Index(fields=['diagram']),
-            GinIndex(fields=['snapshot']),
+            # Listado paginado por cursor: las versiones de un diagrama de la más nueva a la más vieja
+            models.Index(fields=['diagram', '-version_number'], name='modeling_version_keyset_idx'),
         ]
 
     def __str__(self):
         return f"{self.diagram.name} v{self.version_number}"
+
+    def _payload_document(self):
+        if not hasattr(self, '_decoded_payload'):
+            from Apps.modeling.versioning import decode_document
+            self._decoded_payload = decode_document(self.payload)
+        return self._decoded_payload
+
+    @property
+    def snapshot(self):
+        """Snapshot completo guardado (solo keyframes)."""
+        if self.storage_kind != VersionStorageKind.KEYFRAME:
+            return None
+        return self._payload_document()
+
+    @property
+    def delta(self):
+        """JSON Patch respecto a la versión anterior (solo deltas)."""
+        if self.storage_kind != VersionStorageKind.DELTA:
+            return None
+        return self._payload_document()
+
+    @property
+    def full_snapshot(self):
+        """Snapshot completo, reconstruido desde el keyframe si es un delta."""
+        if not hasattr(self, '_materialized_snapshot'):
+            from Apps.modeling.versioning import materialize_snapshot
+            self._materialized_snapshot = materialize_snapshot(self)
+        return self._materialized_snapshot
@@ -21,13 +21,19 @@ class EnumType(BaseUUIDModel):
         auto_now_add=True,
         help_text="Fecha de creación del enum"
     )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        help_text="Fecha de última actualización del enum"
+    )
 
     class Meta:
         app_label = 'modeling'
         constraints = [
             models.UniqueConstraint(
                 fields=['diagram', 'name'],
-                name='unique_diagram_enum_name'
+                name='unique_diagram_enum_name',
+                # Diferida: un lote puede intercambiar nombres entre elementos
+                deferrable=models.Deferrable.DEFERRED
             )
         ]
 
@@ -24,13 +24,19 @@ class EnumValue(BaseUUIDModel):
         auto_now_add=True,
         help_text="Fecha de creación del valor"
     )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        help_text="Fecha de última actualización del valor"
+    )
 
     class Meta:
         app_label = 'modeling'
         constraints = [
             models.UniqueConstraint(
                 fields=['enum_type', 'literal'],
-                name='unique_enum_literal'
+                name='unique_enum_literal',
+                # Diferida: un lote puede intercambiar nombres entre elementos
+                deferrable=models.Deferrable.DEFERRED
             )
         ]
 
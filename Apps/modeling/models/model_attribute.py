@@ -63,7 +63,9 @@ class ModelAttribute(BaseUUIDModel, TimeStampedModel):
         constraints = [
             models.UniqueConstraint(
                 fields=['model_class', 'name'],
-                name='unique_class_attribute_name'
+                name='unique_class_attribute_name',
+                # Diferida: un lote puede intercambiar nombres entre elementos
+                deferrable=models.Deferrable.DEFERRED
             ),
             models.CheckConstraint(
                 check=Q(is_primary_key=False) | Q(is_required=True),
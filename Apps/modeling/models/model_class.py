@@ -46,7 +46,9 @@ class ModelClass(BaseUUIDModel, TimeStampedModel):
         constraints = [
             models.UniqueConstraint(
                 fields=['diagram', 'name'],
-                name='unique_diagram_class_name'
+                name='unique_diagram_class_name',
+                # Diferida: un lote puede intercambiar nombres entre elementos
+                deferrable=models.Deferrable.DEFERRED
             )
         ]
         indexes = [
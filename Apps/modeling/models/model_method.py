@@ -36,13 +36,19 @@ class ModelMethod(BaseUUIDModel):
         auto_now_add=True,
         help_text="Fecha de creación del método"
     )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        help_text="Fecha de última actualización del método"
+    )
 
     class Meta:
         app_label = 'modeling'
         constraints = [
             models.UniqueConstraint(
                 fields=['model_class', 'name'],
-                name='unique_class_method_name'
+                name='unique_class_method_name',
+                # Diferida: un lote puede intercambiar nombres entre elementos
+                deferrable=models.Deferrable.DEFERRED
             )
         ]
 
@@ -2,6 +2,7 @@
 Permisos personalizados para la app modeling.
 """
 from rest_framework import permissions
+from Apps.workspace.access import accessible_project_ids
 
 
 class IsProjectMemberForDiagram(permissions.BasePermission):
@@ -17,11 +18,8 @@ class IsProjectMemberForDiagram(permissions.BasePermission):
         if request.user.is_superuser:
             return True
             
-        # Verificar membresía en la organización del proyecto
-        return obj.project.organization.membership_set.filter(
-            user=request.user,
-            status='active'
-        ).exists()
+        # Verificar membresía en la organización del proyecto (cacheada por usuario)
+        return obj.project_id in accessible_project_ids(request)
 
 
 class CanCreateDiagram(permissions.BasePermission):
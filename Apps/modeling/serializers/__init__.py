@@ -2,6 +2,8 @@
 Serializers package for modeling app.
 """
 from .diagram_serializer import DiagramSerializer, DiagramUpdateSerializer
+from .diagram_graph_serializer import DiagramGraphSerializer
+from .element_batch_serializer import ElementBatchSerializer
 from .diagram_version_serializer import (
     DiagramVersionSerializer, 
     DiagramVersionDetailSerializer, 
@@ -17,6 +19,8 @@ from .model_relation_serializer import ModelRelationSerializer
 __all__ = [
     'DiagramSerializer',
     'DiagramUpdateSerializer',
+    'DiagramGraphSerializer',
+    'ElementBatchSerializer',
     'DiagramVersionSerializer',
     'DiagramVersionDetailSerializer', 
     'DiagramVersionListSerializer',
@@ -0,0 +1,155 @@
+"""
+Serializer de solo lectura para el grafo completo de un diagrama.
+"""
+import hashlib
+from collections import defaultdict
+
+from django.db.models import DateTimeField, F, Func, IntegerField, Subquery
+from django.utils.http import quote_etag
+from rest_framework import serializers
+from ..models import (
+    Diagram,
+    EnumType,
+    EnumValue,
+    ModelAttribute,
+    ModelClass,
+    ModelMethod,
+    ModelRelation,
+)
+
+
+CLASS_FIELDS = (
+    'id', 'name', 'stereotype', 'visibility', 'x', 'y', 'width', 'height',
+    'created_at', 'updated_at',
+)
+ATTRIBUTE_FIELDS = (
+    'id', 'model_class_id', 'name', 'type_name', 'is_required', 'is_primary_key',
+    'length', 'precision', 'scale', 'default_value', 'visibility', 'position',
+    'created_at', 'updated_at',
+)
+METHOD_FIELDS = (
+    'id', 'model_class_id', 'name', 'return_type', 'visibility', 'parameters',
+    'position', 'created_at',
+)
+RELATION_FIELDS = (
+    'id', 'source_class_id', 'target_class_id', 'name', 'relation_kind',
+    'source_multiplicity', 'target_multiplicity', 'source_role', 'target_role',
+    'is_bidirectional', 'created_at', 'updated_at',
+)
+ENUM_FIELDS = ('id', 'name', 'created_at')
+ENUM_VALUE_FIELDS = ('id', 'enum_type_id', 'literal', 'ordinal', 'created_at')
+
+
+# Cambiar al modificar la forma de la respuesta: invalida los ETag emitidos
+GRAPH_FORMAT_VERSION = 1
+
+
+def _element_stats(queryset):
+    """
+    Subconsultas con la cantidad de filas y la última modificación del
+    queryset (COUNT/MAX sin GROUP BY: siempre devuelven una fila).
+    """
+    queryset = queryset.order_by()
+    return (
+        Subquery(queryset.annotate(
+            stat=Func(F('pk'), function='COUNT', output_field=IntegerField())
+        ).values('stat')),
+        Subquery(queryset.annotate(
+            stat=Func(F('updated_at'), function='MAX', output_field=DateTimeField())
+        ).values('stat')),
+    )
+
+
+def _group_by(rows, key):
+    """Agrupa filas por la clave foránea indicada, quitándola de cada fila."""
+    groups = defaultdict(list)
+    for row in rows:
+        groups[row.pop(key)].append(row)
+    return groups
+
+
+class DiagramGraphSerializer(serializers.BaseSerializer):
+    """
+    Clases (con atributos y métodos), relaciones y enums (con valores) de un
+    diagrama en una sola respuesta.
+
+    Cada tipo de elemento se lee con una consulta `.values()` y se agrupa en
+    memoria, por lo que la cantidad de consultas no depende del tamaño del
+    diagrama y no se instancian modelos ni campos de DRF por fila. Fechas y
+    UUID quedan a cargo del encoder JSON de DRF.
+    """
+
+    @staticmethod
+    def etag(diagram):
+        """
+        ETag del grafo a partir de la cantidad y la última modificación de
+        cada tipo de elemento, en una sola consulta y sin leer las filas:
+        permite responder `304` antes de construir la respuesta. Un alta o
+        una modificación cambian el máximo de `updated_at`; una baja, la
+        cantidad.
+        """
+        element_querysets = (
+            ModelClass.objects.filter(diagram_id=diagram.pk),
+            ModelAttribute.objects.filter(model_class__diagram_id=diagram.pk),
+            ModelMethod.objects.filter(model_class__diagram_id=diagram.pk),
+            ModelRelation.objects.filter(diagram_id=diagram.pk),
+            EnumType.objects.filter(diagram_id=diagram.pk),
+            EnumValue.objects.filter(enum_type__diagram_id=diagram.pk),
+        )
+        annotations = {}
+        for index, queryset in enumerate(element_querysets):
+            annotations[f'count_{index}'], annotations[f'updated_{index}'] = _element_stats(queryset)
+        stats = Diagram.objects.filter(pk=diagram.pk).values(**annotations).get()
+
+        fingerprint = repr((
+            GRAPH_FORMAT_VERSION, diagram.pk, diagram.name, diagram.project_id,
+            diagram.current_version_id, diagram.updated_at,
+            sorted(stats.items()),
+        ))
+        return quote_etag(hashlib.blake2b(fingerprint.encode(), digest_size=16).hexdigest())
+
+    def to_representation(self, diagram):
+        attributes = _group_by(
+            ModelAttribute.objects.filter(model_class__diagram=diagram)
+            .order_by('position').values(*ATTRIBUTE_FIELDS),
+            'model_class_id'
+        )
+        methods = _group_by(
+            ModelMethod.objects.filter(model_class__diagram=diagram)
+            .order_by('position').values(*METHOD_FIELDS),
+            'model_class_id'
+        )
+        enum_values = _group_by(
+            EnumValue.objects.filter(enum_type__diagram=diagram)
+            .order_by('ordinal').values(*ENUM_VALUE_FIELDS),
+            'enum_type_id'
+        )
+
+        classes = list(
+            ModelClass.objects.filter(diagram=diagram).order_by('created_at').values(*CLASS_FIELDS)
+        )
+        for model_class in classes:
+            model_class['attributes'] = attributes.get(model_class['id'], [])
+            model_class['methods'] = methods.get(model_class['id'], [])
+
+        relations = list(
+            ModelRelation.objects.filter(diagram=diagram).order_by('created_at').values(*RELATION_FIELDS)
+        )
+        for relation in relations:
+            relation['source_class'] = relation.pop('source_class_id')
+            relation['target_class'] = relation.pop('target_class_id')
+
+        enums = list(EnumType.objects.filter(diagram=diagram).order_by('name').values(*ENUM_FIELDS))
+        for enum in enums:
+            enum['values'] = enum_values.get(enum['id'], [])
+
+        return {
+            'id': diagram.id,
+            'project': diagram.project_id,
+            'name': diagram.name,
+            'current_version': diagram.current_version_id,
+            'updated_at': diagram.updated_at,
+            'classes': classes,
+            'relations': relations,
+            'enums': enums,
+        }
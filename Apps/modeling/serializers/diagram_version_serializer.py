@@ -2,49 +2,36 @@
 Serializers para las versiones de diagramas.
 """
 from rest_framework import serializers
-from django.db import transaction
 from Apps.modeling.models import DiagramVersion, Diagram
+from Apps.modeling.versioning import StaleFencingTokenError, create_diagram_version, snapshot_errors
 
 
 class DiagramVersionSerializer(serializers.ModelSerializer):
     """Serializer para crear y listar versiones de diagramas (M04, M05)."""
     
     diagram_id = serializers.UUIDField(write_only=True, required=True)
+    snapshot = serializers.JSONField(required=True)
+    fencing_token = serializers.IntegerField(
+        write_only=True, required=False,
+        help_text="Token del bloqueo del diagrama; si ya no es el vigente, la versión se rechaza"
+    )
     created_by_username = serializers.CharField(source='created_by.username', read_only=True)
     diagram_name = serializers.CharField(source='diagram.name', read_only=True)
 
     class Meta:
         model = DiagramVersion
         fields = [
-            'id', 'diagram_id', 'version_number', 'snapshot', 'message',
+            'id', 'diagram_id', 'version_number', 'snapshot', 'message', 'fencing_token',
             'created_by', 'created_by_username', 'diagram_name', 'created_at'
         ]
         read_only_fields = ['id', 'version_number', 'created_by', 'created_at', 
                            'created_by_username', 'diagram_name']
 
     def validate_snapshot(self, value):
-        """Valida que el snapshot tenga estructura JSON válida."""
-        if not isinstance(value, dict):
-            raise serializers.ValidationError("El snapshot debe ser un objeto JSON válido")
-        
-        # Validar estructura básica del snapshot según Fase 1
-        required_fields = ['classes', 'relations', 'metadata']
-        for field in required_fields:
-            if field not in value:
-                raise serializers.ValidationError(f"El snapshot debe contener el campo '{field}'")
-        
-        # Validar que classes sea una lista
-        if not isinstance(value['classes'], list):
-            raise serializers.ValidationError("El campo 'classes' debe ser una lista")
-        
-        # Validar que relations sea una lista
-        if not isinstance(value['relations'], list):
-            raise serializers.ValidationError("El campo 'relations' debe ser una lista")
-        
-        # Validar que metadata sea un objeto
-        if not isinstance(value['metadata'], dict):
-            raise serializers.ValidationError("El campo 'metadata' debe ser un objeto")
-        
+        """Valida el snapshot completo (clases, atributos, métodos y relaciones) contra el esquema."""
+        errors = snapshot_errors(value)
+        if errors:
+            raise serializers.ValidationError(errors)
         return value
 
     def validate_diagram_id(self, value):
@@ -82,24 +69,39 @@ class DiagramVersionSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         """Crea una nueva versión del diagrama con número de versión secuencial."""
-        diagram_id = validated_data.pop('diagram_id')
-        
-        with transaction.atomic():
-            # Obtener el diagrama
-            diagram = Diagram.objects.select_for_update().get(id=diagram_id)
-            
-            # Obtener el siguiente número de versión
-            last_version = DiagramVersion.objects.filter(diagram=diagram).order_by('-version_number').first()
-            next_version_number = (last_version.version_number + 1) if last_version else 1
-            
-            # Crear la nueva versión (created_by ya viene en validated_data desde el viewset)
-            diagram_version = DiagramVersion.objects.create(
-                diagram=diagram,
-                version_number=next_version_number,
-                **validated_data
+        from Apps.collaboration.realtime import publish_diagram_event
+
+        # created_by ya viene en validated_data desde el viewset
+        created_by = validated_data['created_by']
+        try:
+            version = create_diagram_version(
+                diagram_id=validated_data.pop('diagram_id'),
+                snapshot=validated_data['snapshot'],
+                created_by=created_by,
+                message=validated_data.get('message'),
+                fencing_token=validated_data.get('fencing_token')
             )
-            
-            return diagram_version
+        except StaleFencingTokenError:
+            raise serializers.ValidationError({'fencing_token': [
+                "El bloqueo del diagrama expiró o pertenece a otra concesión"
+            ]})
+
+        # Los clientes conectados al diagrama se enteran sin consultar el listado
+        publish_diagram_event(version.diagram_id, 'version_saved', {
+            'versionId': str(version.id),
+            'diagramId': str(version.diagram_id),
+            'versionNumber': version.version_number,
+            'message': version.message,
+            'createdBy': {'id': str(created_by.id), 'username': created_by.username},
+            'createdAt': version.created_at.isoformat(),
+        })
+        return version
+
+    def to_representation(self, instance):
+        """Las versiones delta no guardan el snapshot; se expone el estado completo."""
+        data = super().to_representation(instance)
+        data['snapshot'] = instance.full_snapshot
+        return data
 
 
 class DiagramVersionDetailSerializer(serializers.ModelSerializer):
@@ -111,6 +113,7 @@ class DiagramVersionDetailSerializer(serializers.ModelSerializer):
     diagram_id = serializers.UUIDField(source='diagram.id', read_only=True)
     project_name = serializers.CharField(source='diagram.project.name', read_only=True)
     project_id = serializers.UUIDField(source='diagram.project.id', read_only=True)
+    snapshot = serializers.JSONField(source='full_snapshot', read_only=True)
     
     class Meta:
         model = DiagramVersion
@@ -125,6 +128,13 @@ class DiagramVersionDetailSerializer(serializers.ModelSerializer):
             'created_by_username', 'created_by_email', 'created_at'
         ]
 
+    def get_fields(self):
+        fields = super().get_fields()
+        # La respuesta en streaming emite el snapshot aparte, sin materializarlo aquí
+        if self.context.get('omit_snapshot'):
+            fields.pop('snapshot')
+        return fields
+
 
 class DiagramVersionListSerializer(serializers.ModelSerializer):
     """Serializer simplificado para listar versiones sin el snapshot completo."""
@@ -145,15 +155,9 @@ class DiagramVersionListSerializer(serializers.ModelSerializer):
         ]
     
     def get_snapshot_size(self, obj):
-        """Retorna el tamaño del snapshot en elementos."""
-        if not obj.snapshot:
-            return 0
-        
-        classes_count = len(obj.snapshot.get('classes', []))
-        relations_count = len(obj.snapshot.get('relations', []))
-        
+        """Retorna el tamaño del snapshot en elementos (desde los contadores guardados)."""
         return {
-            'classes': classes_count,
-            'relations': relations_count,
-            'total_elements': classes_count + relations_count
+            'classes': obj.classes_count,
+            'relations': obj.relations_count,
+            'total_elements': obj.classes_count + obj.relations_count
         }
@@ -0,0 +1,161 @@
+"""
+Serializers para la escritura en lote de elementos de un diagrama.
+"""
+from rest_framework import serializers
+from Apps.common.models import RelationKind
+from ..models import (
+    EnumType,
+    EnumValue,
+    ModelAttribute,
+    ModelClass,
+    ModelMethod,
+    ModelRelation,
+)
+
+
+# Los serializers de ítem no usan PrimaryKeyRelatedField (una consulta por ítem)
+# ni los validadores de unicidad de DRF (una consulta por ítem): las referencias
+# y la unicidad se validan en memoria sobre el estado completo del diagrama.
+
+class BatchModelClassSerializer(serializers.ModelSerializer):
+    """Clase dentro de un lote."""
+    id = serializers.UUIDField(required=False)
+
+    class Meta:
+        model = ModelClass
+        fields = ['id', 'name', 'stereotype', 'visibility', 'x', 'y', 'width', 'height']
+        validators = []
+
+
+class BatchModelAttributeSerializer(serializers.ModelSerializer):
+    """Atributo dentro de un lote."""
+    id = serializers.UUIDField(required=False)
+    model_class = serializers.UUIDField()
+
+    class Meta:
+        model = ModelAttribute
+        fields = [
+            'id', 'model_class', 'name', 'type_name', 'is_required', 'is_primary_key',
+            'length', 'precision', 'scale', 'default_value', 'visibility', 'position',
+        ]
+        validators = []
+
+    def validate(self, attrs):
+        if attrs.get('is_primary_key') and attrs.get('is_required') is False:
+            raise serializers.ValidationError("Un atributo clave primaria debe ser requerido")
+        return attrs
+
+
+class BatchModelMethodSerializer(serializers.ModelSerializer):
+    """Método dentro de un lote."""
+    id = serializers.UUIDField(required=False)
+    model_class = serializers.UUIDField()
+
+    class Meta:
+        model = ModelMethod
+        fields = ['id', 'model_class', 'name', 'return_type', 'visibility', 'parameters', 'position']
+        validators = []
+
+
+class BatchModelRelationSerializer(serializers.ModelSerializer):
+    """Relación dentro de un lote."""
+    id = serializers.UUIDField(required=False)
+    source_class = serializers.UUIDField()
+    target_class = serializers.UUIDField()
+
+    class Meta:
+        model = ModelRelation
+        fields = [
+            'id', 'source_class', 'target_class', 'name', 'relation_kind',
+            'source_multiplicity', 'target_multiplicity', 'source_role', 'target_role',
+            'is_bidirectional',
+        ]
+        validators = []
+
+    def validate(self, attrs):
+        if attrs.get('relation_kind') == RelationKind.INHERITANCE and (
+            attrs.get('name') or attrs.get('is_bidirectional')
+        ):
+            raise serializers.ValidationError(
+                "Una herencia no puede tener nombre ni ser bidireccional"
+            )
+        return attrs
+
+
+class BatchEnumTypeSerializer(serializers.ModelSerializer):
+    """Enum dentro de un lote."""
+    id = serializers.UUIDField(required=False)
+
+    class Meta:
+        model = EnumType
+        fields = ['id', 'name']
+        validators = []
+
+
+class BatchEnumValueSerializer(serializers.ModelSerializer):
+    """Valor de enum dentro de un lote."""
+    id = serializers.UUIDField(required=False)
+    enum_type = serializers.UUIDField()
+
+    class Meta:
+        model = EnumValue
+        fields = ['id', 'enum_type', 'literal', 'ordinal']
+        validators = []
+
+
+ITEM_SERIALIZERS = {
+    'classes': BatchModelClassSerializer,
+    'attributes': BatchModelAttributeSerializer,
+    'methods': BatchModelMethodSerializer,
+    'relations': BatchModelRelationSerializer,
+    'enums': BatchEnumTypeSerializer,
+    'enum_values': BatchEnumValueSerializer,
+}
+
+
+class ElementOperationsSerializer(serializers.Serializer):
+    """Altas, modificaciones y bajas de un tipo de elemento."""
+    create = serializers.ListField(child=serializers.DictField(), required=False, default=list)
+    update = serializers.ListField(child=serializers.DictField(), required=False, default=list)
+    delete = serializers.ListField(child=serializers.UUIDField(), required=False, default=list)
+
+
+class ElementBatchSerializer(serializers.Serializer):
+    """
+    Lote de operaciones sobre los elementos de un diagrama.
+
+    Las altas pueden traer su propio `id` para que otros elementos del mismo
+    lote las referencien; las modificaciones requieren `id` y solo los campos
+    que cambian.
+    """
+    classes = ElementOperationsSerializer(required=False)
+    attributes = ElementOperationsSerializer(required=False)
+    methods = ElementOperationsSerializer(required=False)
+    relations = ElementOperationsSerializer(required=False)
+    enums = ElementOperationsSerializer(required=False)
+    enum_values = ElementOperationsSerializer(required=False)
+
+    def validate(self, attrs):
+        errors = {}
+        operations = {}
+        for kind, item_serializer in ITEM_SERIALIZERS.items():
+            ops = attrs.get(kind) or {}
+            validated = {'create': [], 'update': [], 'delete': ops.get('delete', [])}
+
+            for op, partial in (('create', False), ('update', True)):
+                for index, item in enumerate(ops.get(op, [])):
+                    serializer = item_serializer(data=item, partial=partial)
+                    if not serializer.is_valid():
+                        errors.setdefault(kind, {}).setdefault(op, {})[index] = serializer.errors
+                    elif partial and 'id' not in serializer.validated_data:
+                        errors.setdefault(kind, {}).setdefault(op, {})[index] = {
+                            'id': [serializers.Field.default_error_messages['required']]
+                        }
+                    else:
+                        validated[op].append(serializer.validated_data)
+
+            operations[kind] = validated
+
+        if errors:
+            raise serializers.ValidationError(errors)
+        return operations
@@ -1,3 +1,126 @@
+from django.contrib.auth import get_user_model
 from django.test import TestCase
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from Apps.modeling.element_batch import KINDS, apply_element_batch
+from Apps.modeling.models import Diagram, ModelClass, ModelMethod
+from Apps.modeling.versioning import StaleBaseVersionError, create_diagram_version
+from Apps.workspace.models import Membership, Organization, Project
+
+
+SNAPSHOT = {'classes': [], 'relations': [], 'metadata': {}}
+
+
+class DiagramVersionAllocationTests(TestCase):
+    """Asignación de números de versión y puntero `current_version`."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create(username='owner', email='owner@example.com')
+        organization = Organization.objects.create(name='Org', slug='org', created_by=self.user)
+        project = Project.objects.create(organization=organization, name='Proyecto', key='PRJ', created_by=self.user)
+        self.diagram = Diagram.objects.create(project=project, name='Diagrama', created_by=self.user)
+
+    def test_stale_save_does_not_rewind_counter(self):
+        """Renombrar con una instancia cargada antes de guardar una versión no rompe las siguientes."""
+        create_diagram_version(self.diagram.id, SNAPSHOT, self.user)
+        stale = Diagram.objects.get(id=self.diagram.id)
+        second = create_diagram_version(self.diagram.id, SNAPSHOT, self.user)
+
+        stale.name = 'Renombrado'
+        stale.save()
+
+        self.diagram.refresh_from_db()
+        self.assertEqual(self.diagram.name, 'Renombrado')
+        self.assertEqual(self.diagram.last_version_number, 2)
+        self.assertEqual(self.diagram.current_version_id, second.id)
+
+        third = create_diagram_version(self.diagram.id, SNAPSHOT, self.user)
+        self.assertEqual(third.version_number, 3)
+        self.diagram.refresh_from_db()
+        self.assertEqual(self.diagram.current_version_id, third.id)
+
+    def test_stale_base_version_is_rejected(self):
+        """Una escritura basada en una versión que ya no es la actual no avanza el contador."""
+        create_diagram_version(self.diagram.id, SNAPSHOT, self.user)
+        create_diagram_version(self.diagram.id, SNAPSHOT, self.user)
+
+        with self.assertRaises(StaleBaseVersionError):
+            create_diagram_version(self.diagram.id, SNAPSHOT, self.user, base_version_number=1)
+
+        self.diagram.refresh_from_db()
+        self.assertEqual(self.diagram.last_version_number, 2)
+        third = create_diagram_version(self.diagram.id, SNAPSHOT, self.user, base_version_number=2)
+        self.assertEqual(third.version_number, 3)
+
+
+class DiagramGraphETagTests(TestCase):
+    """ETag del grafo calculado sin construir la respuesta."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create(username='owner', email='owner@example.com')
+        organization = Organization.objects.create(name='Org', slug='org', created_by=self.user)
+        Membership.objects.create(organization=organization, user=self.user, role='owner', status='active')
+        project = Project.objects.create(organization=organization, name='Proyecto', key='PRJ', created_by=self.user)
+        self.diagram = Diagram.objects.create(project=project, name='Diagrama', created_by=self.user)
+        self.model_class = ModelClass.objects.create(
+            diagram=self.diagram, name='Cliente', visibility='public', x=0, y=0, width=120, height=80
+        )
+        self.method = ModelMethod.objects.create(
+            model_class=self.model_class, name='total', return_type='int',
+            visibility='public', parameters=[], position=0
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = f'/api/diagrams/{self.diagram.id}/graph/'
+
+    def test_not_modified_skips_element_queries(self):
+        """Con el ETag vigente se responde 304 sin consultar los elementos uno por uno."""
+        etag = self.client.get(self.url)['ETag']
+        with self.assertNumQueries(2):
+            # Diagrama (con permisos cacheados) y agregados del ETag
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_etag_changes_with_elements(self):
+        """Editar un método o borrar una clase invalida el ETag."""
+        etag = self.client.get(self.url)['ETag']
+
+        self.method.name = 'subtotal'
+        self.method.save()
+        renamed = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(renamed.status_code, 200)
+
+        self.model_class.delete()
+        deleted = self.client.get(self.url, HTTP_IF_NONE_MATCH=renamed['ETag'])
+        self.assertEqual(deleted.status_code, 200)
+
+
+class ElementBatchTests(TestCase):
+    """Escritura en lote de elementos."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create(username='owner', email='owner@example.com')
+        organization = Organization.objects.create(name='Org', slug='org', created_by=self.user)
+        project = Project.objects.create(organization=organization, name='Proyecto', key='PRJ', created_by=self.user)
+        self.diagram = Diagram.objects.create(project=project, name='Diagrama', created_by=self.user)
+
+    def _class(self, name):
+        return ModelClass.objects.create(
+            diagram=self.diagram, name=name, visibility='public', x=0, y=0, width=120, height=80
+        )
+
+    def test_swap_unique_names(self):
+        """Intercambiar nombres únicos entre clases no choca con la restricción de unicidad."""
+        first, second = self._class('Cliente'), self._class('Pedido')
+        operations = {name: {'create': [], 'update': [], 'delete': []} for name in KINDS}
+        operations['classes']['update'] = [
+            {'id': first.id, 'name': 'Pedido'},
+            {'id': second.id, 'name': 'Cliente'},
+        ]
+
+        result = apply_element_batch(self.diagram.id, operations)
+
+        self.assertEqual(result['updated']['classes'], 2)
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual((first.name, second.name), ('Pedido', 'Cliente'))
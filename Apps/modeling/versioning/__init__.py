@@ -0,0 +1,34 @@
+"""
+Versionado de diagramas basado en keyframes y deltas JSON Patch.
+"""
+
+from .compression import decode_document, encode_document
+from .diff import diff_snapshots
+from .json_patch import make_patch, apply_patch
+from .schema import SNAPSHOT_SCHEMA, snapshot_errors, snapshot_validator
+from .storage import (
+    StaleBaseVersionError,
+    StaleFencingTokenError,
+    count_elements,
+    create_diagram_version,
+    materialize_snapshot,
+)
+from .streaming import stream_envelope, stream_version_snapshot
+
+__all__ = [
+    'decode_document',
+    'encode_document',
+    'diff_snapshots',
+    'make_patch',
+    'apply_patch',
+    'SNAPSHOT_SCHEMA',
+    'snapshot_errors',
+    'snapshot_validator',
+    'count_elements',
+    'create_diagram_version',
+    'StaleFencingTokenError',
+    'StaleBaseVersionError',
+    'materialize_snapshot',
+    'stream_envelope',
+    'stream_version_snapshot',
+]
@@ -0,0 +1,32 @@
+"""
+Codificación de los documentos de versión (snapshot o delta) en bytes.
+
+Se guardan como JSON compacto comprimido con zlib: los snapshots repiten
+mucho (claves, tipos, nombres) y se reducen varias veces sin agregar
+dependencias. Las versiones solo se decodifican cuando alguien necesita
+su contenido.
+"""
+import json
+import zlib
+
+from django.conf import settings
+
+
+def _level():
+    """Nivel de compresión de zlib (1 más rápido, 9 más compacto)."""
+    return getattr(settings, 'DIAGRAM_VERSION_COMPRESSION_LEVEL', 6)
+
+
+def encode_document(document):
+    """Documento JSON → bytes comprimidos (None se mantiene)."""
+    if document is None:
+        return None
+    data = json.dumps(document, separators=(',', ':'), ensure_ascii=False).encode()
+    return zlib.compress(data, _level())
+
+
+def decode_document(data):
+    """Bytes comprimidos (o memoryview de la base de datos) → documento JSON."""
+    if data is None:
+        return None
+    return json.loads(zlib.decompress(data))
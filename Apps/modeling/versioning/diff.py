@@ -0,0 +1,82 @@
+"""
+Diferencia estructural entre dos snapshots de un diagrama.
+
+A diferencia de JSON Patch, que trabaja por posiciones, los elementos se
+emparejan por `id`: clases y relaciones a nivel del diagrama, y atributos y
+métodos dentro de cada clase. Solo se reportan los elementos agregados,
+eliminados o modificados, y de estos últimos solo los campos que cambiaron.
+"""
+from .json_patch import _same
+
+
+# Colecciones del snapshot que se emparejan por id
+COLLECTIONS = ('classes', 'relations')
+
+# Listas anidadas de cada clase que se emparejan por id dentro de ella
+NESTED = ('attributes', 'methods')
+
+
+def _index(elements):
+    """Elementos por id; los que no tienen id se identifican por su posición."""
+    indexed = {}
+    for position, element in enumerate(elements or []):
+        if not isinstance(element, dict):
+            continue
+        key = element.get('id')
+        indexed[key if key is not None else f'#{position}'] = element
+    return indexed
+
+
+def _field_changes(old, new, skip=()):
+    """Campos con valor distinto como `{campo: {'from': ..., 'to': ...}}`."""
+    changes = {}
+    for field in old.keys() | new.keys():
+        if field in skip:
+            continue
+        if not _same(old.get(field), new.get(field)):
+            changes[field] = {'from': old.get(field), 'to': new.get(field)}
+    return changes
+
+
+def _diff_collection(old_elements, new_elements, nested=()):
+    old_index, new_index = _index(old_elements), _index(new_elements)
+    result = {
+        'added': [new_index[key] for key in new_index if key not in old_index],
+        'removed': [old_index[key] for key in old_index if key not in new_index],
+        'changed': [],
+    }
+    for key, new in new_index.items():
+        old = old_index.get(key)
+        if old is None or _same(old, new):
+            continue
+        change = {'id': key, 'fields': _field_changes(old, new, skip=nested)}
+        for collection in nested:
+            nested_diff = _diff_collection(old.get(collection), new.get(collection))
+            if any(nested_diff.values()):
+                change[collection] = nested_diff
+        # Reordenar listas anidadas sin modificarlas no cuenta como cambio
+        if change['fields'] or len(change) > 2:
+            result['changed'].append(change)
+    return result
+
+
+def diff_snapshots(old, new):
+    """
+    Retorna `{'classes': ..., 'relations': ..., 'metadata': ...}`, donde cada
+    colección tiene `added`, `removed` y `changed`. Un cambio lleva el id, los
+    campos modificados y, en las clases, la diferencia de sus atributos y
+    métodos.
+    """
+    old, new = old or {}, new or {}
+    result = {
+        'classes': _diff_collection(old.get('classes'), new.get('classes'), nested=NESTED),
+        'relations': _diff_collection(old.get('relations'), new.get('relations')),
+    }
+    old_metadata, new_metadata = old.get('metadata'), new.get('metadata')
+    if isinstance(old_metadata, dict) and isinstance(new_metadata, dict):
+        result['metadata'] = _field_changes(old_metadata, new_metadata)
+    elif not _same(old_metadata, new_metadata):
+        result['metadata'] = {'from': old_metadata, 'to': new_metadata}
+    else:
+        result['metadata'] = {}
+    return result
@@ -0,0 +1,127 @@
+"""
+Generación y aplicación de JSON Patch (RFC 6902).
+
+Solo se generan operaciones `add`, `remove` y `replace`. Las listas se
+comparan recortando el prefijo y sufijo comunes, de modo que mover una
+clase o editar un atributo produce un delta de pocas operaciones.
+"""
+import copy
+
+
+def _escape(token):
+    return str(token).replace('~', '~0').replace('/', '~1')
+
+
+def _unescape(token):
+    return token.replace('~1', '/').replace('~0', '~')
+
+
+def _same(a, b):
+    """Igualdad estricta: distingue True de 1 y 1 de 1.0."""
+    return type(a) is type(b) and a == b
+
+
+def make_patch(source, target):
+    """Retorna la lista de operaciones que transforma `source` en `target`."""
+    operations = []
+    _diff(source, target, '', operations)
+    return operations
+
+
+def _diff(source, target, path, operations):
+    if isinstance(source, dict) and isinstance(target, dict):
+        _diff_dicts(source, target, path, operations)
+    elif isinstance(source, list) and isinstance(target, list):
+        _diff_lists(source, target, path, operations)
+    elif not _same(source, target):
+        operations.append({'op': 'replace', 'path': path, 'value': target})
+
+
+def _diff_dicts(source, target, path, operations):
+    for key in source:
+        if key not in target:
+            operations.append({'op': 'remove', 'path': f'{path}/{_escape(key)}'})
+    for key, value in target.items():
+        child = f'{path}/{_escape(key)}'
+        if key not in source:
+            operations.append({'op': 'add', 'path': child, 'value': value})
+        else:
+            _diff(source[key], value, child, operations)
+
+
+def _diff_lists(source, target, path, operations):
+    # Recortar prefijo y sufijo comunes
+    start = 0
+    limit = min(len(source), len(target))
+    while start < limit and _same_deep(source[start], target[start]):
+        start += 1
+
+    source_end, target_end = len(source), len(target)
+    while (source_end > start and target_end > start
+           and _same_deep(source[source_end - 1], target[target_end - 1])):
+        source_end -= 1
+        target_end -= 1
+
+    # La zona central se compara posición a posición; el excedente se quita o agrega
+    paired = min(source_end, target_end) - start
+    for offset in range(paired):
+        index = start + offset
+        _diff(source[index], target[index], f'{path}/{index}', operations)
+
+    for index in range(source_end - 1, start + paired - 1, -1):
+        operations.append({'op': 'remove', 'path': f'{path}/{index}'})
+    for index in range(start + paired, target_end):
+        operations.append({'op': 'add', 'path': f'{path}/{index}', 'value': target[index]})
+
+
+def _same_deep(a, b):
+    if isinstance(a, dict) and isinstance(b, dict):
+        return a.keys() == b.keys() and all(_same_deep(a[k], b[k]) for k in a)
+    if isinstance(a, list) and isinstance(b, list):
+        return len(a) == len(b) and all(_same_deep(x, y) for x, y in zip(a, b))
+    return _same(a, b)
+
+
+def apply_patch(document, operations, in_place=False):
+    """
+    Aplica las operaciones sobre `document` y retorna el resultado.
+
+    Con `in_place=True` se modifica el documento recibido, útil al aplicar
+    una cadena de deltas sobre una copia ya hecha.
+    """
+    if not in_place:
+        document = copy.deepcopy(document)
+
+    for operation in operations:
+        op, path = operation['op'], operation['path']
+        if path == '':
+            if op in ('add', 'replace'):
+                document = operation['value']
+                continue
+            raise ValueError("No se puede eliminar la raíz del documento")
+
+        tokens = [_unescape(token) for token in path.split('/')[1:]]
+        parent = document
+        for token in tokens[:-1]:
+            parent = parent[int(token)] if isinstance(parent, list) else parent[token]
+        last = tokens[-1]
+
+        if isinstance(parent, list):
+            index = len(parent) if last == '-' else int(last)
+            if op == 'add':
+                parent.insert(index, operation['value'])
+            elif op == 'remove':
+                del parent[index]
+            elif op == 'replace':
+                parent[index] = operation['value']
+            else:
+                raise ValueError(f"Operación JSON Patch no soportada: {op}")
+        else:
+            if op in ('add', 'replace'):
+                parent[last] = operation['value']
+            elif op == 'remove':
+                del parent[last]
+            else:
+                raise ValueError(f"Operación JSON Patch no soportada: {op}")
+
+    return document
@@ -0,0 +1,250 @@
+"""
+Esquema JSON completo de los snapshots de diagramas.
+
+Valida cada clase (con sus atributos y métodos), cada relación y los
+metadatos. Los campos desconocidos se aceptan (el editor agrega los suyos),
+pero los conocidos deben tener el tipo que esperan los consumidores (diff,
+movimientos en tiempo real, generación de código).
+
+El esquema se compila una sola vez por proceso (al iniciar la app) a
+funciones Python equivalentes a las de jsonschema para este subconjunto de
+palabras clave; la validación recorre el snapshot una vez, cortando al
+llegar al máximo de errores a reportar.
+"""
+import functools
+
+from django.conf import settings
+from jsonschema import Draft202012Validator
+
+
+_ID = {'type': 'string', 'minLength': 1}
+_NAME = {'type': 'string', 'minLength': 1}
+_TEXT = {'type': ['string', 'null']}
+_NUMBER = {'type': 'number'}
+
+_ATTRIBUTE = {
+    'type': 'object',
+    'required': ['name'],
+    'properties': {
+        'id': _ID,
+        'name': _NAME,
+        'type': _TEXT,
+        'type_name': _TEXT,
+        'visibility': _TEXT,
+        'default_value': _TEXT,
+        'is_required': {'type': 'boolean'},
+        'is_primary_key': {'type': 'boolean'},
+        'length': {'type': ['integer', 'null']},
+        'precision': {'type': ['integer', 'null']},
+        'scale': {'type': ['integer', 'null']},
+        'position': {'type': 'integer'},
+    },
+}
+
+_METHOD = {
+    'type': 'object',
+    'required': ['name'],
+    'properties': {
+        'id': _ID,
+        'name': _NAME,
+        'returnType': _TEXT,
+        'return_type': _TEXT,
+        'visibility': _TEXT,
+        'position': {'type': 'integer'},
+    },
+}
+
+_CLASS = {
+    'type': 'object',
+    'required': ['id', 'name'],
+    'properties': {
+        'id': _ID,
+        'name': _NAME,
+        'stereotype': _TEXT,
+        'visibility': _TEXT,
+        'x': _NUMBER,
+        'y': _NUMBER,
+        'width': _NUMBER,
+        'height': _NUMBER,
+        'position': {
+            'type': 'object',
+            'required': ['x', 'y'],
+            'properties': {'x': _NUMBER, 'y': _NUMBER},
+        },
+        'attributes': {'type': 'array', 'items': _ATTRIBUTE},
+        'methods': {'type': 'array', 'items': _METHOD},
+    },
+}
+
+_RELATION = {
+    'type': 'object',
+    'required': ['id'],
+    'properties': {
+        'id': _ID,
+        'type': _TEXT,
+        'relation_kind': _TEXT,
+        'name': _TEXT,
+        'source_class': _ID,
+        'target_class': _ID,
+        'from_class': _ID,
+        'to_class': _ID,
+        'source_multiplicity': _TEXT,
+        'target_multiplicity': _TEXT,
+        'source_role': _TEXT,
+        'target_role': _TEXT,
+        'is_bidirectional': {'type': 'boolean'},
+    },
+}
+
+SNAPSHOT_SCHEMA = {
+    '$schema': 'https://json-schema.org/draft/2020-12/schema',
+    'type': 'object',
+    'required': ['classes', 'relations', 'metadata'],
+    'properties': {
+        'classes': {'type': 'array', 'items': _CLASS},
+        'relations': {'type': 'array', 'items': _RELATION},
+        'metadata': {'type': 'object'},
+    },
+}
+
+_TYPE_NAMES = {
+    'object': 'un objeto',
+    'array': 'una lista',
+    'string': 'un texto',
+    'number': 'un número',
+    'integer': 'un entero',
+    'boolean': 'un booleano',
+    'null': 'null',
+}
+
+# Palabras clave que entiende el compilador; el esquema no usa otras
+_KEYWORDS = {'$schema', 'type', 'required', 'properties', 'items', 'minLength'}
+
+
+class _ErrorLimit(Exception):
+    """Se alcanzó el máximo de errores: la validación termina ahí."""
+
+
+class _Errors(list):
+    def __init__(self, limit):
+        super().__init__()
+        self.limit = limit
+
+    def add(self, path, message):
+        self.append(f"{_location(path)}: {message}")
+        if len(self) >= self.limit:
+            raise _ErrorLimit
+
+
+def _location(path):
+    """`('classes', 3, 'name')` → `classes[3].name`."""
+    location = ''
+    for part in path:
+        location += f'[{part}]' if isinstance(part, int) else (f'.{part}' if location else part)
+    return location or 'snapshot'
+
+
+def _type_check(names):
+    """Función que verifica `type` con la misma semántica que jsonschema."""
+    python_types = []
+    for name in names:
+        if name == 'object':
+            python_types.append(dict)
+        elif name == 'array':
+            python_types.append(list)
+        elif name == 'string':
+            python_types.append(str)
+        elif name == 'null':
+            python_types.append(type(None))
+        elif name not in ('number', 'integer', 'boolean'):
+            raise ValueError(f"Tipo de esquema no soportado: {name}")
+    python_types = tuple(python_types)
+    numeric = 'number' in names
+    integer = 'integer' in names
+    boolean = 'boolean' in names
+
+    def check(value):
+        if isinstance(value, bool):
+            return boolean
+        if isinstance(value, python_types):
+            return True
+        if isinstance(value, int):
+            return numeric or integer
+        if isinstance(value, float):
+            return numeric or (integer and value.is_integer())
+        return False
+
+    return check
+
+
+def _compile(schema):
+    """Convierte un (sub)esquema en una función `validate(instance, path, errors)`."""
+    unsupported = set(schema) - _KEYWORDS
+    if unsupported:
+        raise ValueError(f"Palabras clave de esquema no soportadas: {sorted(unsupported)}")
+
+    type_ok = type_message = None
+    if 'type' in schema:
+        names = schema['type'] if isinstance(schema['type'], list) else [schema['type']]
+        type_ok = _type_check(names)
+        type_message = 'debe ser ' + ' o '.join(_TYPE_NAMES[name] for name in names)
+    required = tuple(schema.get('required', ()))
+    properties = {name: _compile(subschema) for name, subschema in schema.get('properties', {}).items()}
+    items = _compile(schema['items']) if 'items' in schema else None
+    min_length = schema.get('minLength')
+
+    def validate(instance, path, errors):
+        # Como en jsonschema, si el tipo no coincide las demás reglas no aplican
+        if type_ok is not None and not type_ok(instance):
+            errors.add(path, type_message)
+            return
+        if isinstance(instance, dict):
+            missing = [f"'{field}'" for field in required if field not in instance]
+            if missing:
+                label = 'falta el campo' if len(missing) == 1 else 'faltan los campos'
+                errors.add(path, f"{label} {', '.join(missing)}")
+            if properties:
+                for key, value in instance.items():
+                    check = properties.get(key)
+                    if check is not None:
+                        check(value, path + (key,), errors)
+        elif isinstance(instance, list):
+            if items is not None:
+                for index, element in enumerate(instance):
+                    items(element, path + (index,), errors)
+        elif isinstance(instance, str):
+            if min_length is not None and len(instance) < min_length:
+                errors.add(path, 'no puede estar vacío' if min_length == 1 else f'debe tener al menos {min_length} caracteres')
+
+    return validate
+
+
+def _max_errors():
+    """Errores que se reportan como máximo por snapshot."""
+    return getattr(settings, 'DIAGRAM_SNAPSHOT_MAX_ERRORS', 10)
+
+
+@functools.lru_cache(maxsize=None)
+def snapshot_validator():
+    """
+    Validador compilado del esquema, construido una sola vez. El esquema se
+    verifica con jsonschema y luego se traduce a funciones Python
+    especializadas: el validador genérico de jsonschema interpreta el esquema
+    en cada elemento y resulta demasiado lento para usarlo en cada guardado.
+    """
+    Draft202012Validator.check_schema(SNAPSHOT_SCHEMA)
+    return _compile(SNAPSHOT_SCHEMA)
+
+
+def snapshot_errors(snapshot, limit=None):
+    """
+    Mensajes de los primeros `limit` errores del snapshot (lista vacía si es
+    válido). El snapshot se recorre una sola vez y la validación se detiene
+    al alcanzar el límite.
+    """
+    errors = _Errors(limit or _max_errors())
+    try:
+        snapshot_validator()(snapshot, (), errors)
+    except _ErrorLimit:
+        pass
+    return list(errors)
@@ -0,0 +1,136 @@
+"""
+Almacenamiento de versiones como keyframes periódicos más deltas JSON Patch.
+
+Cada versión DELTA guarda el parche respecto a la versión anterior y el
+número de su keyframe base (`base_version_number`), por lo que reconstruir
+cualquier versión requiere una sola consulta: el keyframe y los deltas del
+rango `[base, version_number]`.
+"""
+import json
+import uuid
+
+from django.conf import settings
+from django.db import models, transaction
+
+from Apps.common.models import VersionStorageKind
+from .compression import decode_document, encode_document
+from .json_patch import make_patch, apply_patch
+
+
+def _keyframe_interval():
+    """Cantidad máxima de versiones por cadena (keyframe incluido)."""
+    return getattr(settings, 'DIAGRAM_VERSION_KEYFRAME_INTERVAL', 20)
+
+
+def _max_delta_ratio():
+    """Si el delta supera esta fracción del snapshot se guarda un keyframe."""
+    return getattr(settings, 'DIAGRAM_VERSION_MAX_DELTA_RATIO', 0.5)
+
+
+def count_elements(snapshot):
+    """Contadores de elementos que se guardan junto a la versión."""
+    snapshot = snapshot or {}
+    return len(snapshot.get('classes') or []), len(snapshot.get('relations') or [])
+
+
+def materialize_snapshot(version):
+    """Reconstruye el snapshot completo de una versión."""
+    from Apps.modeling.models import DiagramVersion
+
+    if version.storage_kind == VersionStorageKind.KEYFRAME:
+        if 'payload' not in version.get_deferred_fields():
+            return version.snapshot
+        return decode_document(DiagramVersion.objects.values_list('payload', flat=True).get(pk=version.pk))
+
+    chain = DiagramVersion.objects.filter(
+        diagram_id=version.diagram_id,
+        version_number__gte=version.base_version_number,
+        version_number__lte=version.version_number
+    ).order_by('version_number').values_list('storage_kind', 'payload')
+
+    document = None
+    for storage_kind, payload in chain:
+        if storage_kind == VersionStorageKind.KEYFRAME:
+            document = decode_document(payload)
+        else:
+            document = apply_patch(document, decode_document(payload), in_place=True)
+    return document
+
+
+class StaleFencingTokenError(Exception):
+    """El `fencing_token` de la escritura ya no corresponde al bloqueo vigente."""
+
+
+class StaleBaseVersionError(Exception):
+    """La versión actual del diagrama ya no es aquella sobre la que se construyó el snapshot."""
+
+
+def create_diagram_version(diagram_id, snapshot, created_by, message=None, fencing_token=None,
+                           base_version_number=None):
+    """
+    Crea la siguiente versión del diagrama decidiendo si se guarda como
+    keyframe o como delta respecto a la versión anterior.
+
+    `created_by` puede ser el usuario o solo su id (autoguardado en tiempo real).
+    Con `fencing_token`, la escritura solo procede si el bloqueo del diagrama
+    sigue siendo esa concesión; si no, lanza `StaleFencingTokenError`.
+    Con `base_version_number` (0 si el diagrama no tenía versiones), la
+    escritura solo procede si esa sigue siendo la versión actual; si no,
+    lanza `StaleBaseVersionError`.
+    """
+    from Apps.collaboration.models import Lock
+    from Apps.modeling.models import Diagram, DiagramVersion
+
+    classes_count, relations_count = count_elements(snapshot)
+    if isinstance(created_by, models.Model):
+        creator = {'created_by': created_by}
+    else:
+        creator = {'created_by_id': created_by}
+
+    version_id = uuid.uuid4()
+    with transaction.atomic():
+        # Número y versión actual en un solo UPDATE, que además serializa las escrituras del diagrama
+        diagram = Diagram.allocate_version(diagram_id, version_id)
+
+        if fencing_token is not None and not Lock.holds_fencing_token(diagram_id, fencing_token):
+            raise StaleFencingTokenError(diagram_id, fencing_token)
+
+        next_version_number = diagram.last_version_number
+        last_version = None
+        if diagram.previous_version_id is not None:
+            last_version = DiagramVersion.objects.get(pk=diagram.previous_version_id)
+
+        current_version_number = last_version.version_number if last_version else 0
+        if base_version_number is not None and base_version_number != current_version_number:
+            # El rollback deshace también la asignación del número
+            raise StaleBaseVersionError(diagram_id, base_version_number, current_version_number)
+
+        storage = {
+            'storage_kind': VersionStorageKind.KEYFRAME,
+            'base_version_number': next_version_number,
+            'payload': snapshot,
+        }
+        if last_version and next_version_number - last_version.base_version_number < _keyframe_interval():
+            delta = make_patch(materialize_snapshot(last_version), snapshot)
+            if len(json.dumps(delta)) <= _max_delta_ratio() * len(json.dumps(snapshot)):
+                storage = {
+                    'storage_kind': VersionStorageKind.DELTA,
+                    'base_version_number': last_version.base_version_number,
+                    'payload': delta,
+                }
+        storage['payload'] = encode_document(storage['payload'])
+
+        diagram_version = DiagramVersion.objects.create(
+            id=version_id,
+            diagram=diagram,
+            version_number=next_version_number,
+            message=message,
+            **creator,
+            classes_count=classes_count,
+            relations_count=relations_count,
+            **storage
+        )
+
+    # Evita reconstruir el snapshot al serializar la respuesta
+    diagram_version._materialized_snapshot = snapshot
+    return diagram_version
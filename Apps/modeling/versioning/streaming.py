@@ -0,0 +1,94 @@
+"""
+Codificación por partes de las respuestas con snapshots grandes.
+
+En lugar de armar el dict completo y renderizarlo en un solo `bytes`, la
+respuesta se emite en trozos: primero los campos del sobre y luego el
+snapshot. Un keyframe ya está guardado como JSON compacto (comprimido), así
+que se descomprime de a trozos directo a la respuesta sin decodificarlo; los
+demás snapshots se codifican elemento por elemento en `classes` y
+`relations`.
+"""
+import json
+import zlib
+
+from django.conf import settings
+
+from Apps.common.models import VersionStorageKind
+
+
+# Listas del snapshot que se codifican elemento por elemento
+STREAMED_COLLECTIONS = ('classes', 'relations')
+
+# Mismo formato que `JSONRenderer` de DRF (UNICODE_JSON y COMPACT_JSON)
+_encoder = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+
+
+def _chunk_size():
+    """Bytes aproximados de cada trozo de la respuesta."""
+    return getattr(settings, 'DIAGRAM_VERSION_STREAM_CHUNK_SIZE', 64 * 1024)
+
+
+def stream_payload(payload, chunk_size=None):
+    """Descomprime el JSON guardado de a trozos, sin decodificarlo."""
+    chunk_size = chunk_size or _chunk_size()
+    decompressor = zlib.decompressobj()
+    # `max_length` acota cada trozo descomprimido: el JSON comprime mucho
+    pending = bytes(payload)
+    while not decompressor.eof:
+        chunk = decompressor.decompress(pending, chunk_size)
+        pending = decompressor.unconsumed_tail
+        if not chunk:
+            raise zlib.error("Payload comprimido incompleto")
+        yield chunk
+
+
+def stream_document(document, chunk_size=None):
+    """Codifica un snapshot emitiendo `classes` y `relations` en trozos de ~`chunk_size` bytes."""
+    if not isinstance(document, dict):
+        yield _encoder.encode(document).encode()
+        return
+
+    chunk_size = chunk_size or _chunk_size()
+    buffer = [b'{']
+    size = 1
+    for index, (key, value) in enumerate(document.items()):
+        prefix = (',' if index else '') + _encoder.encode(key) + ':'
+        if key not in STREAMED_COLLECTIONS or not isinstance(value, list):
+            part = (prefix + _encoder.encode(value)).encode()
+            buffer.append(part)
+            size += len(part)
+            continue
+
+        buffer.append((prefix + '[').encode())
+        for position, element in enumerate(value):
+            part = ((',' if position else '') + _encoder.encode(element)).encode()
+            buffer.append(part)
+            size += len(part)
+            if size >= chunk_size:
+                yield b''.join(buffer)
+                buffer, size = [], 0
+        buffer.append(b']')
+    buffer.append(b'}')
+    yield b''.join(buffer)
+
+
+def stream_envelope(envelope, field, content):
+    """
+    Emite `envelope` (ya renderizado como objeto JSON) con `field` agregado
+    al final, cuyo valor son los trozos de `content`.
+    """
+    head = envelope.rstrip()
+    if not head.endswith(b'}'):
+        raise ValueError("El sobre debe ser un objeto JSON")
+    head = head[:-1]
+    separator = b',' if head.rstrip() != b'{' else b''
+    yield head + separator + _encoder.encode(field).encode() + b':'
+    yield from content
+    yield b'}'
+
+
+def stream_version_snapshot(version, chunk_size=None):
+    """Trozos del snapshot completo de `version` como JSON."""
+    if version.storage_kind == VersionStorageKind.KEYFRAME and version.payload is not None:
+        return stream_payload(version.payload, chunk_size)
+    return stream_document(version.full_snapshot, chunk_size)
@@ -1,8 +1,15 @@
 """
 ViewSet para versiones de diagramas - M04, M05, M06.
 """
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import OrderingFilter
@@ -14,7 +21,30 @@ from Apps.modeling.serializers import (
     DiagramVersionDetailSerializer, 
     DiagramVersionListSerializer
 )
+from Apps.modeling.versioning import (
+    diff_snapshots,
+    materialize_snapshot,
+    stream_envelope,
+    stream_version_snapshot,
+)
+from Apps.common.pagination import EstimatedCountCursorPagination
 from Apps.workspace.models import ProjectMember
+from Apps.workspace.access import member_project_ids
+
+
+def _streaming_json_response(request, chunks):
+    """
+    Respuesta JSON en streaming. Bajo ASGI el iterador debe ser asíncrono:
+    Django consume uno síncrono completo en memoria antes de enviarlo.
+    """
+    if isinstance(request._request, ASGIRequest):
+        async def stream():
+            for chunk in chunks:
+                yield chunk
+        content = stream()
+    else:
+        content = chunks
+    return StreamingHttpResponse(content, content_type='application/json')
 
 
 class DiagramVersionViewSet(viewsets.ModelViewSet):
@@ -25,6 +55,7 @@ class DiagramVersionViewSet(viewsets.ModelViewSet):
     - M04: POST /api/diagram-versions/ - Crear versión del diagrama
     - M05: GET /api/diagram-versions/?diagram={id} - Listar versiones de un diagrama
     - M06: GET /api/diagram-versions/{id}/ - Obtener versión específica
+    - GET /api/diagram-versions/diff/?from={id}&to={id} - Diferencia entre dos versiones
     """
     
     queryset = DiagramVersion.objects.select_related(
@@ -37,6 +68,8 @@ class DiagramVersionViewSet(viewsets.ModelViewSet):
     filterset_fields = ['diagram']
     ordering_fields = ['version_number', 'created_at']
     ordering = ['-version_number']
+    # Cursor sobre el orden elegido; el índice (diagram, -version_number) resuelve cada página
+    pagination_class = EstimatedCountCursorPagination
     
     def get_serializer_class(self):
         """Retorna el serializer apropiado según la acción."""
@@ -50,13 +83,18 @@ class DiagramVersionViewSet(viewsets.ModelViewSet):
         """Filtra versiones según los permisos del usuario."""
         user = self.request.user
         
+        queryset = self.queryset
+        if self.action == 'list':
+            # El listado usa los contadores guardados; no cargar snapshots ni deltas
+            queryset = queryset.defer('payload')
+        
         if user.is_superuser:
-            return self.queryset
+            return queryset
         
         # Solo versiones de diagramas en proyectos donde el usuario es miembro
-        return self.queryset.filter(
-            diagram__project__projectmember__user=user
-        ).distinct()
+        return queryset.filter(
+            diagram__project_id__in=member_project_ids(self.request)
+        )
     
     @extend_schema(
         operation_id='create_diagram_version',
@@ -188,6 +226,9 @@ class DiagramVersionViewSet(viewsets.ModelViewSet):
         - Información del diagrama y proyecto
         - Snapshot JSON completo del diagrama
         
+        La respuesta JSON se envía en streaming: primero los datos de la
+        versión y al final el snapshot, por partes.
+        
         **Casos de uso:**
         - Revisar el estado del diagrama en un momento específico
         - Restaurar/comparar versiones
@@ -212,7 +253,99 @@ class DiagramVersionViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_403_FORBIDDEN
             )
         
-        return super().retrieve(request, *args, **kwargs)
+        # La API navegable necesita el dict completo para renderizar el HTML
+        if not isinstance(request.accepted_renderer, JSONRenderer):
+            return super().retrieve(request, *args, **kwargs)
+        
+        # El sobre se renderiza sin el snapshot, que se emite después por partes
+        serializer = self.get_serializer(
+            version, context={**self.get_serializer_context(), 'omit_snapshot': True}
+        )
+        envelope = JSONRenderer().render(serializer.data)
+        chunks = stream_envelope(envelope, 'snapshot', stream_version_snapshot(version))
+        return _streaming_json_response(request, chunks)
+    
+    @extend_schema(
+        operation_id='diff_diagram_versions',
+        summary='Diferencia estructural entre dos versiones',
+        description='''
+        Compara dos versiones del mismo diagrama emparejando clases,
+        relaciones, atributos y métodos por id.
+        
+        **Respuesta:**
+        - `classes` / `relations`: elementos `added`, `removed` y `changed`
+          (con los campos modificados como `{from, to}`)
+        - Las clases modificadas incluyen la diferencia de `attributes` y `methods`
+        - `metadata`: campos de metadata modificados
+        
+        Las versiones son inmutables, por lo que el resultado se cachea por
+        par de versiones.
+        ''',
+        parameters=[
+            OpenApiParameter(
+                name='from',
+                description='ID de la versión base',
+                required=True,
+                type=OpenApiTypes.UUID,
+                location=OpenApiParameter.QUERY
+            ),
+            OpenApiParameter(
+                name='to',
+                description='ID de la versión a comparar',
+                required=True,
+                type=OpenApiTypes.UUID,
+                location=OpenApiParameter.QUERY
+            )
+        ],
+        responses={
+            200: OpenApiTypes.OBJECT,
+            400: 'Parámetros inválidos o versiones de distintos diagramas',
+            404: 'Versión no encontrada'
+        }
+    )
+    @action(detail=False, methods=['get'])
+    def diff(self, request):
+        """Diferencia entre las versiones `from` y `to`."""
+        try:
+            from_id = uuid.UUID(request.query_params.get('from', ''))
+            to_id = uuid.UUID(request.query_params.get('to', ''))
+        except ValueError:
+            return Response(
+                {'error': 'Los parámetros "from" y "to" deben ser IDs de versión'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        # Permisos y diagrama de ambas versiones sin cargar snapshots ni deltas
+        versions = {
+            version.id: version
+            for version in self.get_queryset().filter(id__in=[from_id, to_id]).defer('payload')
+        }
+        if from_id not in versions or to_id not in versions:
+            return Response(
+                {'error': 'Versión no encontrada'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        from_version, to_version = versions[from_id], versions[to_id]
+        if from_version.diagram_id != to_version.diagram_id:
+            return Response(
+                {'error': 'Las versiones deben pertenecer al mismo diagrama'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        cache_key = f'diagram-version-diff:{from_id}:{to_id}'
+        changes = cache.get(cache_key)
+        if changes is None:
+            changes = diff_snapshots(
+                materialize_snapshot(from_version), materialize_snapshot(to_version)
+            )
+            cache.set(cache_key, changes, getattr(settings, 'DIAGRAM_VERSION_DIFF_CACHE_TIMEOUT', None))
+        
+        return Response({
+            'diagram_id': from_version.diagram_id,
+            'from': {'id': from_id, 'version_number': from_version.version_number},
+            'to': {'id': to_id, 'version_number': to_version.version_number},
+            **changes
+        })
     
     def perform_create(self, serializer):
         """Asigna el usuario actual como creador de la versión."""
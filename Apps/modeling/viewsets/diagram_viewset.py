@@ -2,15 +2,28 @@
 ViewSet para el modelo Diagram según especificación Fase 1.
 """
 from rest_framework import viewsets, status, filters
+from rest_framework.decorators import action
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from drf_spectacular.utils import extend_schema, extend_schema_view, OpenApiParameter, OpenApiResponse
+from django.db import IntegrityError
+from django.http import HttpResponse
 from django.utils import timezone
+from django.utils.http import parse_etags
 import uuid
 
 from ..models import Diagram
-from ..serializers import DiagramSerializer, DiagramUpdateSerializer
+from ..element_batch import ElementBatchError, apply_element_batch
+from ..serializers import (
+    DiagramSerializer,
+    DiagramUpdateSerializer,
+    DiagramGraphSerializer,
+    ElementBatchSerializer,
+)
 from ..permissions import IsProjectMemberForDiagram, CanEditDiagram
+from Apps.common.pagination import EstimatedCountCursorPagination
+from Apps.workspace.access import accessible_project_ids
 
 
 @extend_schema_view(
@@ -79,6 +92,8 @@ class DiagramViewSet(viewsets.ModelViewSet):
     serializer_class = DiagramSerializer
     filter_backends = [filters.SearchFilter]
     search_fields = ['name']
+    # Cursor sobre -created_at; el índice (project, -created_at) resuelve cada página
+    pagination_class = EstimatedCountCursorPagination
     
     def get_permissions(self):
         """
@@ -86,9 +101,9 @@ class DiagramViewSet(viewsets.ModelViewSet):
         """
         if self.action == 'create':
             permission_classes = [IsAuthenticated]
-        elif self.action in ['retrieve']:
+        elif self.action in ['retrieve', 'graph']:
             permission_classes = [IsAuthenticated, IsProjectMemberForDiagram] 
-        elif self.action in ['partial_update', 'destroy']:
+        elif self.action in ['partial_update', 'destroy', 'elements_batch']:
             permission_classes = [IsAuthenticated, CanEditDiagram]
         else:  # list
             permission_classes = [IsAuthenticated]
@@ -117,10 +132,9 @@ class DiagramViewSet(viewsets.ModelViewSet):
             queryset = Diagram.objects.filter(deleted_at__isnull=True)
         else:
             queryset = Diagram.objects.filter(
-                project__organization__membership__user=user,
-                project__organization__membership__status='active',
+                project_id__in=accessible_project_ids(self.request),
                 deleted_at__isnull=True
-            ).distinct()
+            )
         
         # Filtrar por proyecto si se especifica
         if project_id:
@@ -167,6 +181,91 @@ class DiagramViewSet(viewsets.ModelViewSet):
         instance.deleted_at = timezone.now()
         instance.save()
     
+    @extend_schema(
+        summary="M03 - Obtener grafo completo del diagrama",
+        description="""
+        Devuelve en una sola respuesta las clases (con atributos y métodos),
+        relaciones y enums (con valores) del diagrama.
+
+        La respuesta incluye un `ETag`; si se envía en `If-None-Match` y el
+        grafo no cambió se responde `304 Not Modified` sin cuerpo.
+        """,
+        responses={
+            200: OpenApiResponse(description="Grafo completo del diagrama"),
+            304: OpenApiResponse(description="El grafo no cambió desde el ETag enviado"),
+            403: OpenApiResponse(description="Sin permisos para acceder a este diagrama"),
+            404: OpenApiResponse(description="Diagrama no encontrado")
+        },
+        tags=['Modeling']
+    )
+    @action(detail=True, methods=['get'])
+    def graph(self, request, pk=None):
+        """
+        Grafo completo del diagrama con una cantidad constante de consultas.
+        """
+        diagram = self.get_object()
+        # El ETag sale de agregados baratos: un 304 no lee ni serializa los elementos
+        etag = DiagramGraphSerializer.etag(diagram)
+        headers = {'ETag': etag, 'Cache-Control': 'private, no-cache'}
+
+        client_etags = parse_etags(request.headers.get('If-None-Match', ''))
+        if etag in client_etags or '*' in client_etags:
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        content = JSONRenderer().render(DiagramGraphSerializer(diagram).data)
+        return HttpResponse(content, content_type='application/json', headers=headers)
+
+    @extend_schema(
+        summary="M03 - Escribir elementos del diagrama en lote",
+        description="""
+        Aplica en una sola transacción altas (`create`), modificaciones
+        (`update`) y bajas (`delete`) de clases, atributos, métodos,
+        relaciones, enums y valores de enum.
+
+        El lote completo se valida antes de escribir (pertenencia al diagrama,
+        referencias y unicidad de nombres); si algo falla no se aplica nada.
+        """,
+        request=ElementBatchSerializer,
+        responses={
+            200: OpenApiResponse(description="Ids creados y cantidad de elementos modificados/eliminados por tipo"),
+            400: OpenApiResponse(description="Lote inválido"),
+            403: OpenApiResponse(description="Sin permisos para editar este diagrama"),
+            404: OpenApiResponse(description="Diagrama no encontrado")
+        },
+        tags=['Modeling']
+    )
+    @action(detail=True, methods=['post'], url_path='elements:batch')
+    def elements_batch(self, request, pk=None):
+        """
+        Escritura en lote de los elementos del diagrama.
+        """
+        diagram = self.get_object()
+        serializer = ElementBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        try:
+            result = apply_element_batch(diagram.id, serializer.validated_data)
+        except ElementBatchError as exc:
+            return Response(
+                {
+                    "code": "validation_error",
+                    "message": "El lote no es consistente con el estado del diagrama",
+                    "details": exc.errors
+                },
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        except IntegrityError as exc:
+            return Response(
+                {
+                    "code": "integrity_error",
+                    "message": "El lote viola una restricción de la base de datos",
+                    "details": str(exc)
+                },
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        return Response(result)
+
     # Sobrescribir método no permitido en Fase 1
     def update(self, request, *args, **kwargs):
         return Response(
@@ -4,6 +4,7 @@ ViewSet para el modelo ModelClass.
 from rest_framework import viewsets, permissions
 from ..models import ModelClass
 from ..serializers import ModelClassSerializer
+from Apps.workspace.access import accessible_project_ids
 
 
 class ModelClassViewSet(viewsets.ModelViewSet):
@@ -19,6 +20,5 @@ class ModelClassViewSet(viewsets.ModelViewSet):
         if user.is_staff:
             return ModelClass.objects.all()
         return ModelClass.objects.filter(
-            diagram__project__organization__membership__user=user,
-            diagram__project__organization__membership__status='active'
-        ).distinct()
+            diagram__project_id__in=accessible_project_ids(self.request)
+        )
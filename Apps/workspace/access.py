@@ -0,0 +1,136 @@
+"""
+Autorización cacheada de acceso a proyectos y diagramas.
+
+El acceso a un diagrama depende de dos datos que cambian con muy distinta
+frecuencia: el proyecto al que pertenece el diagrama (fijo) y la membresía
+del usuario en ese proyecto. Ambos se guardan en la caché de Django; en un
+fallo se resuelven con una sola consulta y las señales de `ProjectMember`
+invalidan la membresía cuando cambia.
+
+Los listados de la API filtran por el conjunto de proyectos accesibles del
+usuario (`accessible_project_ids`), cacheado en la petición y por un tiempo
+corto entre peticiones; las señales de `Membership` y `Project` lo invalidan.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Exists, OuterRef
+
+from Apps.modeling.models import Diagram
+from .models import Membership, Project, ProjectMember
+
+
+def diagram_project_key(diagram_id):
+    return f'access:diagram-project:{diagram_id}'
+
+
+def membership_key(user_id, project_id):
+    return f'access:project-member:{project_id}:{user_id}'
+
+
+def accessible_projects_key(user_id):
+    return f'access:accessible-projects:{user_id}'
+
+
+def member_projects_key(user_id):
+    return f'access:member-projects:{user_id}'
+
+
+def _config():
+    return getattr(settings, 'WORKSPACE_ACCESS_CACHE', {})
+
+
+def _ttls():
+    config = _config()
+    return config.get('DIAGRAM_PROJECT_TTL', 3600), config.get('MEMBERSHIP_TTL', 30)
+
+
+def _cached_project_ids(request, attribute, key, queryset_factory):
+    """Ids cacheados primero en la petición y luego en la caché compartida."""
+    project_ids = getattr(request, attribute, None)
+    if project_ids is not None:
+        return project_ids
+
+    project_ids = cache.get(key)
+    if project_ids is None:
+        project_ids = list(queryset_factory().values_list('id', flat=True))
+        cache.set(key, project_ids, _config().get('PROJECT_IDS_TTL', 60))
+    setattr(request, attribute, project_ids)
+    return project_ids
+
+
+def accessible_project_ids(request):
+    """Proyectos de las organizaciones donde el usuario tiene membresía activa."""
+    user = request.user
+    return _cached_project_ids(
+        request,
+        '_accessible_project_ids',
+        accessible_projects_key(user.pk),
+        lambda: Project.objects.filter(
+            organization_id__in=Membership.objects.filter(
+                user=user, status='active'
+            ).values('organization_id')
+        )
+    )
+
+
+def member_project_ids(request):
+    """Proyectos donde el usuario es miembro directo (`ProjectMember`)."""
+    user = request.user
+    return _cached_project_ids(
+        request,
+        '_member_project_ids',
+        member_projects_key(user.pk),
+        lambda: Project.objects.filter(projectmember__user=user)
+    )
+
+
+async def can_access_diagram(user_id, diagram_id):
+    """
+    Indica si el usuario es miembro del proyecto del diagrama.
+
+    En el caso común (reconexiones) se responde desde la caché sin tocar
+    la base de datos.
+    """
+    project_id = await cache.aget(diagram_project_key(diagram_id))
+    if project_id is not None:
+        is_member = await cache.aget(membership_key(user_id, project_id))
+        if is_member is not None:
+            return is_member
+
+    # Fallo de caché: diagrama y membresía en una sola consulta
+    row = await Diagram.objects.filter(id=diagram_id).annotate(
+        is_member=Exists(ProjectMember.objects.filter(
+            project_id=OuterRef('project_id'),
+            user_id=user_id
+        ))
+    ).values_list('project_id', 'is_member').afirst()
+    if row is None:
+        return False
+
+    project_id, is_member = row
+    project_ttl, membership_ttl = _ttls()
+    await cache.aset(diagram_project_key(diagram_id), project_id, project_ttl)
+    await cache.aset(membership_key(user_id, project_id), is_member, membership_ttl)
+    return is_member
+
+
+def invalidate_membership(user_id, project_id):
+    """Descarta la membresía cacheada de un usuario en un proyecto."""
+    cache.delete_many([membership_key(user_id, project_id), member_projects_key(user_id)])
+
+
+def invalidate_accessible_projects(user_ids):
+    """Descarta los proyectos accesibles cacheados de los usuarios."""
+    cache.delete_many([accessible_projects_key(user_id) for user_id in user_ids])
+
+
+def invalidate_organization_projects(organization_id):
+    """Descarta los proyectos accesibles de todos los miembros de la organización."""
+    invalidate_accessible_projects(
+        Membership.objects.filter(organization_id=organization_id).values_list('user_id', flat=True)
+    )
+
+
+def invalidate_diagram(diagram_id):
+    """Descarta el proyecto cacheado de un diagrama eliminado."""
+    cache.delete(diagram_project_key(diagram_id))
@@ -5,3 +5,7 @@ class WorkspaceConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'Apps.workspace'
     label = 'workspace'
+
+    def ready(self):
+        # Invalidación de la caché de accesos
+        from . import signals  # noqa: F401
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.6 on 2026-10-17 12:28
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workspace', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='membership',
+            index=models.Index(fields=['user', 'status'], name='workspace_m_user_id_51dbf9_idx'),
+        ),
+    ]
@@ -40,6 +40,8 @@ class Membership(BaseUUIDModel, TimeStampedModel):
         indexes = [
             models.Index(fields=['organization']),
             models.Index(fields=['user']),
+            # Proyectos accesibles: membresías activas de un usuario
+            models.Index(fields=['user', 'status']),
         ]
 
     def __str__(self):
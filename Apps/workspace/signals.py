@@ -0,0 +1,37 @@
+"""
+Señales de la app workspace.
+"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .access import (
+    invalidate_accessible_projects,
+    invalidate_diagram,
+    invalidate_membership,
+    invalidate_organization_projects,
+)
+from .models import Membership, Project, ProjectMember
+
+
+@receiver([post_save, post_delete], sender=ProjectMember)
+def invalidate_project_member_access(sender, instance, **kwargs):
+    """Invalida la membresía cacheada al agregar, modificar o quitar un miembro."""
+    invalidate_membership(instance.user_id, instance.project_id)
+
+
+@receiver([post_save, post_delete], sender=Membership)
+def invalidate_membership_projects(sender, instance, **kwargs):
+    """Invalida los proyectos accesibles al cambiar la membresía a una organización."""
+    invalidate_accessible_projects([instance.user_id])
+
+
+@receiver([post_save, post_delete], sender=Project)
+def invalidate_project_access(sender, instance, **kwargs):
+    """Un proyecto nuevo, movido o eliminado cambia los accesibles de toda su organización."""
+    invalidate_organization_projects(instance.organization_id)
+
+
+@receiver(post_delete, sender='modeling.Diagram')
+def invalidate_diagram_access(sender, instance, **kwargs):
+    """Invalida el proyecto cacheado de un diagrama eliminado."""
+    invalidate_diagram(instance.pk)
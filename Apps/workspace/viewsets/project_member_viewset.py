@@ -4,6 +4,7 @@ ViewSet para el modelo ProjectMember.
 from rest_framework import viewsets, permissions
 from ..models import ProjectMember
 from ..serializers import ProjectMemberSerializer
+from ..access import accessible_project_ids
 
 
 class ProjectMemberViewSet(viewsets.ModelViewSet):
@@ -20,6 +21,5 @@ class ProjectMemberViewSet(viewsets.ModelViewSet):
             return ProjectMember.objects.all()
         # Mostrar miembros de proyectos donde el usuario tiene acceso
         return ProjectMember.objects.filter(
-            project__organization__membership__user=user,
-            project__organization__membership__status='active'
+            project_id__in=accessible_project_ids(self.request)
         )
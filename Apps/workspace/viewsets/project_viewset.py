@@ -11,6 +11,7 @@ import uuid
 from ..models import Project, ProjectMember
 from ..serializers import ProjectSerializer
 from ..permissions import IsProjectMember
+from ..access import accessible_project_ids
 
 
 @extend_schema_view(
@@ -85,10 +86,7 @@ class ProjectViewSet(viewsets.ModelViewSet):
         if user.is_superuser:
             queryset = Project.objects.all()
         else:
-            queryset = Project.objects.filter(
-                organization__membership__user=user,
-                organization__membership__status='active'
-            ).distinct()
+            queryset = Project.objects.filter(id__in=accessible_project_ids(self.request))
         
         # Filtrar por organización si se especifica
         if organization_id:
@@ -12,12 +12,12 @@ import django
 django.setup()
 
 from channels.routing import ProtocolTypeRouter, URLRouter
-from channels.auth import AuthMiddlewareStack
+from Apps.collaboration.middleware import JWTAuthMiddleware
 import Apps.collaboration.routing
 
 application = ProtocolTypeRouter({
     "http": get_asgi_application(),
-    "websocket": AuthMiddlewareStack(
+    "websocket": JWTAuthMiddleware(
         URLRouter(
             Apps.collaboration.routing.websocket_urlpatterns
         )
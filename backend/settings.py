@@ -99,21 +99,38 @@ WSGI_APPLICATION = 'backend.wsgi.application'
 REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
 REDIS_PASSWORD = os.getenv("REDIS_PASSWORD", "")
 
-# Configuración simple: InMemory para producción, Redis para desarrollo
+if REDIS_PASSWORD:
+    redis_url = f"redis://default:{REDIS_PASSWORD}@{REDIS_HOST}:6379"
+else:
+    redis_url = f"redis://{REDIS_HOST}:6379"
+
+# Capa de canales (difusión entre conexiones y workers)
+# - postgres: LISTEN/NOTIFY sobre la base de datos de Django; varios workers sin infraestructura extra
+# - redis: channels_redis sobre REDIS_HOST
+# - memory: un solo proceso
+# Por defecto, postgres en producción y redis en desarrollo local
 if os.getenv("RAILWAY_ENVIRONMENT_NAME") == "production" or not DEBUG:
-    # En producción (Railway) usar InMemory
+    CHANNEL_LAYER_BACKEND = os.getenv("CHANNEL_LAYER_BACKEND", "postgres")
+else:
+    CHANNEL_LAYER_BACKEND = os.getenv("CHANNEL_LAYER_BACKEND", "redis")
+
+if CHANNEL_LAYER_BACKEND == "postgres":
+    CHANNEL_LAYERS = {
+        "default": {
+            "BACKEND": "Apps.collaboration.realtime.pg_layer.PostgresChannelLayer",
+            "CONFIG": {
+                "database": "default",
+                "capacity": int(os.getenv("CHANNEL_LAYER_CAPACITY", "1000")),
+            },
+        },
+    }
+elif CHANNEL_LAYER_BACKEND == "memory":
     CHANNEL_LAYERS = {
         "default": {
             "BACKEND": "channels.layers.InMemoryChannelLayer"
         },
     }
 else:
-    # En desarrollo local usar Redis
-    if REDIS_PASSWORD:
-        redis_url = f"redis://default:{REDIS_PASSWORD}@{REDIS_HOST}:6379"
-    else:
-        redis_url = f"redis://{REDIS_HOST}:6379"
-
     CHANNEL_LAYERS = {
         "default": {
             "BACKEND": "channels_redis.core.RedisChannelLayer",
@@ -123,6 +140,80 @@ else:
         },
     }
 
+# Cachés del middleware JWT del WebSocket: claims por token (hasta su expiración)
+# y proyección id/username/email por usuario
+COLLAB_AUTH_CACHE = {
+    "CLAIMS_MAXSIZE": int(os.getenv("COLLAB_AUTH_CLAIMS_MAXSIZE", "10000")),
+    "USERS_MAXSIZE": int(os.getenv("COLLAB_AUTH_USERS_MAXSIZE", "10000")),
+    "USERS_TTL": int(os.getenv("COLLAB_AUTH_USERS_TTL", "300")),
+}
+
+# Frecuencia (Hz) con la que se envían los lotes de move_element; 0 desactiva el batching
+COLLAB_MOVE_BATCH_HZ = int(os.getenv("COLLAB_MOVE_BATCH_HZ", "30"))
+
+# Autoguardado del documento vivo: segundos sin cambios o cantidad de operaciones acumuladas
+COLLAB_DOCUMENT_PERSIST_DELAY = float(os.getenv("COLLAB_DOCUMENT_PERSIST_DELAY", "5"))
+COLLAB_DOCUMENT_PERSIST_MAX_OPS = int(os.getenv("COLLAB_DOCUMENT_PERSIST_MAX_OPS", "200"))
+
+# Eventos recientes por sala que se pueden repetir a un cliente que se reconecta con `last_seq`
+COLLAB_REPLAY_BUFFER_SIZE = int(os.getenv("COLLAB_REPLAY_BUFFER_SIZE", "1000"))
+
+# Lado (en unidades del lienzo) de las celdas del índice espacial usado para filtrar
+# movimientos según el viewport declarado por cada conexión
+COLLAB_VIEWPORT_CELL_SIZE = int(os.getenv("COLLAB_VIEWPORT_CELL_SIZE", "512"))
+
+# Cola de salida por conexión WebSocket: tamaño máximo, marca de agua y segundos
+# que se tolera por encima de ella antes de cerrar con un código reanudable.
+# POLICIES asigna a un tipo de mensaje 'coalesce', 'drop_stale' o 'reliable'.
+COLLAB_OUTBOX = {
+    "MAX_SIZE": int(os.getenv("COLLAB_OUTBOX_MAX_SIZE", "512")),
+    "HIGH_WATER": int(os.getenv("COLLAB_OUTBOX_HIGH_WATER", "256")),
+    "HIGH_WATER_SECONDS": float(os.getenv("COLLAB_OUTBOX_HIGH_WATER_SECONDS", "5")),
+    "CLOSE_CODE": 4008,
+    "POLICIES": {},
+}
+
+# Presencia de usuarios en diagramas (WebSocket)
+# - memory: registro local del proceso (un solo worker)
+# - redis: registro compartido entre workers sobre Redis o un servidor compatible
+COLLAB_PRESENCE = {
+    "BACKEND": "Apps.collaboration.realtime.presence.InMemoryPresenceStore",
+    # Segundos sin latido tras los cuales una conexión se considera caída
+    "TTL": int(os.getenv("COLLAB_PRESENCE_TTL", "60")),
+    # Segundos que dura un lease de edición por elemento sin renovarse (latido o lease_acquire)
+    "LEASE_TTL": int(os.getenv("COLLAB_LEASE_TTL", "60")),
+}
+if os.getenv("COLLAB_PRESENCE_BACKEND", "memory") == "redis":
+    COLLAB_PRESENCE["BACKEND"] = "Apps.collaboration.realtime.presence.RedisPresenceStore"
+    COLLAB_PRESENCE["CONFIG"] = {
+        "url": os.getenv("COLLAB_PRESENCE_REDIS_URL", redis_url),
+    }
+
+# Caché de Django (autorización de WebSocket, etc.)
+# - memory: caché local del proceso
+# - redis: caché compartida entre workers, necesaria para invalidar entre procesos
+if os.getenv("CACHE_BACKEND", "memory") == "redis":
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.getenv("CACHE_REDIS_URL", redis_url),
+        },
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        },
+    }
+
+# Segundos que se cachea el proyecto de un diagrama, la membresía de un usuario
+# y el conjunto de proyectos accesibles que usan los listados de la API
+WORKSPACE_ACCESS_CACHE = {
+    "DIAGRAM_PROJECT_TTL": int(os.getenv("WORKSPACE_DIAGRAM_PROJECT_TTL", "3600")),
+    "MEMBERSHIP_TTL": int(os.getenv("WORKSPACE_MEMBERSHIP_TTL", "30")),
+    "PROJECT_IDS_TTL": int(os.getenv("WORKSPACE_PROJECT_IDS_TTL", "60")),
+}
+
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
@@ -202,6 +293,17 @@ REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
 }
 
+# Versionado de diagramas: keyframe cada N versiones, deltas JSON Patch entre medio
+DIAGRAM_VERSION_KEYFRAME_INTERVAL = int(os.getenv("DIAGRAM_VERSION_KEYFRAME_INTERVAL", "20"))
+# Si el delta pesa más que esta fracción del snapshot se guarda un keyframe
+DIAGRAM_VERSION_MAX_DELTA_RATIO = 0.5
+# Las versiones son inmutables: la diferencia entre dos se cachea sin vencimiento
+DIAGRAM_VERSION_DIFF_CACHE_TIMEOUT = None
+# Tamaño aproximado (bytes) de cada trozo al enviar un snapshot en streaming
+DIAGRAM_VERSION_STREAM_CHUNK_SIZE = int(os.getenv("DIAGRAM_VERSION_STREAM_CHUNK_SIZE", str(64 * 1024)))
+# Errores de esquema que se reportan como máximo al validar un snapshot
+DIAGRAM_SNAPSHOT_MAX_ERRORS = 10
+
 # Simple JWT Configuration
 from datetime import timedelta
 
@@ -226,13 +226,15 @@ def test_m05_list_diagram_versions():
     headers = get_auth_headers()
     diagram_id = get_diagram_id()
     
-    response = requests.get(f"{BASE_URL}/diagram-versions/?diagram={diagram_id}", headers=headers)
+    response = requests.get(
+        f"{BASE_URL}/diagram-versions/?diagram={diagram_id}&include_count=true", headers=headers
+    )
     
     print(f"Status Code: {response.status_code}")
     if response.status_code == 200:
         result = response.json()
         print("✅ Versiones listadas exitosamente")
-        print(f"   Total de versiones: {result['count']}")
+        print(f"   Total de versiones (estimado): {result['estimated_count']}")
         
         for version in result['results']:
             print(f"\n   📋 Versión {version['version_number']}:")